@@ -2,12 +2,16 @@
 ABI utilities, because web3 doesn't do selectors well.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
 import glob
 import json
 import os
-from typing import Any, Dict, List, Optional
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from web3 import Web3
+from .keccak import keccak256
+from .profiling import stage
 
 
 def abi_input_signature(input_abi: Dict[str, Any]) -> str:
@@ -49,61 +53,317 @@ def encode_function_signature(function_abi: Dict[str, Any]) -> Optional[str]:
     if function_abi["type"] != "function":
         return None
     function_signature = abi_function_signature(function_abi)
-    encoded_signature = Web3.keccak(text=function_signature)[:4]
-    return encoded_signature.hex()
+    encoded_signature = keccak256(function_signature.encode("utf-8"))[:4]
+    return "0x" + encoded_signature.hex()
 
-def foundry_project_abis(project_dir: str, build_dirname: None) -> Dict[str, List[Dict[str, Any]]]:
+# Both brownie and foundry write "abi" as the first key of their build artifacts. When it is, the ABI is
+# decoded from the start of the file and the rest of the artifact (bytecode, source maps, ASTs) is never
+# read or parsed.
+ABI_FIRST_KEY_PATTERN = re.compile(r'\s*\{\s*"abi"\s*:\s*')
+ABI_READ_CHUNK_SIZE = 1 << 16
+
+_json_decoder = json.JSONDecoder()
+
+
+def load_artifact_abi(filepath: str) -> Optional[List[Dict[str, Any]]]:
     """
-    Load all ABIs for project contracts and return then in a dictionary keyed by contract name.
+    Loads the ABI from a single build artifact. Returns None if the file is not a build artifact for a
+    contract.
+    """
+    with open(filepath, "r") as ifp:
+        head = ifp.read(ABI_READ_CHUNK_SIZE)
+        abi_match = ABI_FIRST_KEY_PATTERN.match(head)
+        if abi_match is not None:
+            while True:
+                try:
+                    contract_abi, _ = _json_decoder.raw_decode(head, abi_match.end())
+                    return contract_abi
+                except ValueError:
+                    # The ABI extends beyond what we have read so far (or is malformed, in which case we
+                    # will fail to parse the full artifact below).
+                    chunk = ifp.read(len(head))
+                    if not chunk:
+                        break
+                    head += chunk
+        contract_artifact = json.loads(head + ifp.read())
+
+    if not isinstance(contract_artifact, dict):
+        return None
+
+    return contract_artifact.get("abi", [])
+
+
+# Both hardhat and foundry write build-info files (which describe every contract compiled in one compiler run)
+# into a directory with this name.
+BUILD_INFO_DIRNAME = "build-info"
+
+
+def iter_build_info_contracts(filepath: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yields (source name, {contract name: compiler output for contract}) pairs from a hardhat build-info
+    file.
+
+    Build-info files hold the full compiler input (every source file) and output (bytecode, source maps,
+    ASTs) for a compiler run. If ijson is installed (`pip install ijson`), only the compiler output is
+    parsed, one source at a time, so memory use is bounded by the largest source's output rather than by
+    the size of the file. Otherwise, the whole file is parsed with json.
+    """
+    try:
+        import ijson  # type: ignore
+    except ImportError:
+        ijson = None
+
+    with open(filepath, "rb") as ifp:
+        if ijson is not None:
+            for source_name, source_contracts in ijson.kvitems(
+                ifp, "output.contracts", use_float=True
+            ):
+                yield source_name, source_contracts
+            return
+
+        build_info = json.load(ifp)
+
+    for source_name, source_contracts in (
+        build_info.get("output", {}).get("contracts", {}).items()
+    ):
+        yield source_name, source_contracts
+
+
+def load_build_info_abis(filepath: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Loads the ABIs of every contract in a hardhat build-info file, keyed by fully qualified name
+    (<source name>:<contract name>), so that contracts with the same name in different sources are kept
+    apart.
+    """
+    abis: Dict[str, List[Dict[str, Any]]] = {}
+    for source_name, source_contracts in iter_build_info_contracts(filepath):
+        for contract_name, contract_output in source_contracts.items():
+            abis[f"{source_name}:{contract_name}"] = contract_output.get("abi", [])
+    return abis
+
+
+def load_build_file_abis(
+    filepath: str, build_info: bool = False
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Loads the ABIs from a single build file - a hardhat build-info file if build_info is True, otherwise the
+    artifact for a single contract - keyed by contract name.
+    """
+    if build_info:
+        return load_build_info_abis(filepath)
+
+    contract_abi = load_artifact_abi(filepath)
+    if contract_abi is None:
+        return {}
+    return {contract_name_from_artifact(filepath): contract_abi}
+
+
+def contract_name_from_artifact(filepath: str) -> str:
+    contract_name, _ = os.path.splitext(os.path.basename(filepath))
+    return contract_name
+
+
+def filter_build_files(
+    build_files: List[str],
+    build_dir: str,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Filters build artifacts by glob patterns. A pattern matches an artifact if it matches the artifact's
+    path relative to build_dir or any component of that path - so "*.t.sol" matches the artifacts for all
+    contracts defined in foundry test files.
+
+    If include patterns are given, only artifacts matching at least one of them are kept. Artifacts matching
+    any of the exclude patterns are dropped.
+    """
+
+    def matches(filepath: str, patterns: List[str]) -> bool:
+        relative_path = os.path.relpath(filepath, build_dir)
+        components = [relative_path] + relative_path.split(os.sep)
+        return any(
+            fnmatch.fnmatch(component, pattern)
+            for pattern in patterns
+            for component in components
+        )
+
+    return [
+        filepath
+        for filepath in build_files
+        if (not include or matches(filepath, include))
+        and not (exclude and matches(filepath, exclude))
+    ]
+
+
+def filter_contract_names(
+    contracts: Dict[str, Any],
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Filters a dictionary keyed by fully qualified contract names (<source name>:<contract name>, as
+    produced by load_build_info_abis) by glob patterns. A pattern matches a contract if it matches the
+    fully qualified name, the source name, any component of the source name, or the contract name.
+    """
+    if not include and not exclude:
+        return contracts
+
+    def matches(fully_qualified_name: str, patterns: List[str]) -> bool:
+        source_name, _, contract_name = fully_qualified_name.rpartition(":")
+        components = [fully_qualified_name, source_name, contract_name] + source_name.split("/")
+        return any(
+            fnmatch.fnmatch(component, pattern)
+            for pattern in patterns
+            for component in components
+        )
+
+    return {
+        name: value
+        for name, value in contracts.items()
+        if (not include or matches(name, include))
+        and not (exclude and matches(name, exclude))
+    }
+
+
+def foundry_build_files(
+    project_dir: str,
+    build_dirname: Optional[str] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Lists the build artifacts for the contracts in a foundry project.
 
     Inputs:
     - project_dir
-      Path to brownie project
+      Path to foundry project
+    - build_dirname
+      Name of build directory (defaults to "out")
+    - include, exclude
+      Glob patterns to select artifacts by (see filter_build_files)
     """
     if build_dirname is None:
         build_dirname = "out"
 
     build_dir = os.path.join(project_dir, build_dirname)
-    build_files = glob.glob(os.path.join(build_dir, "*/*.json"))
-
-    abis: Dict[str, List[Dict[str, Any]]] = {}
-
-    for filepath in build_files:
-        contract_name, _ = os.path.splitext(os.path.basename(filepath))
-        with open(filepath, "r") as ifp:
-            contract_artifact = json.load(ifp)
-
-        try:
-            contract_abi = contract_artifact.get("abi", [])
-            abis[contract_name] = contract_abi
-        except Exception:
-            continue
+    # Foundry writes build-info files next to the artifact directories. They duplicate the artifacts' ABIs.
+    build_files = [
+        filepath
+        for filepath in glob.glob(os.path.join(build_dir, "*/*.json"))
+        if os.path.basename(os.path.dirname(filepath)) != BUILD_INFO_DIRNAME
+    ]
+    return filter_build_files(build_files, build_dir, include, exclude)
 
-    return abis
 
-def brownie_project_abis(project_dir: str, build_dirname: None) -> Dict[str, List[Dict[str, Any]]]:
+def brownie_build_files(
+    project_dir: str,
+    build_dirname: Optional[str] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
     """
-    Load all ABIs for project contracts and return then in a dictionary keyed by contract name.
+    Lists the build artifacts for the contracts in a brownie project.
 
     Inputs:
     - project_dir
       Path to brownie project
+    - build_dirname
+      Name of build directory (defaults to "build")
+    - include, exclude
+      Glob patterns to select artifacts by (see filter_build_files)
     """
     if build_dirname is None:
         build_dirname = "build"
 
     build_dir = os.path.join(project_dir, build_dirname, "contracts")
     build_files = glob.glob(os.path.join(build_dir, "*.json"))
+    return filter_build_files(build_files, build_dir, include, exclude)
 
-    abis: Dict[str, List[Dict[str, Any]]] = {}
 
-    for filepath in build_files:
-        contract_name, _ = os.path.splitext(os.path.basename(filepath))
-        with open(filepath, "r") as ifp:
-            contract_artifact = json.load(ifp)
+def hardhat_build_files(
+    project_dir: str, build_dirname: Optional[str] = None
+) -> List[str]:
+    """
+    Lists the build-info files for a hardhat project, oldest first - if a contract was compiled in several
+    runs, the ABI from the most recent run is the one that is kept.
+
+    Inputs:
+    - project_dir
+      Path to hardhat project
+    - build_dirname
+      Name of build directory (defaults to "artifacts")
+    """
+    if build_dirname is None:
+        build_dirname = "artifacts"
+
+    build_info_dir = os.path.join(project_dir, build_dirname, BUILD_INFO_DIRNAME)
+    build_files = glob.glob(os.path.join(build_info_dir, "*.json"))
+    return sorted(build_files, key=lambda filepath: (os.path.getmtime(filepath), filepath))
+
 
-        contract_abi = contract_artifact.get("abi", [])
+def abis_from_build_files(
+    build_files: List[str], workers: Optional[int] = None, build_info: bool = False
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load all ABIs from the given build files (contract artifacts, or hardhat build-info files if
+    build_info is True) and return them in a dictionary keyed by contract name.
+
+    Build files are read in parallel on a pool of worker threads (workers defaults to the ThreadPoolExecutor
+    default).
+    """
+    abis: Dict[str, List[Dict[str, Any]]] = {}
 
-        abis[contract_name] = contract_abi
+    with stage("artifact_parsing"), ThreadPoolExecutor(max_workers=workers) as executor:
+        for build_file_abis in executor.map(
+            load_build_file_abis, build_files, [build_info] * len(build_files)
+        ):
+            abis.update(build_file_abis)
 
     return abis
+
+
+def foundry_project_abis(project_dir: str, build_dirname: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load all ABIs for project contracts and return then in a dictionary keyed by contract name.
+
+    Inputs:
+    - project_dir
+      Path to foundry project
+    """
+    return abis_from_build_files(foundry_build_files(project_dir, build_dirname))
+
+
+def brownie_project_abis(project_dir: str, build_dirname: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load all ABIs for project contracts and return then in a dictionary keyed by contract name.
+
+    Inputs:
+    - project_dir
+      Path to brownie project
+    """
+    return abis_from_build_files(brownie_build_files(project_dir, build_dirname))
+
+
+def hardhat_project_abis(
+    project_dir: str,
+    build_dirname: Optional[str] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load all ABIs for project contracts from the project's build-info files and return them in a dictionary
+    keyed by fully qualified contract name (e.g. "contracts/facets/OwnershipFacet.sol:OwnershipFacet").
+
+    Each build-info file is parsed once, and the per-contract artifact files (which duplicate the ABIs) are
+    never read.
+
+    Inputs:
+    - project_dir
+      Path to hardhat project
+    - include, exclude
+      Glob patterns to select contracts by (see filter_contract_names)
+    """
+    abis = abis_from_build_files(
+        hardhat_build_files(project_dir, build_dirname), build_info=True
+    )
+    return filter_contract_names(abis, include, exclude)
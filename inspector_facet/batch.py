@@ -0,0 +1,191 @@
+"""
+Inspect many Diamond contracts in one run.
+
+The diamonds to inspect are listed in a manifest - a JSON file containing a list of objects, each of which
+describes one diamond:
+- {"name": "...", "crawldata": "<path to moonworm crawldata>"}
+- {"name": "...", "network": "<brownie network>", "address": "<diamond address>"}
+- {"name": "...", "rpc": "<JSON-RPC URL>", "address": "<diamond address>"}
+
+The "name" key is optional. Relative crawldata paths are resolved relative to the manifest file.
+
+Diamonds which are queried over JSON-RPC are fetched up front, with all the diamonds on the same node
+fetched through a single batching loupe.LoupeClient.
+
+The contract -> selector -> function index is built once by the caller and shared with a pool of worker
+processes, which reconstruct and inspect the diamonds in parallel.
+
+A single crawldata file covering many diamonds can also be inspected with inspect_crawldata_by_address,
+which splits it by the address that emitted each event and inspects each diamond as a separate entry.
+"""
+import json
+import multiprocessing
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from .facets import (
+    facets_from_events,
+    facets_from_loupe,
+    iter_moonworm_crawldata,
+    partition_events_by_address,
+)
+from .loupe import LoupeClient
+from .matching import SelectorMatcher
+
+# Matcher used by inspect_manifest_entry. Set once per worker process by initialize_worker, so that the
+# index is not sent to the workers with every task.
+_worker_matcher: Optional[SelectorMatcher] = None
+
+
+def load_manifest(manifest_file: str) -> List[Dict[str, Any]]:
+    """
+    Loads a batch manifest, validating its entries and resolving crawldata paths.
+    """
+    with open(manifest_file, "r") as ifp:
+        raw_entries = json.load(ifp)
+
+    if not isinstance(raw_entries, list):
+        raise ValueError(f"Manifest must contain a JSON list of diamonds: {manifest_file}")
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    entries: List[Dict[str, Any]] = []
+    for i, raw_entry in enumerate(raw_entries):
+        entry = dict(raw_entry)
+        if entry.get("crawldata") is not None:
+            entry["crawldata"] = os.path.join(manifest_dir, entry["crawldata"])
+            entry.setdefault("name", raw_entry["crawldata"])
+        elif (
+            entry.get("network") is not None or entry.get("rpc") is not None
+        ) and entry.get("address") is not None:
+            entry.setdefault("name", entry["address"])
+        else:
+            raise ValueError(
+                f"Manifest entry {i} must specify either crawldata or an address together with a network or rpc URL: {raw_entry}"
+            )
+        entries.append(entry)
+
+    return entries
+
+
+def prefetch_rpc_facets(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fetches the facets for all manifest entries which specify an rpc URL, grouping the diamonds by node so
+    that each node is queried through one connection with batched requests. Returns the entries with the
+    facets (or the error encountered while fetching them) filled in.
+    """
+    addresses_by_rpc: Dict[str, List[str]] = {}
+    for entry in entries:
+        if entry.get("crawldata") is None and entry.get("rpc") is not None:
+            addresses_by_rpc.setdefault(entry["rpc"], []).append(entry["address"])
+
+    if not addresses_by_rpc:
+        return entries
+
+    facets_by_rpc: Dict[str, Dict[str, Any]] = {}
+    for rpc_url, addresses in addresses_by_rpc.items():
+        try:
+            with LoupeClient(rpc_url) as client:
+                facets_by_rpc[rpc_url] = client.facets(addresses)
+        except Exception as e:
+            facets_by_rpc[rpc_url] = {address: e for address in addresses}
+
+    prefetched_entries: List[Dict[str, Any]] = []
+    for entry in entries:
+        if entry.get("crawldata") is None and entry.get("rpc") is not None:
+            entry = dict(entry)
+            facets = facets_by_rpc[entry["rpc"]][entry["address"]]
+            if isinstance(facets, Exception):
+                entry["error"] = f"{facets.__class__.__name__}: {facets}"
+            else:
+                entry["facets"] = facets
+        prefetched_entries.append(entry)
+    return prefetched_entries
+
+
+def facets_from_manifest_entry(entry: Dict[str, Any]) -> Dict[str, List[str]]:
+    if entry.get("facets") is not None:
+        return entry["facets"]
+    if entry.get("events") is not None:
+        return facets_from_events(entry["events"])
+    if entry.get("crawldata") is not None:
+        return facets_from_events(iter_moonworm_crawldata(entry["crawldata"]))
+    return facets_from_loupe(entry["network"], entry["address"])
+
+
+def initialize_worker(contract_selectors: Dict[str, Dict[str, str]]) -> None:
+    global _worker_matcher
+    _worker_matcher = SelectorMatcher(contract_selectors)
+
+
+def inspect_manifest_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inspects a single diamond from a manifest. Failures are reported in the "error" key of the returned
+    object instead of being raised, so that one bad diamond does not abort the whole batch.
+    """
+    assert _worker_matcher is not None, "initialize_worker must be called first"
+    batch_result: Dict[str, Any] = {"name": entry["name"]}
+    if entry.get("error") is not None:
+        batch_result["error"] = entry["error"]
+        return batch_result
+    try:
+        facets = facets_from_manifest_entry(entry)
+        batch_result["result"] = _worker_matcher.match_facets(facets)
+    except Exception as e:
+        batch_result["error"] = f"{e.__class__.__name__}: {e}"
+    return batch_result
+
+
+def inspect_batch(
+    entries: List[Dict[str, Any]],
+    contract_selectors: Dict[str, Dict[str, str]],
+    workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Inspects every diamond in the given manifest entries against the given index, yielding the result for
+    each diamond as soon as it is available (so not necessarily in manifest order).
+
+    workers is the number of worker processes (defaults to the number of CPUs). With workers=1, diamonds
+    are inspected sequentially in the calling process.
+    """
+    entries = prefetch_rpc_facets(entries)
+
+    if workers == 1:
+        initialize_worker(contract_selectors)
+        for entry in entries:
+            yield inspect_manifest_entry(entry)
+        return
+
+    with multiprocessing.Pool(
+        processes=workers,
+        initializer=initialize_worker,
+        initargs=(contract_selectors,),
+    ) as pool:
+        for batch_result in pool.imap_unordered(inspect_manifest_entry, entries):
+            yield batch_result
+
+
+def crawldata_entries_by_address(crawldata_jsonl: str) -> List[Dict[str, Any]]:
+    """
+    Reads a crawldata file once and returns one batch entry per Diamond contract that emitted DiamondCut
+    events in it, named by its address and carrying its events.
+    """
+    return [
+        {"name": address, "address": address, "events": events}
+        for address, events in partition_events_by_address(
+            iter_moonworm_crawldata(crawldata_jsonl)
+        ).items()
+    ]
+
+
+def inspect_crawldata_by_address(
+    crawldata_jsonl: str,
+    contract_selectors: Dict[str, Dict[str, str]],
+    workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Inspects every Diamond contract with DiamondCut events in the given crawldata file, yielding one batch
+    result (as in inspect_batch) per contract address.
+    """
+    return inspect_batch(
+        crawldata_entries_by_address(crawldata_jsonl), contract_selectors, workers
+    )
@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the inspector-facet pipeline, run against synthetic data (see inspector_facet.synthetic).
+
+Usage:
+    python -m inspector_facet.bench [--scale small|medium|large] [--baseline FILE] [--save-baseline FILE]
+
+Each stage is timed (best of --repeat runs) and then run once more under tracemalloc to measure its peak
+memory. If a baseline is given (one saved earlier on the same machine, at the same scale and seed), the run
+is compared against it and the process exits with a non-zero status if any stage got slower by more than
+the tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .abi import abis_from_build_files, brownie_build_files
+from .cli import print_result_for_human, print_timeline_event_for_human
+from .facets import facets_from_events, iter_moonworm_crawldata
+from .inspector import contract_selectors_from_abis, inspect_diamond
+from .synthetic import (
+    DEFAULT_SEED,
+    synthetic_abis,
+    synthetic_diamond_cuts,
+    write_artifact_tree,
+    write_crawldata,
+)
+from .timeline import timeline_from_events
+
+# Parameters of the synthetic data for each scale: number of contracts, functions per contract, number of
+# facets and number of DiamondCut events.
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"contracts": 200, "functions": 20, "facets": 50, "events": 2_000},
+    "medium": {"contracts": 2_000, "functions": 20, "facets": 300, "events": 100_000},
+    "large": {"contracts": 5_000, "functions": 30, "facets": 800, "events": 500_000},
+}
+
+DEFAULT_SCALE = "medium"
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 1.25
+
+
+class NullOutput:
+    """
+    Text stream which discards everything written to it, so that rendering can be timed without I/O.
+    """
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def generate_data(data_dir: str, scale: Dict[str, int], seed: int) -> Tuple[str, str]:
+    """
+    Writes a synthetic brownie project and crawldata file into data_dir. Returns their paths.
+    """
+    project_dir = os.path.join(data_dir, "project")
+    crawldata_jsonl = os.path.join(data_dir, "crawldata.jsonl")
+    abis = synthetic_abis(scale["contracts"], scale["functions"], seed)
+    write_artifact_tree(project_dir, abis, layout="brownie")
+    events = synthetic_diamond_cuts(
+        contract_selectors_from_abis(abis), scale["events"], scale["facets"], seed
+    )
+    write_crawldata(crawldata_jsonl, events)
+    return project_dir, crawldata_jsonl
+
+
+def measure(
+    stage: Callable[[], Any], repeat: int, trace_memory: bool = True
+) -> Tuple[Any, float, Optional[int]]:
+    """
+    Runs stage repeat times, then once more under tracemalloc (if trace_memory is True). Returns the
+    stage's return value, the best wall time and the peak memory allocated while it ran (in bytes, or None
+    if memory was not traced).
+    """
+    best_seconds = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        stage()
+        best_seconds = min(best_seconds, time.perf_counter() - started_at)
+
+    if not trace_memory:
+        return stage(), best_seconds, None
+
+    tracemalloc.start()
+    try:
+        value = stage()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return value, best_seconds, peak_bytes
+
+
+def run_benchmarks(
+    project_dir: str,
+    crawldata_jsonl: str,
+    repeat: int = DEFAULT_REPEAT,
+    trace_memory: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmarks each stage of the pipeline on the given project and crawldata. Returns, for each stage, the
+    number of items it processed, its best wall time, throughput (items per second) and peak memory.
+    """
+    report: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        name: str, unit: str, items: int, seconds: float, peak_bytes: Optional[int]
+    ) -> None:
+        report[name] = {
+            "unit": unit,
+            "items": items,
+            "seconds": seconds,
+            "throughput": items / seconds if seconds > 0 else None,
+            "peak_bytes": peak_bytes,
+        }
+        memory_text = "" if peak_bytes is None else f" {peak_bytes / (1 << 20):>9.1f} MiB"
+        print(
+            f"{name:<20} {seconds:>9.3f}s {items / max(seconds, 1e-9):>14.0f} {unit}/s{memory_text}",
+            file=sys.stderr,
+        )
+
+    build_files = brownie_build_files(project_dir)
+    abis, seconds, peak_bytes = measure(
+        lambda: abis_from_build_files(build_files), repeat, trace_memory
+    )
+    record("artifact_loading", "artifacts", len(build_files), seconds, peak_bytes)
+
+    num_functions = sum(
+        1 for contract_abi in abis.values() for item in contract_abi if item["type"] == "function"
+    )
+    contract_selectors, seconds, peak_bytes = measure(
+        lambda: contract_selectors_from_abis(abis), repeat, trace_memory
+    )
+    record("selector_hashing", "functions", num_functions, seconds, peak_bytes)
+
+    events = list(iter_moonworm_crawldata(crawldata_jsonl))
+    _, seconds, peak_bytes = measure(
+        lambda: list(iter_moonworm_crawldata(crawldata_jsonl)), repeat, trace_memory
+    )
+    record("crawldata_decoding", "events", len(events), seconds, peak_bytes)
+
+    facets, seconds, peak_bytes = measure(
+        lambda: facets_from_events(events), repeat, trace_memory
+    )
+    record("facets_from_events", "events", len(events), seconds, peak_bytes)
+
+    result, seconds, peak_bytes = measure(
+        lambda: inspect_diamond(facets, contract_selectors=contract_selectors),
+        repeat,
+        trace_memory,
+    )
+    record("inspect_diamond", "facets", len(facets), seconds, peak_bytes)
+
+    def timeline() -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        return list(timeline_from_events(events, contract_selectors=contract_selectors))
+
+    results_with_events, seconds, peak_bytes = measure(timeline, repeat, trace_memory)
+    record("timeline", "events", len(events), seconds, peak_bytes)
+
+    def render() -> None:
+        out = NullOutput()
+        print_result_for_human(result, out)  # type: ignore
+        maybe_previous_result: Optional[Dict[str, Any]] = None
+        for step_result, event in results_with_events:
+            print_timeline_event_for_human(step_result, maybe_previous_result, event, out)  # type: ignore
+            maybe_previous_result = step_result
+
+    _, seconds, peak_bytes = measure(render, repeat, trace_memory)
+    record("rendering", "events", len(events), seconds, peak_bytes)
+
+    return report
+
+
+def compare_with_baseline(
+    report: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """
+    Compares the wall time of each stage against the baseline. Returns the names of the stages which are
+    slower than the baseline by more than a factor of tolerance.
+    """
+    regressions: List[str] = []
+    for name, stage_report in report.items():
+        baseline_stage = baseline.get(name)
+        if baseline_stage is None or not baseline_stage["seconds"]:
+            continue
+        ratio = stage_report["seconds"] / baseline_stage["seconds"]
+        memory_text = ""
+        if stage_report["peak_bytes"] is not None and baseline_stage["peak_bytes"]:
+            memory_ratio = stage_report["peak_bytes"] / baseline_stage["peak_bytes"]
+            memory_text = f", peak memory x{memory_ratio:.2f}"
+        status = "REGRESSION" if ratio > tolerance else "ok"
+        print(
+            f"{name:<20} time x{ratio:.2f}{memory_text} vs baseline: {status}",
+            file=sys.stderr,
+        )
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspector Facet benchmarks")
+    parser.add_argument(
+        "--scale",
+        choices=list(SCALES),
+        default=DEFAULT_SCALE,
+        help=f"Size of the synthetic data. Default: {DEFAULT_SCALE}",
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help=f"Number of timed runs of each stage (the best is reported). Default: {DEFAULT_REPEAT}",
+    )
+    parser.add_argument(
+        "--skip-memory",
+        action="store_true",
+        help="Do not measure peak memory. Tracing allocations slows some stages down considerably.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="Directory in which to generate (or reuse) the synthetic data. Defaults to a temporary directory.",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="Path to a baseline report (saved with --save-baseline on the same machine) to compare against",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Slowdown factor relative to the baseline above which a stage is reported as a regression. Default: {DEFAULT_TOLERANCE}",
+    )
+    parser.add_argument(
+        "--save-baseline", default=None, help="Path at which to save this run's report as a baseline"
+    )
+    args = parser.parse_args(argv)
+
+    baseline: Optional[Dict[str, Any]] = None
+    if args.baseline is not None:
+        with open(args.baseline, "r") as ifp:
+            baseline = json.load(ifp)
+        if baseline.get("scale") != args.scale or baseline.get("seed") != args.seed:
+            raise ValueError(
+                f"Baseline was recorded at scale {baseline.get('scale')} with seed {baseline.get('seed')}, not at scale {args.scale} with seed {args.seed}"
+            )
+
+    scale = SCALES[args.scale]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir if args.data_dir is not None else temp_dir
+        data_dir = os.path.join(data_dir, f"{args.scale}-{args.seed}")
+        project_dir = os.path.join(data_dir, "project")
+        crawldata_jsonl = os.path.join(data_dir, "crawldata.jsonl")
+        if not os.path.isfile(crawldata_jsonl):
+            print(f"Generating {args.scale} synthetic data in {data_dir}", file=sys.stderr)
+            project_dir, crawldata_jsonl = generate_data(data_dir, scale, args.seed)
+
+        report = {
+            "scale": args.scale,
+            "seed": args.seed,
+            "python": sys.version.split()[0],
+            "stages": run_benchmarks(
+                project_dir, crawldata_jsonl, args.repeat, not args.skip_memory
+            ),
+        }
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as ofp:
+            json.dump(report, ofp, indent=2)
+
+    if baseline is not None:
+        if compare_with_baseline(report["stages"], baseline["stages"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
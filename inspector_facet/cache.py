@@ -0,0 +1,136 @@
+"""
+Persistent on-disk cache of the contract -> selector -> function index for a project's build artifacts.
+
+Computing selectors means hashing the signature of every function in every artifact. The cache stores
+the selectors computed for each artifact together with the artifact's modification time, size and content
+hash, so that only artifacts which changed since the last run need to be parsed and hashed again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from .abi import load_build_file_abis
+from .inspector import contract_selectors_from_abis
+
+CACHE_VERSION = 1
+
+
+def load_cache(cache_file: str) -> Dict[str, Any]:
+    """
+    Loads the artifact entries from a selector cache file. Returns an empty cache if the file does not
+    exist or was written by an incompatible version of inspector-facet.
+    """
+    if not os.path.isfile(cache_file):
+        return {}
+
+    try:
+        with open(cache_file, "r") as ifp:
+            cache = json.load(ifp)
+    except ValueError:
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+
+    return cache.get("artifacts", {})
+
+
+def save_cache(cache_file: str, artifacts: Dict[str, Any]) -> None:
+    """
+    Atomically writes the given artifact entries to the cache file.
+    """
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as ofp:
+        json.dump({"version": CACHE_VERSION, "artifacts": artifacts}, ofp)
+    os.replace(temp_file, cache_file)
+
+
+def artifact_entry(
+    filepath: str, stat: os.stat_result, content_hash: str, build_info: bool = False
+) -> Dict[str, Any]:
+    """
+    Parses a single build file (a hardhat build-info file if build_info is True) and computes the selectors
+    for the contracts it describes.
+    """
+    contracts = contract_selectors_from_abis(load_build_file_abis(filepath, build_info))
+
+    return {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": content_hash,
+        "contracts": contracts,
+    }
+
+
+def refresh_artifact_entry(
+    filepath: str, entry: Optional[Dict[str, Any]], build_info: bool = False
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Validates the cached entry (if any) for a build artifact against the artifact on disk, re-hashing the
+    artifact if it changed. Returns the up-to-date entry and whether it differs from the cached one.
+    """
+    stat = os.stat(filepath)
+    if (
+        entry is not None
+        and entry["mtime_ns"] == stat.st_mtime_ns
+        and entry["size"] == stat.st_size
+    ):
+        return entry, False
+
+    with open(filepath, "rb") as ifp:
+        content_hash = hashlib.sha256(ifp.read()).hexdigest()
+
+    if entry is not None and entry["sha256"] == content_hash:
+        entry = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    else:
+        entry = artifact_entry(filepath, stat, content_hash, build_info)
+    return entry, True
+
+
+def contract_selectors_from_build_files(
+    build_files: List[str],
+    cache_file: Optional[str] = None,
+    workers: Optional[int] = None,
+    build_info: bool = False,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Builds the contract -> selector -> function index (as produced by
+    inspector.contract_selectors_from_abis) for the given build artifacts (or hardhat build-info files, if
+    build_info is True).
+
+    If cache_file is provided, selectors for artifacts whose modification time and size (or, failing that,
+    content hash) are unchanged since the cache was written are read from the cache instead of being
+    recomputed. The cache is updated with any artifacts that had to be re-hashed.
+
+    Artifacts are validated and loaded in parallel on a pool of worker threads.
+    """
+    cached_artifacts: Dict[str, Any] = {}
+    if cache_file is not None:
+        cached_artifacts = load_cache(cache_file)
+
+    keys = [os.path.abspath(filepath) for filepath in build_files]
+    artifacts: Dict[str, Any] = {}
+    modified = False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        refreshed_entries = executor.map(
+            refresh_artifact_entry,
+            build_files,
+            [cached_artifacts.get(key) for key in keys],
+            [build_info] * len(build_files),
+        )
+        for key, (entry, entry_modified) in zip(keys, refreshed_entries):
+            artifacts[key] = entry
+            modified = modified or entry_modified
+
+    if cache_file is not None and (modified or len(artifacts) != len(cached_artifacts)):
+        save_cache(cache_file, artifacts)
+
+    contract_selectors: Dict[str, Dict[str, str]] = {}
+    for key in keys:
+        contract_selectors.update(artifacts[key]["contracts"])
+
+    return contract_selectors
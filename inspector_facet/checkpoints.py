@@ -0,0 +1,240 @@
+"""
+Block-indexed store of Diamond states, for point-in-time queries ("what did the Diamond look like at block
+N?") without replaying the whole history of the Diamond.
+
+A checkpoint store is a directory built in one pass over the DiamondCut events in a crawldata file. It
+contains:
+- events.jsonl: the DiamondCut events, one per line, in chain order (ordering.event_sort_key)
+- checkpoints.jsonl: the facet state of the Diamond after every `interval` events, one per line
+- index.json: for each checkpoint, the event_sort_key of the last event it includes and the byte offsets of
+  the checkpoint and of the next event in the files above
+
+Point-in-time queries replay the events in chain order, as --sort-events does, even if the crawldata file
+lists them in another order. (Duplicated events are not dropped, however - normalize the crawldata file with
+inspector_facet.ordering first if it may contain any.)
+
+A query binary-searches the index for the latest checkpoint at or before the requested block, reads that
+one checkpoint and replays at most `interval` events on top of it.
+
+The store only holds facet states, not inspection results, so it stays valid when the project's ABIs
+change.
+"""
+import bisect
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .facets import (
+    apply_diamond_cut,
+    facets_from_raw_facets,
+    iter_moonworm_crawldata,
+    raw_facets_from_facets,
+)
+from .ordering import event_sort_key
+
+STORE_VERSION = 2
+DEFAULT_CHECKPOINT_INTERVAL = 256
+
+INDEX_FILE = "index.json"
+EVENTS_FILE = "events.jsonl"
+CHECKPOINTS_FILE = "checkpoints.jsonl"
+
+# event_sort_key of the (empty) state before the first event.
+INITIAL_KEY = (-1, -1, -1)
+
+
+def query_position(sort_key: Tuple[int, int, int]) -> Tuple[int, int]:
+    """
+    (blockNumber, logIndex) of the event with the given event_sort_key, for comparison with query_key. Log
+    indices are numbered across the whole block, so within a block they are in the same order as
+    (transactionIndex, logIndex).
+    """
+    return (sort_key[0], sort_key[2])
+
+
+def query_key(block_number: int, log_index: Optional[int] = None) -> Tuple[int, float]:
+    """
+    Position which sorts after every event up to and including the given log in the given block (or after
+    every event in the block, if log_index is None).
+    """
+    if log_index is None:
+        return (block_number, float("inf"))
+    return (block_number, log_index)
+
+
+def events_up_to(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    block_number: int,
+    log_index: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    DiamondCut events up to and including the given block (and log index, if provided), in chain order
+    (ordering.event_sort_key).
+    """
+    key = query_key(block_number, log_index)
+    return sorted(
+        (
+            event
+            for event in diamond_cut_events
+            if query_position(event_sort_key(event)) <= key
+        ),
+        key=event_sort_key,
+    )
+
+
+def crawldata_signature(crawldata_jsonl: str) -> Dict[str, Any]:
+    stat = os.stat(crawldata_jsonl)
+    return {
+        "crawldata": os.path.abspath(crawldata_jsonl),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def build_checkpoint_store(
+    crawldata_jsonl: str,
+    store_dir: str,
+    interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+) -> None:
+    """
+    Builds a checkpoint store for the given crawldata file in store_dir, replacing any store already there.
+    """
+    if interval < 1:
+        raise ValueError(f"Checkpoint interval must be positive: {interval}")
+
+    events = sorted(iter_moonworm_crawldata(crawldata_jsonl), key=event_sort_key)
+
+    os.makedirs(store_dir, exist_ok=True)
+    raw_facets: Dict[str, Dict[int, None]] = {}
+    selector_index: Dict[int, str] = {}
+    checkpoints: List[Dict[str, Any]] = []
+    last_key = INITIAL_KEY
+    with open(os.path.join(store_dir, EVENTS_FILE), "wb") as events_fp, open(
+        os.path.join(store_dir, CHECKPOINTS_FILE), "wb"
+    ) as checkpoints_fp:
+        for step, event in enumerate(events):
+            if step % interval == 0:
+                checkpoints.append(
+                    {
+                        "key": list(last_key),
+                        "events_applied": step,
+                        "offset": checkpoints_fp.tell(),
+                        "events_offset": events_fp.tell(),
+                    }
+                )
+                # List of pairs rather than an object, so that the order of the facets is explicit.
+                state = [
+                    [address, selectors]
+                    for address, selectors in facets_from_raw_facets(
+                        raw_facets, keep_empty=True
+                    ).items()
+                ]
+                checkpoints_fp.write(json.dumps(state).encode("utf-8") + b"\n")
+
+            apply_diamond_cut(raw_facets, selector_index, event)
+            last_key = event_sort_key(event)
+            stored_event = {
+                "blockNumber": event["blockNumber"],
+                "transactionIndex": event.get("transactionIndex"),
+                "logIndex": event.get("logIndex"),
+                "transactionHash": event.get("transactionHash"),
+                "args": {"_diamondCut": event["args"]["_diamondCut"]},
+            }
+            events_fp.write(json.dumps(stored_event).encode("utf-8") + b"\n")
+
+    index = {
+        "version": STORE_VERSION,
+        "interval": interval,
+        "num_events": len(events),
+        "source": crawldata_signature(crawldata_jsonl),
+        "checkpoints": checkpoints,
+    }
+    # The index is written last, and atomically, so that an interrupted build never leaves behind a store
+    # which looks complete.
+    index_file = os.path.join(store_dir, INDEX_FILE)
+    temp_file = f"{index_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as ofp:
+        json.dump(index, ofp)
+    os.replace(temp_file, index_file)
+
+
+class CheckpointStore:
+    """
+    Reads point-in-time facet states from a checkpoint store built by build_checkpoint_store.
+    """
+
+    def __init__(self, store_dir: str) -> None:
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, INDEX_FILE), "r") as ifp:
+            self.index = json.load(ifp)
+        if self.index.get("version") != STORE_VERSION:
+            raise ValueError(
+                f"Unsupported checkpoint store version in {store_dir}: {self.index.get('version')}"
+            )
+        self.checkpoints = self.index["checkpoints"]
+        self.checkpoint_positions = [
+            query_position(checkpoint["key"]) for checkpoint in self.checkpoints
+        ]
+
+    def __len__(self) -> int:
+        return self.index["num_events"]
+
+    def is_stale(self, crawldata_jsonl: str) -> bool:
+        """
+        True if the store was built from a different crawldata file, or from an earlier version of this
+        one.
+        """
+        return self.index["source"] != crawldata_signature(crawldata_jsonl)
+
+    def facets_at(
+        self, block_number: int, log_index: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Facets of the Diamond after all the DiamondCut events up to and including the given block (and log
+        index, if provided). Produces the same output as facets.facets_from_events on those events.
+        """
+        key = query_key(block_number, log_index)
+        raw_facets: Dict[str, Dict[int, None]] = {}
+        selector_index: Dict[int, str] = {}
+
+        if self.checkpoints:
+            # The first checkpoint (the empty state) precedes every event, so it is used for blocks before
+            # the first event.
+            checkpoint_index = max(bisect.bisect_right(self.checkpoint_positions, key) - 1, 0)
+            checkpoint = self.checkpoints[checkpoint_index]
+            with open(os.path.join(self.store_dir, CHECKPOINTS_FILE), "rb") as ifp:
+                ifp.seek(checkpoint["offset"])
+                state = json.loads(ifp.readline())
+            raw_facets, selector_index = raw_facets_from_facets(dict(state))
+
+            with open(os.path.join(self.store_dir, EVENTS_FILE), "rb") as ifp:
+                ifp.seek(checkpoint["events_offset"])
+                for _ in range(checkpoint["events_applied"], len(self)):
+                    event = json.loads(ifp.readline())
+                    if query_position(event_sort_key(event)) > key:
+                        break
+                    apply_diamond_cut(raw_facets, selector_index, event)
+
+        return facets_from_raw_facets(raw_facets)
+
+
+def open_checkpoint_store(
+    crawldata_jsonl: str,
+    store_dir: str,
+    interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+) -> CheckpointStore:
+    """
+    Opens the checkpoint store in store_dir, first (re)building it if it does not exist yet or is out of
+    date with respect to the crawldata file.
+    """
+    if os.path.isfile(os.path.join(store_dir, INDEX_FILE)):
+        try:
+            store = CheckpointStore(store_dir)
+        except ValueError:
+            pass
+        else:
+            if not store.is_stale(crawldata_jsonl):
+                return store
+
+    build_checkpoint_store(crawldata_jsonl, store_dir, interval)
+    return CheckpointStore(store_dir)
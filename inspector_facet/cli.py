@@ -1,48 +1,159 @@
 import argparse
+import io
 import json
+import multiprocessing
 import sys
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
 
-from .abi import brownie_project_abis, foundry_project_abis
+from .batch import inspect_batch, inspect_crawldata_by_address, load_manifest
+from .checkpoints import events_up_to, open_checkpoint_store
+from .delta import DEFAULT_SNAPSHOT_INTERVAL, delta_timeline_from_events
 from .facets import (
-    events_from_moonworm_crawldata,
+    iter_moonworm_crawldata,
     facets_from_loupe,
     facets_from_events,
     CUT_ACTION_ADD,
     CUT_ACTION_REMOVE,
     CUT_ACTION_REPLACE,
 )
+from .follow import DEFAULT_POLL_INTERVAL, follow_crawldata
+from .history import selector_history_from_crawldata
 from .inspector import inspect_diamond
+from .loupe import facets_from_rpc
+from .matching import selector_to_int
+from .ordering import normalized_events
+from .profiling import disable_profiling, enable_profiling, profiled_iterator, stage
+from .project import list_build_files, load_contract_selectors, project_framework
+from .signatures import SignatureDatabase
+from .timeline import (
+    DEFAULT_SEGMENT_SIZE,
+    initialize_timeline_worker,
+    segment_timeline,
+    timeline_from_events,
+    timeline_segments,
+)
 from .version import VERSION
 
 
+# Human-readable output is written through a buffer of this size, rather than line by line.
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+# In --format ndjson mode, output is flushed at least this often (in lines and in seconds), so that
+# consumers can process long timelines incrementally.
+NDJSON_FLUSH_LINES = 100
+NDJSON_FLUSH_SECONDS = 1.0
+
+FORMATS = ["json", "human", "ndjson", "delta"]
+
+MAX_SELECTOR = (1 << 32) - 1
+
+# Output format and signature database used by render_timeline_segment. Set once per worker process by
+# initialize_timeline_render_worker.
+_worker_format: Optional[str] = None
+_worker_signature_db: Optional[SignatureDatabase] = None
+
+
+def buffered_stdout() -> TextIO:
+    """
+    Returns a large-buffered text stream writing to the same file descriptor as sys.stdout, or sys.stdout
+    itself if it is not backed by a file descriptor. The caller is responsible for flushing it.
+    """
+    try:
+        fileno = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return sys.stdout
+    sys.stdout.flush()
+    return open(
+        fileno,
+        "w",
+        buffering=OUTPUT_BUFFER_SIZE,
+        encoding=sys.stdout.encoding,
+        closefd=False,
+    )
+
+
+class NDJSONWriter:
+    """
+    Writes one JSON object per line to an output stream, flushing the stream every NDJSON_FLUSH_LINES lines
+    or NDJSON_FLUSH_SECONDS seconds, whichever comes first.
+    """
+
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self.unflushed_lines = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, item: Any) -> None:
+        self.out.write(json.dumps(item) + "\n")
+        self.unflushed_lines += 1
+        now = time.monotonic()
+        if (
+            self.unflushed_lines >= NDJSON_FLUSH_LINES
+            or now - self.last_flush >= NDJSON_FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        self.out.flush()
+        self.unflushed_lines = 0
+        self.last_flush = time.monotonic()
+
+
+def selector_functions(
+    result: Dict[str, Any], maybe_previous_result: Optional[Dict[str, Any]] = None
+) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Maps each selector in the given inspection results to the distinct (contract, function) pairs that it
+    was matched to, in order of first appearance.
+    """
+    functions: Dict[str, Dict[Tuple[str, str], None]] = {}
+    results = [result]
+    if maybe_previous_result is not None:
+        results.append(maybe_previous_result)
+    for known_result in results:
+        for address_result in known_result.values():
+            for item in address_result["selectors"]:
+                functions.setdefault(item["selector"], {})[
+                    (item["contract"], item["function"])
+                ] = None
+    return {selector: list(pairs) for selector, pairs in functions.items()}
+
+
 def print_timeline_event_for_human(
     result: Dict[str, Any],
     maybe_previous_result: Optional[Dict[str, Any]],
     event: Dict[str, Any],
+    out: Optional[TextIO] = None,
+    signature_db: Optional[SignatureDatabase] = None,
 ) -> None:
-    print(
+    if out is None:
+        out = sys.stdout
+
+    lines: List[str] = []
+    lines.append(
         f"# DiamondCut at block number {event['blockNumber']} (transaction hash: {event['transactionHash']})"
     )
 
     cuts = event["args"]["_diamondCut"]
     initializer_address = event["args"]["_init"]
     calldata = event["args"]["_calldata"]
-    print(
+    lines.append(
         f"Cuts were made with initializer: {initializer_address} (calldata: {calldata})"
     )
 
-    print("## Modifications")
+    lines.append("## Modifications")
+    known_functions = selector_functions(result, maybe_previous_result)
     for cut in cuts:
         facet_address = cut[0]
         action = cut[1]
         selectors = cut[2]
 
         if facet_address not in result:
-            print(f"### Facet at address: {facet_address}")
-            print("This address did not match any of the given contracts.")
+            lines.append(f"### Facet at address: {facet_address}")
+            lines.append("This address did not match any of the given contracts.")
         else:
-            print(
+            lines.append(
                 f"This address could be one of the following contracts: {' or '.join(result[facet_address]['matches'])}."
             )
 
@@ -52,66 +163,403 @@ def print_timeline_event_for_human(
         elif action == CUT_ACTION_REPLACE:
             action_text = "replaced"
 
-        print(f"The following selectors were {action_text} on the Diamond:")
-        all_selectors: List[Tuple[str, str, str]] = [
-            (item["contract"], item["function"], item["selector"])
-            for known_facet_address in result
-            for item in result[known_facet_address]["selectors"]
-        ]
-        if maybe_previous_result is not None:
-            all_selectors += [
-                (item["contract"], item["function"], item["selector"])
-                for known_facet_address in maybe_previous_result
-                for item in maybe_previous_result[known_facet_address]["selectors"]
-            ]
-        all_selectors = list(set(all_selectors))
-
-        selector_matches: Dict[str, List[Tuple[str, str]]] = {}
+        lines.append(f"The following selectors were {action_text} on the Diamond:")
         for selector in selectors:
-            selector_matches[selector] = []
-            for contract, function, known_selector in all_selectors:
-                if selector == known_selector:
-                    selector_matches[selector].append((contract, function))
-
-        for selector in selectors:
-            if not selector_matches[selector]:
-                print(f"\t{selector}")
+            selector_matches = known_functions.get(selector)
+            signatures = (
+                signature_db.lookup(selector)
+                if not selector_matches and signature_db is not None
+                else []
+            )
+            if signatures:
+                lines.append(
+                    f"\t{selector} - {' or '.join(signatures)} (from signature database)"
+                )
+            elif not selector_matches:
+                lines.append(f"\t{selector}")
             else:
                 snippets = [
                     f"{function} from {contract}"
-                    for contract, function in selector_matches[selector]
+                    for contract, function in selector_matches
                 ]
-                print(f"\t{selector} - {' or '.join(snippets)}")
-    print("## Cumulative functionality")
-    print_result_for_human(result)
+                lines.append(f"\t{selector} - {' or '.join(snippets)}")
+    lines.append("## Cumulative functionality")
+    out.write("\n".join(lines) + "\n")
+    print_result_for_human(result, out)
+
 
+def print_result_for_human(result: Dict[str, Any], out: Optional[TextIO] = None) -> None:
+    if out is None:
+        out = sys.stdout
 
-def print_result_for_human(result: Dict[str, Any]) -> None:
     for address, address_result in result.items():
-        print(f"### Facet at address: {address}")
-        print(f"Possible contracts: {', '.join(address_result['matches'])}")
+        misses: Dict[str, List[Dict[str, str]]] = {}
+        for item in address_result["misses"]:
+            misses.setdefault(item["contract"], []).append(item)
+        selectors: Dict[str, List[Dict[str, str]]] = {}
+        for item in address_result["selectors"]:
+            selectors.setdefault(item["contract"], []).append(item)
+
+        lines: List[str] = []
+        lines.append(f"### Facet at address: {address}")
+        lines.append(f"Possible contracts: {', '.join(address_result['matches'])}")
         for contract_name in address_result["matches"]:
-            misses = [
-                item
-                for item in address_result["misses"]
-                if item["contract"] == contract_name
-            ]
-
-            selectors = [
-                item
-                for item in address_result["selectors"]
-                if item["contract"] == contract_name
-            ]
-
-            print(f"{contract_name}:")
-            print(f"\tMissing methods:")
-            for item in misses:
-                print(
+            lines.append(f"{contract_name}:")
+            lines.append(f"\tMissing methods:")
+            for item in misses.get(contract_name, []):
+                lines.append(
                     f"\t\tMissing selector: {item['selector']}, Function: {item['function']}"
                 )
-            print(f"\tMounted selectors:")
-            for item in selectors:
-                print(f"\t\tSelector: {item['selector']}, Function: {item['function']}")
+            lines.append(f"\tMounted selectors:")
+            for item in selectors.get(contract_name, []):
+                lines.append(
+                    f"\t\tSelector: {item['selector']}, Function: {item['function']}"
+                )
+        if address_result.get("unknown"):
+            lines.append("Selectors not defined by any possible contract:")
+            for item in address_result["unknown"]:
+                if item["signatures"]:
+                    lines.append(
+                        f"\tSelector: {item['selector']}, Signatures from signature database: {' or '.join(item['signatures'])}"
+                    )
+                else:
+                    lines.append(
+                        f"\tSelector: {item['selector']}, not in signature database"
+                    )
+        out.write("\n".join(lines) + "\n")
+
+
+def print_selector_history_for_human(
+    selector: str, intervals: List[Dict[str, Any]], out: Optional[TextIO] = None
+) -> None:
+    if out is None:
+        out = sys.stdout
+
+    lines: List[str] = [f"# Selector: {selector}"]
+    if not intervals:
+        lines.append("This selector was never mounted on the Diamond.")
+    for interval in intervals:
+        lines.append(
+            f"Facet: {interval['facet']} ({interval['action']} at block number {interval['start_block']}, transaction hash: {interval['start_transaction']})"
+        )
+        if interval["end_block"] is None:
+            lines.append("\tStill serves this selector")
+        else:
+            lines.append(
+                f"\tUntil {interval['end_action']} at block number {interval['end_block']} (transaction hash: {interval['end_transaction']})"
+            )
+        if interval["matches"]:
+            lines.append(f"\tPossible contracts: {', '.join(interval['matches'])}")
+    out.write("\n".join(lines) + "\n")
+
+
+def crawldata_events(args: argparse.Namespace) -> Iterable[Dict[str, Any]]:
+    """
+    DiamondCut events from the --crawldata file, sorted and deduplicated if --sort-events was specified.
+    """
+    events = iter_moonworm_crawldata(args.crawldata)
+    if args.sort_events:
+        return normalized_events(events)
+    return events
+
+
+def load_signature_db(args: argparse.Namespace) -> Optional[SignatureDatabase]:
+    if args.signature_db is None:
+        return None
+    return SignatureDatabase(args.signature_db)
+
+
+def write_batch_results(
+    args: argparse.Namespace, batch_results: Iterable[Dict[str, Any]], out: TextIO
+) -> None:
+    for batch_result in batch_results:
+        if args.format in ["json", "ndjson"]:
+            json.dump(batch_result, out)
+            out.write("\n")
+        elif args.format == "human":
+            out.write(f"# Diamond: {batch_result['name']}\n")
+            if "error" in batch_result:
+                out.write(f"Error: {batch_result['error']}\n")
+            else:
+                print_result_for_human(batch_result["result"], out)
+        out.flush()
+
+
+def run_batch(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    entries = load_manifest(args.batch)
+    write_batch_results(
+        args, inspect_batch(entries, contract_selectors, args.workers), out
+    )
+
+
+def run_by_address(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    write_batch_results(
+        args,
+        inspect_crawldata_by_address(args.crawldata, contract_selectors, args.workers),
+        out,
+    )
+
+
+def run_inspection(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    facets = None
+    if args.network is not None:
+        if args.address is None:
+            raise ValueError(
+                "You must provide an address for the Diamond contract that you want to pull facet information for from the network"
+            )
+        facets = facets_from_loupe(args.network, args.address)
+    elif args.rpc is not None:
+        if args.address is None:
+            raise ValueError(
+                "You must provide an address for the Diamond contract that you want to pull facet information for from the network"
+            )
+        facets = facets_from_rpc(args.rpc, args.address)
+    elif args.crawldata is not None and args.at_block is not None:
+        if args.state_store is not None:
+            store = open_checkpoint_store(args.crawldata, args.state_store)
+            facets = store.facets_at(args.at_block)
+        else:
+            facets = facets_from_events(events_up_to(crawldata_events(args), args.at_block))
+    elif args.crawldata is not None:
+        facets = facets_from_events(crawldata_events(args))
+
+    if facets is None:
+        raise ValueError(
+            "Could not reconstruct information about currently attached methods on Diamond"
+        )
+
+    result = inspect_diamond(
+        facets,
+        contract_selectors=contract_selectors,
+        signature_db=load_signature_db(args),
+    )
+
+    with stage("rendering"):
+        if args.format == "json":
+            json.dump(result, out)
+        elif args.format == "ndjson":
+            NDJSONWriter(out).write(result)
+        elif args.format == "human":
+            print_result_for_human(result, out)
+
+
+def run_follow(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    records = follow_crawldata(
+        args.crawldata,
+        contract_selectors,
+        checkpoint_file=args.checkpoint,
+        poll_interval=args.poll_interval,
+    )
+    for record in records:
+        # New events arrive sporadically, so every record is flushed as soon as it is written.
+        json.dump(record, out)
+        out.write("\n")
+        out.flush()
+
+
+def run_selector_history(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    with stage("selector_history"):
+        history = selector_history_from_crawldata(
+            args.crawldata, contract_selectors, args.history_index
+        )
+    selector_histories = {selector: history.lookup(selector) for selector in args.selector}
+
+    if args.format == "json":
+        json.dump(selector_histories, out)
+    elif args.format == "ndjson":
+        writer = NDJSONWriter(out)
+        for selector, intervals in selector_histories.items():
+            writer.write({"selector": selector, "intervals": intervals})
+        writer.flush()
+    elif args.format == "human":
+        for selector, intervals in selector_histories.items():
+            print_selector_history_for_human(selector, intervals, out)
+
+
+def run_timeline(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    if args.format == "delta":
+        records = delta_timeline_from_events(
+            crawldata_events(args),
+            contract_selectors=contract_selectors,
+            snapshot_interval=args.snapshot_interval,
+        )
+        writer = NDJSONWriter(out)
+        for record in profiled_iterator("timeline", records):
+            with stage("rendering"):
+                writer.write(record)
+        writer.flush()
+        return
+
+    timeline = profiled_iterator(
+        "timeline",
+        timeline_from_events(
+            crawldata_events(args),
+            contract_selectors=contract_selectors,
+        ),
+    )
+
+    if args.format == "json":
+        results_with_diffs: List[Tuple[Dict[str, Any], Dict[str, Any]]] = list(
+            timeline
+        )
+        with stage("rendering"):
+            json.dump(results_with_diffs, out)
+    elif args.format == "ndjson":
+        # Each line is the [result, event] pair for one step of the timeline, written as soon as it has
+        # been computed.
+        writer = NDJSONWriter(out)
+        for result_with_diff in timeline:
+            with stage("rendering"):
+                writer.write(result_with_diff)
+        writer.flush()
+    elif args.format == "human":
+        signature_db = load_signature_db(args)
+        maybe_previous_result: Optional[Dict[str, Any]] = None
+        for result, event in timeline:
+            with stage("rendering"):
+                print_timeline_event_for_human(
+                    result, maybe_previous_result, event, out, signature_db
+                )
+            maybe_previous_result = result
+
+
+def initialize_timeline_render_worker(
+    contract_selectors: Dict[str, Dict[str, str]],
+    output_format: str,
+    signature_db_file: Optional[str],
+) -> None:
+    global _worker_format, _worker_signature_db
+    initialize_timeline_worker(contract_selectors)
+    _worker_format = output_format
+    if output_format == "human" and signature_db_file is not None:
+        _worker_signature_db = SignatureDatabase(signature_db_file)
+
+
+def render_timeline_segment(
+    segment: Tuple[int, Dict[str, List[str]], List[Dict[str, Any]]]
+) -> str:
+    """
+    Computes and renders one segment of a timeline in a worker process. The rendered segments, written in
+    order, are identical to the output of the sequential timeline (in json format, once the segments are
+    separated by ", " and wrapped in brackets).
+    """
+    maybe_previous_result, results_with_events = segment_timeline(segment)
+    if _worker_format == "json":
+        return ", ".join(json.dumps(result_with_event) for result_with_event in results_with_events)
+    elif _worker_format == "ndjson":
+        return "".join(
+            json.dumps(result_with_event) + "\n" for result_with_event in results_with_events
+        )
+
+    out = io.StringIO()
+    for result, event in results_with_events:
+        print_timeline_event_for_human(
+            result, maybe_previous_result, event, out, _worker_signature_db
+        )
+        maybe_previous_result = result
+    return out.getvalue()
+
+
+def run_parallel_timeline(
+    args: argparse.Namespace,
+    contract_selectors: Dict[str, Dict[str, str]],
+    out: TextIO,
+) -> None:
+    """
+    Produces the same output as run_timeline, with the matching and rendering of each segment of
+    --segment-size events done by a pool of --workers worker processes.
+    """
+    with multiprocessing.Pool(
+        processes=args.workers,
+        initializer=initialize_timeline_render_worker,
+        initargs=(contract_selectors, args.format, args.signature_db),
+    ) as pool:
+        rendered_segments = profiled_iterator(
+            "timeline",
+            pool.imap(
+                render_timeline_segment,
+                timeline_segments(crawldata_events(args), args.segment_size),
+            ),
+        )
+        if args.format == "json":
+            out.write("[")
+            for i, rendered_segment in enumerate(rendered_segments):
+                if i > 0:
+                    out.write(", ")
+                out.write(rendered_segment)
+            out.write("]")
+        else:
+            for rendered_segment in rendered_segments:
+                out.write(rendered_segment)
+                if args.format == "ndjson":
+                    out.flush()
+
+
+def write_profile_report(report: Dict[str, Any], profile_output: Optional[str]) -> None:
+    if profile_output is None:
+        json.dump(report, sys.stderr)
+        sys.stderr.write("\n")
+    else:
+        with open(profile_output, "w") as ofp:
+            json.dump(report, ofp)
+
+
+def run(args: argparse.Namespace, contract_selectors: Dict[str, Dict[str, str]]) -> None:
+    out = buffered_stdout()
+    try:
+        if args.batch is not None:
+            run_batch(args, contract_selectors, out)
+        elif args.by_address:
+            run_by_address(args, contract_selectors, out)
+        elif args.follow:
+            run_follow(args, contract_selectors, out)
+        elif args.selector is not None:
+            run_selector_history(args, contract_selectors, out)
+        elif args.timeline and args.workers not in [None, 1] and args.format != "delta":
+            run_parallel_timeline(args, contract_selectors, out)
+        elif args.timeline:
+            run_timeline(args, contract_selectors, out)
+        else:
+            run_inspection(args, contract_selectors, out)
+    finally:
+        out.flush()
+
+
+def selector_argument(value: str) -> str:
+    """
+    Validates a selector given on the command line: a hex string (0x-prefixed or not) of at most 4 bytes.
+    """
+    try:
+        selector_int = selector_to_int(value)
+    except ValueError:
+        selector_int = -1
+    if not 0 <= selector_int <= MAX_SELECTOR:
+        raise argparse.ArgumentTypeError(f"invalid selector: {value}")
+    return value
 
 
 def main():
@@ -127,6 +575,14 @@ def main():
         "--crawldata",
         help="Path to JSONL (JSON Lines) file containing moonworm crawl data for contract",
     )
+    raw_data_group.add_argument(
+        "--rpc",
+        help="JSON-RPC URL of a blockchain node to query for facet information directly (without brownie)",
+    )
+    raw_data_group.add_argument(
+        "--batch",
+        help="Path to JSON manifest listing the Diamond contracts to inspect (each with either a crawldata file or a network and address)",
+    )
 
     parser.add_argument("--address", required=False, help="Address of Diamond contract")
 
@@ -134,9 +590,9 @@ def main():
 
     parser.add_argument(
         "--format",
-        choices=["json", "human"],
+        choices=FORMATS,
         default="json",
-        help="Format in which to print output",
+        help="Format in which to print output (ndjson writes one JSON object per line, and in --timeline mode writes each step of the timeline as soon as it is computed; delta writes a delta-encoded timeline and can only be used with --timeline)",
     )
 
     parser.add_argument(
@@ -145,69 +601,215 @@ def main():
         help="Produce a timeline view of the changes to the Diamond contract (can only be used with --crawldata)",
     )
 
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep watching the --crawldata file for new DiamondCut events, writing a snapshot of the current state followed by one delta-encoded timeline record (as in --format delta) per new event",
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Path to a file in which --follow mode checkpoints its state, so that it can resume from where it left off when restarted",
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Number of seconds between checks for new events in --follow mode. Default: {DEFAULT_POLL_INTERVAL}",
+    )
+
+    parser.add_argument(
+        "--sort-events",
+        action="store_true",
+        help="Sort the DiamondCut events in the --crawldata file into chain order and drop duplicated events before reconstructing the Diamond, for crawldata which was re-crawled or crosses a reorg. Sorting uses bounded memory, however large the file.",
+    )
+
+    parser.add_argument(
+        "--by-address",
+        action="store_true",
+        help="Inspect every Diamond contract with DiamondCut events in the --crawldata file, in parallel, writing one result per contract address in the same format as --batch",
+    )
+
+    parser.add_argument(
+        "--at-block",
+        type=int,
+        default=None,
+        help="Inspect the Diamond contract as it was at the end of the given block (can only be used with --crawldata). The DiamondCut events up to the block are replayed in chain order, whatever their order in the --crawldata file.",
+    )
+
+    parser.add_argument(
+        "--state-store",
+        default=None,
+        help="Directory in which to keep a block-indexed store of checkpointed Diamond states for --at-block queries. It is built on first use and rebuilt when the --crawldata file changes.",
+    )
+
+    parser.add_argument(
+        "--selector",
+        action="append",
+        default=None,
+        type=selector_argument,
+        help="Print the history of the given selector - every facet which served it, and the blocks at which that changed (can only be used with --crawldata, can be repeated)",
+    )
+
+    parser.add_argument(
+        "--history-index",
+        default=None,
+        help="Path to a file in which to keep the selector history index for --selector queries. It is rebuilt when the --crawldata file or the project's contracts change.",
+    )
+
+    parser.add_argument(
+        "--snapshot-interval",
+        type=int,
+        default=DEFAULT_SNAPSHOT_INTERVAL,
+        help=f"Number of events between full snapshots in a delta-encoded timeline (--format delta). Default: {DEFAULT_SNAPSHOT_INTERVAL}",
+    )
+
     parser.add_argument(
         "--foundry",
         action="store_true",
         help="Use the foundry project structure instead of the brownie project structure",
     )
 
+    parser.add_argument(
+        "--hardhat",
+        action="store_true",
+        help="Use the hardhat project structure instead of the brownie project structure. Contracts are loaded from the build-info files and named by their fully qualified names (<source>:<contract>)",
+    )
+
     parser.add_argument("--build-dir", default=None, required=False, help="Name of build directory (if it isn't the default name)")
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        help="Glob pattern for build artifacts to load, matched against the artifact path relative to the build directory and against each component of that path (can be repeated)",
+    )
 
-    if not args.foundry:
-        abis = brownie_project_abis(args.project, args.build_dir)
-    else:
-        abis = foundry_project_abis(args.project, args.build_dir)
-
-    if not args.timeline:
-        facets = None
-        if args.network is not None:
-            if args.address is None:
-                raise ValueError(
-                    "You must provide an address for the Diamond contract that you want to pull facet information for from the network"
-                )
-            facets = facets_from_loupe(args.network, args.address)
-        elif args.crawldata is not None:
-            diamond_cut_events = events_from_moonworm_crawldata(args.crawldata)
-            facets = facets_from_events(diamond_cut_events)
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help="Glob pattern for build artifacts to skip, e.g. '*.t.sol' or '*.s.sol' for foundry tests and scripts (can be repeated)",
+    )
 
-        if facets is None:
-            raise ValueError(
-                "Could not reconstruct information about currently attached methods on Diamond"
-            )
+    parser.add_argument(
+        "--selector-cache",
+        default=None,
+        required=False,
+        help="Path to a file in which to cache the function selectors computed from the project's build artifacts. Only artifacts which changed since the cache was written are re-hashed.",
+    )
 
-        result = inspect_diamond(facets, abis)
+    parser.add_argument(
+        "--signature-db",
+        default=None,
+        help="Path to a signature database (see `python -m inspector_facet.signatures import --help`) used to identify selectors which are not defined by any of the project's contracts",
+    )
 
-        if args.format == "json":
-            json.dump(result, sys.stdout)
-        elif args.format == "human":
-            print_result_for_human(result)
-        else:
-            raise ValueError(f"Unknown format: {args.format}")
-    else:
-        if args.crawldata is None:
-            raise ValueError("--timeline mode can only be used with --crawldata")
-
-        diamond_cut_events = events_from_moonworm_crawldata(args.crawldata)
-        results_with_diffs: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
-        for i, event in enumerate(diamond_cut_events):
-            intermediate_result = inspect_diamond(
-                facets_from_events(diamond_cut_events[: i + 1]), abis
-            )
-            results_with_diffs.append((intermediate_result, event))
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the wall time and call count of each stage of the run (loading artifacts, hashing selectors, decoding crawldata, matching, rendering, ...) and write them as JSON to stderr when the run finishes",
+    )
 
-        if args.format == "json":
-            json.dump(results_with_diffs, sys.stdout)
-        elif args.format == "human":
-            for i, item in enumerate(results_with_diffs):
-                result, event = item
-                maybe_previous_result: Optional[Dict[str, Any]] = None
-                if i > 0:
-                    maybe_previous_result = results_with_diffs[i - 1][0]
-                print_timeline_event_for_human(result, maybe_previous_result, event)
-        else:
-            raise ValueError(f"Unknown format: {args.format}")
+    parser.add_argument(
+        "--profile-output",
+        default=None,
+        help="Write the --profile report to this file instead of stderr",
+    )
+
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also record the peak memory of each stage in the --profile report (slows the run down considerably)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes to use in --batch and --by-address modes (defaults to the number of CPUs). In --timeline mode (except with --format delta), segments of the timeline are computed in parallel by this many worker processes - by default, the timeline is computed sequentially.",
+    )
+
+    parser.add_argument(
+        "--segment-size",
+        type=int,
+        default=DEFAULT_SEGMENT_SIZE,
+        help=f"Number of events in each segment of a timeline computed with --workers. Default: {DEFAULT_SEGMENT_SIZE}",
+    )
+
+    args = parser.parse_args()
+
+    if args.batch is not None and args.timeline:
+        raise ValueError("--timeline mode cannot be used with --batch")
+    if args.timeline and args.crawldata is None:
+        raise ValueError("--timeline mode can only be used with --crawldata")
+    if args.format not in FORMATS:
+        raise ValueError(f"Unknown format: {args.format}")
+    if args.follow and args.crawldata is None:
+        raise ValueError("--follow mode can only be used with --crawldata")
+    if args.follow and args.timeline:
+        raise ValueError("--follow mode cannot be used with --timeline")
+    if args.at_block is not None and args.crawldata is None:
+        raise ValueError("--at-block can only be used with --crawldata")
+    if args.at_block is not None and (args.timeline or args.follow):
+        raise ValueError("--at-block cannot be used with --timeline or --follow")
+    if args.state_store is not None and args.at_block is None:
+        raise ValueError("--state-store can only be used with --at-block")
+    if args.selector is not None and args.crawldata is None:
+        raise ValueError("--selector can only be used with --crawldata")
+    if args.selector is not None and (
+        args.timeline or args.follow or args.at_block is not None
+    ):
+        raise ValueError("--selector cannot be used with --timeline, --follow or --at-block")
+    if args.history_index is not None and args.selector is None:
+        raise ValueError("--history-index can only be used with --selector")
+    framework = project_framework(args.foundry, args.hardhat)
+    if args.by_address and args.crawldata is None:
+        raise ValueError("--by-address can only be used with --crawldata")
+    if args.by_address and (
+        args.timeline
+        or args.follow
+        or args.at_block is not None
+        or args.selector is not None
+    ):
+        raise ValueError(
+            "--by-address cannot be used with --timeline, --follow, --at-block or --selector"
+        )
+    if args.sort_events and args.crawldata is None:
+        raise ValueError("--sort-events can only be used with --crawldata")
+    if args.sort_events and (
+        args.follow
+        or args.by_address
+        or args.state_store is not None
+        or args.selector is not None
+    ):
+        raise ValueError(
+            "--sort-events cannot be used with --follow, --by-address, --state-store or --selector (normalize the crawldata file with `python -m inspector_facet.ordering` instead)"
+        )
+    if args.format == "delta" and not args.timeline:
+        raise ValueError("--format delta can only be used with --timeline")
+    if args.workers is not None and args.workers < 1:
+        parser.error(f"--workers must be at least 1, got {args.workers}")
+    if args.segment_size < 1:
+        parser.error(f"--segment-size must be at least 1, got {args.segment_size}")
+
+    if args.profile or args.profile_output is not None or args.profile_memory:
+        enable_profiling(trace_memory=args.profile_memory)
+
+    try:
+        build_files = list_build_files(
+            args.project, framework, args.build_dir, args.include, args.exclude
+        )
+        contract_selectors = load_contract_selectors(
+            build_files, framework, args.include, args.exclude, args.selector_cache
+        )
+        run(args, contract_selectors)
+    finally:
+        profiler = disable_profiling()
+        if profiler is not None:
+            write_profile_report(profiler.report(), args.profile_output)
 
 
 if __name__ == "__main__":
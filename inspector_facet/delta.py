@@ -0,0 +1,242 @@
+"""
+Delta-encoded timelines.
+
+A full timeline records the complete inspection result for the Diamond after every DiamondCut event, so its
+size grows with (number of events) x (number of selectors). A delta timeline instead records, for each
+event, only what that event changed, along with periodic full snapshots from which any step can be rebuilt.
+
+A delta timeline is a JSON Lines file with one record per DiamondCut event. Each record has the keys:
+- type: "snapshot" or "delta"
+- step: index of the event in the timeline (starting at 0)
+- blockNumber, transactionHash, logIndex: identify the event
+- added, replaced, removed: selectors added, replaced and removed by the event
+
+Delta records also have the keys:
+- new_facets: facet addresses seen for the first time in this event
+- facets: inspection results for the facets whose selectors changed in this event
+- dropped: facets which no longer serve any selectors after this event
+
+Snapshot records instead have the keys:
+- facet_order: every facet address seen so far, in order of first appearance
+- result: the full inspection result for the Diamond after this event
+"""
+import bisect
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from .facets import CUT_ACTION_ADD, CUT_ACTION_REMOVE, CUT_ACTION_REPLACE
+from .timeline import IncrementalInspector
+
+DEFAULT_SNAPSHOT_INTERVAL = 1000
+
+# Records are written with json.dumps, and "type" is the first key of every record, so each line starts with
+# one of these prefixes. Lines which start with neither (e.g. from a writer with other separators or key
+# order) are decoded to find their type.
+RECORD_TYPE_PREFIXES = {
+    b'{"type": "snapshot",': "snapshot",
+    b'{"type": "delta",': "delta",
+}
+
+
+def event_record(
+    record_type: str, step: int, event: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Fields common to snapshot and delta records. event may be None for a snapshot of a state which was not
+    reached by applying an event in this process (e.g. one restored from a checkpoint).
+    """
+    if event is None:
+        event = {"args": {"_diamondCut": []}}
+
+    record: Dict[str, Any] = {
+        "type": record_type,
+        "step": step,
+        "blockNumber": event.get("blockNumber"),
+        "transactionHash": event.get("transactionHash"),
+        "logIndex": event.get("logIndex"),
+    }
+    selectors_by_action: Dict[int, List[str]] = {
+        CUT_ACTION_ADD: [],
+        CUT_ACTION_REPLACE: [],
+        CUT_ACTION_REMOVE: [],
+    }
+    for _, action, selectors in event["args"]["_diamondCut"]:
+        selectors_by_action[action].extend(selectors)
+    record["added"] = selectors_by_action[CUT_ACTION_ADD]
+    record["replaced"] = selectors_by_action[CUT_ACTION_REPLACE]
+    record["removed"] = selectors_by_action[CUT_ACTION_REMOVE]
+    return record
+
+
+def snapshot_record(
+    inspector: IncrementalInspector, step: int, event: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Snapshot record for the current state of the given inspector, which is the state after the given
+    event.
+    """
+    record = event_record("snapshot", step, event)
+    record["facet_order"] = list(inspector.raw_facets)
+    record["result"] = inspector.result()
+    return record
+
+
+def delta_record(
+    inspector: IncrementalInspector,
+    step: int,
+    event: Dict[str, Any],
+    touched_facets: Set[str],
+    num_known_facets: int,
+) -> Dict[str, Any]:
+    """
+    Delta record for an event which was just applied to the given inspector. touched_facets is the return
+    value of inspector.update(event) and num_known_facets is the number of facets the inspector knew about
+    before the update.
+    """
+    record = event_record("delta", step, event)
+    record["new_facets"] = (
+        list(inspector.raw_facets)[num_known_facets:]
+        if len(inspector.raw_facets) > num_known_facets
+        else []
+    )
+    record["facets"] = {
+        address: inspector.facet_results[address]
+        for address in inspector.raw_facets
+        if address in touched_facets and address in inspector.facet_results
+    }
+    record["dropped"] = [
+        address
+        for address in inspector.raw_facets
+        if address in touched_facets and address not in inspector.facet_results
+    ]
+    return record
+
+
+def delta_timeline_from_events(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    abis: Optional[Dict[str, Any]] = None,
+    contract_selectors: Optional[Dict[str, Dict[str, str]]] = None,
+    snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields a delta timeline record for each of the given DiamondCut events. The first record, and every
+    snapshot_interval-th record after it, is a snapshot.
+    """
+    if snapshot_interval < 1:
+        raise ValueError("snapshot_interval must be at least 1")
+
+    inspector = IncrementalInspector(abis, contract_selectors)
+    for step, event in enumerate(diamond_cut_events):
+        num_known_facets = len(inspector.raw_facets)
+        touched_facets = inspector.update(event)
+        if step % snapshot_interval == 0:
+            yield snapshot_record(inspector, step, event)
+        else:
+            yield delta_record(inspector, step, event, touched_facets, num_known_facets)
+
+
+class DeltaTimelineState:
+    """
+    Inspection result for a Diamond, rebuilt from delta timeline records.
+    """
+
+    def __init__(self) -> None:
+        self.step = -1
+        self.facet_order: List[str] = []
+        self.facet_results: Dict[str, Dict[str, Any]] = {}
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        if record["type"] == "snapshot":
+            self.facet_order = list(record["facet_order"])
+            self.facet_results = dict(record["result"])
+        else:
+            if record["step"] != self.step + 1:
+                raise ValueError(
+                    f"Delta timeline record for step {record['step']} cannot be applied to the state at step {self.step}"
+                )
+            self.facet_order.extend(record["new_facets"])
+            for address in record["dropped"]:
+                self.facet_results.pop(address, None)
+            self.facet_results.update(record["facets"])
+        self.step = record["step"]
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Inspection result at the current step - identical to the result at the same step of the full
+        timeline.
+        """
+        return {
+            address: self.facet_results[address]
+            for address in self.facet_order
+            if address in self.facet_results
+        }
+
+
+def results_from_delta_records(
+    records: Iterable[Dict[str, Any]]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Rebuilds the full inspection result after each step of a delta timeline.
+    """
+    state = DeltaTimelineState()
+    for record in records:
+        state.apply(record)
+        yield state.result()
+
+
+def record_line_type(line: bytes) -> str:
+    """
+    Type ("snapshot" or "delta") of the delta timeline record on a line of a delta timeline file.
+    """
+    for prefix, record_type in RECORD_TYPE_PREFIXES.items():
+        if line.startswith(prefix):
+            return record_type
+    record = json.loads(line)
+    if not isinstance(record, dict) or record.get("type") not in ["snapshot", "delta"]:
+        raise ValueError(f"Not a delta timeline record: {line!r}")
+    return record["type"]
+
+
+class DeltaTimelineReader:
+    """
+    Random access to the steps of a delta timeline file.
+
+    Opening the file indexes the byte offset of every record, noting which ones are snapshots, without
+    decoding them (see record_line_type). Rebuilding the state at a step then decodes only the closest snapshot at or before that
+    step and the delta records after it.
+    """
+
+    def __init__(self, delta_timeline_jsonl: str) -> None:
+        self.path = delta_timeline_jsonl
+        self.offsets: List[int] = []
+        self.snapshot_steps: List[int] = []
+        with open(self.path, "rb") as ifp:
+            offset = 0
+            for line in ifp:
+                if line.strip():
+                    if record_line_type(line) == "snapshot":
+                        self.snapshot_steps.append(len(self.offsets))
+                    self.offsets.append(offset)
+                offset += len(line)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def result_at(self, step: int) -> Dict[str, Any]:
+        """
+        Inspection result after the event at the given step.
+        """
+        if step < 0 or step >= len(self.offsets):
+            raise IndexError(f"Step {step} is out of range for timeline with {len(self.offsets)} steps")
+
+        snapshot_index = bisect.bisect_right(self.snapshot_steps, step) - 1
+        if snapshot_index < 0:
+            raise ValueError(f"No snapshot at or before step {step} in {self.path}")
+        snapshot_step = self.snapshot_steps[snapshot_index]
+
+        state = DeltaTimelineState()
+        with open(self.path, "rb") as ifp:
+            ifp.seek(self.offsets[snapshot_step])
+            for _ in range(step - snapshot_step + 1):
+                state.apply(json.loads(ifp.readline()))
+        return state.result()
@@ -1,41 +1,255 @@
 """
 Various methods to pull information about the facet-method correspondence for a deployed Diamond contract.
 """
+from contextlib import contextmanager
+import gzip
+import io
 import json
-from typing import Any, Dict, List
-
-from brownie import network
-
-from . import DiamondLoupeFacet
+import mmap
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
 
+from .matching import selector_to_hex, selector_to_int
+from .profiling import profiled_iterator, stage
 
 CUT_ACTION_ADD = 0
 CUT_ACTION_REPLACE = 1
 CUT_ACTION_REMOVE = 2
 
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+CRAWLDATA_BUFFER_SIZE = 1 << 20
+# Any line containing a DiamondCut event must contain this byte string. Lines without it are skipped before
+# they are JSON-decoded.
+DIAMOND_CUT_MARKER = b'"DiamondCut"'
+
 
 def facets_from_loupe(network_id: str, address: str) -> Dict[str, List[str]]:
-    network.connect(network_id)
-    contract = DiamondLoupeFacet.DiamondLoupeFacet(address)
-    mounted_facets = contract.facets()
+    # brownie is imported here rather than at module level because importing it takes seconds, and it
+    # is only needed when inspecting a Diamond contract on a live network.
+    with stage("brownie_import"):
+        from brownie import network
+
+        from . import DiamondLoupeFacet
+
+    with stage("network_connect"):
+        if network.is_connected() and network.show_active() != network_id:
+            network.disconnect()
+        if not network.is_connected():
+            network.connect(network_id)
+    with stage("loupe_query"):
+        contract = DiamondLoupeFacet.DiamondLoupeFacet(address)
+        mounted_facets = contract.facets()
     facets: Dict[str, List[str]] = {}
     for address, selectors in mounted_facets:
         facets[address] = [str(selector) for selector in selectors]
     return facets
 
 
-def events_from_moonworm_crawldata(crawldata_jsonl: str) -> List[Dict[str, Any]]:
-    diamond_cut_events: List[Dict[str, Any]] = []
-    with open(crawldata_jsonl, "r") as ifp:
-        for line in ifp:
+@contextmanager
+def open_crawldata(crawldata_jsonl: str) -> Iterator[Iterable[bytes]]:
+    """
+    Opens a moonworm crawldata file for reading and yields an iterable over its lines (as bytes).
+
+    Files ending in .gz are decompressed with gzip and files ending in .zst or .zstd with zstandard (which
+    must be installed separately: `pip install zstandard`). Compressed files are read through a large
+    buffer, and uncompressed files are memory-mapped.
+    """
+    if crawldata_jsonl.endswith(".gz"):
+        with gzip.open(crawldata_jsonl, "rb") as raw_ifp:
+            yield io.BufferedReader(raw_ifp, buffer_size=CRAWLDATA_BUFFER_SIZE)  # type: ignore
+    elif crawldata_jsonl.endswith(".zst") or crawldata_jsonl.endswith(".zstd"):
+        try:
+            import zstandard  # type: ignore
+        except ImportError:
+            raise ImportError(
+                f"Reading zstd-compressed crawldata ({crawldata_jsonl}) requires the zstandard package: pip install zstandard"
+            )
+        with open(crawldata_jsonl, "rb") as raw_ifp:
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                raw_ifp, read_size=CRAWLDATA_BUFFER_SIZE
+            )
+            yield io.BufferedReader(reader, buffer_size=CRAWLDATA_BUFFER_SIZE)
+    else:
+        with open(crawldata_jsonl, "rb") as raw_ifp:
+            if os.fstat(raw_ifp.fileno()).st_size == 0:
+                yield []
+                return
+            with mmap.mmap(raw_ifp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield iter(mapped.readline, b"")
+
+
+def iter_moonworm_crawldata(crawldata_jsonl: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yields the DiamondCut events from a JSON Lines file produced by `moonworm watch`.
+
+    Lines which do not mention DiamondCut are skipped without being decoded.
+    """
+    return profiled_iterator(  # type: ignore
+        "crawldata_decoding", _iter_moonworm_crawldata(crawldata_jsonl)
+    )
+
+
+def _iter_moonworm_crawldata(crawldata_jsonl: str) -> Iterator[Dict[str, Any]]:
+    with open_crawldata(crawldata_jsonl) as lines:
+        for line in lines:
+            if DIAMOND_CUT_MARKER not in line:
+                continue
             crawl_item = json.loads(line)
             if crawl_item.get("event", "") == "DiamondCut":
-                diamond_cut_events.append(crawl_item)
-    return diamond_cut_events
+                yield crawl_item
+
+
+def events_from_moonworm_crawldata(crawldata_jsonl: str) -> List[Dict[str, Any]]:
+    return list(iter_moonworm_crawldata(crawldata_jsonl))
+
+
+def partition_events_by_address(
+    diamond_cut_events: Iterable[Dict[str, Any]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Groups DiamondCut events by the address of the Diamond contract which emitted them, in a single pass
+    over the events. Addresses are compared case-insensitively, and each group is keyed by its address as it
+    first appeared. Events keep their relative order within each group.
+    """
+    partitions: Dict[str, List[Dict[str, Any]]] = {}
+    addresses: Dict[str, str] = {}
+    for event in diamond_cut_events:
+        address = event.get("address")
+        if address is None:
+            raise ValueError(
+                f"DiamondCut event at block number {event.get('blockNumber')} (transaction hash: {event.get('transactionHash')}) has no address"
+            )
+        address = addresses.setdefault(address.lower(), address)
+        partitions.setdefault(address, []).append(event)
+    return partitions
+
+
+class InvalidDiamondCut(ValueError):
+    """
+    Raised when a DiamondCut event cannot be applied to the facet state reconstructed from the events
+    before it - for example, when it replaces or removes a selector that is not mounted on the Diamond.
+    """
+
+    def __init__(self, event: Dict[str, Any], message: str) -> None:
+        super().__init__(
+            f"Invalid DiamondCut at block number {event.get('blockNumber')} (transaction hash: {event.get('transactionHash')}): {message}"
+        )
+        self.event = event
+
+
+def apply_diamond_cut(
+    raw_facets: Dict[str, Dict[int, None]],
+    selector_index: Dict[int, str],
+    event: Dict[str, Any],
+) -> Set[str]:
+    """
+    Applies the cuts from a single `DiamondCut` event to the given facet state in place.
+
+    raw_facets maps each facet address to the selectors it serves, as the keys of an insertion-ordered
+    dictionary (facets which no longer serve any selectors are kept with an empty dictionary), and
+    selector_index maps each selector to the address of the facet serving it. This makes adding, replacing
+    and removing a selector constant time operations. Selectors are held only as integers (see
+    matching.selector_to_int) - use facets_from_raw_facets to convert the state back to lists of selectors.
+
+    Returns the set of facet addresses whose selectors were modified by the event. Raises InvalidDiamondCut
+    if the event adds a selector which is already mounted, or replaces or removes one which is not.
+    """
+    touched_facets: Set[str] = set()
+    cut_items = event["args"]["_diamondCut"]
+    for item in cut_items:
+        facet_address = item[0]
+        action = item[1]
+        selectors = item[2]
+
+        if action == CUT_ACTION_ADD:
+            facet_selectors = raw_facets.setdefault(facet_address, {})
+            for selector in selectors:
+                selector_int = selector_to_int(selector)
+                if selector_int in selector_index:
+                    raise InvalidDiamondCut(
+                        event,
+                        f"cannot add selector {selector} to facet {facet_address} - it is already served by facet {selector_index[selector_int]}",
+                    )
+                facet_selectors[selector_int] = None
+                selector_index[selector_int] = facet_address
+            touched_facets.add(facet_address)
+        elif action == CUT_ACTION_REPLACE:
+            facet_selectors = raw_facets.setdefault(facet_address, {})
+            for selector in selectors:
+                selector_int = selector_to_int(selector)
+                old_facet = selector_index.get(selector_int)
+                if old_facet is None:
+                    raise InvalidDiamondCut(
+                        event,
+                        f"cannot replace selector {selector} with facet {facet_address} - it is not served by any facet",
+                    )
+                if old_facet == facet_address:
+                    raise InvalidDiamondCut(
+                        event,
+                        f"cannot replace selector {selector} - it is already served by facet {facet_address}",
+                    )
+                facet_selectors[selector_int] = None
+                del raw_facets[old_facet][selector_int]
+                selector_index[selector_int] = facet_address
+                touched_facets.add(old_facet)
+            touched_facets.add(facet_address)
+        elif action == CUT_ACTION_REMOVE:
+            for selector in selectors:
+                # Users can remove methods using the 0 address as the facet addres. That necessitates
+                # this correspondence.
+                selector_int = selector_to_int(selector)
+                actual_facet_address = selector_index.pop(selector_int, None)
+                if actual_facet_address is None:
+                    raise InvalidDiamondCut(
+                        event,
+                        f"cannot remove selector {selector} - it is not served by any facet",
+                    )
+                del raw_facets[actual_facet_address][selector_int]
+                touched_facets.add(actual_facet_address)
+        else:
+            raise InvalidDiamondCut(
+                event, f"unknown cut action {action} for facet {facet_address}"
+            )
+
+    return touched_facets
+
+
+def raw_facets_from_facets(
+    facets: Dict[str, List[str]]
+) -> Tuple[Dict[str, Dict[int, None]], Dict[int, str]]:
+    """
+    Builds the facet state used by apply_diamond_cut (raw_facets and selector_index) from lists of
+    selectors. Facets with no selectors are kept.
+    """
+    raw_facets = {
+        address: dict.fromkeys(selector_to_int(selector) for selector in selectors)
+        for address, selectors in facets.items()
+    }
+    selector_index = {
+        selector_int: address
+        for address, selector_ints in raw_facets.items()
+        for selector_int in selector_ints
+    }
+    return raw_facets, selector_index
+
+
+def facets_from_raw_facets(
+    raw_facets: Dict[str, Dict[int, None]], keep_empty: bool = False
+) -> Dict[str, List[str]]:
+    """
+    Converts the facet state used by apply_diamond_cut back to lists of selectors (formatted with
+    matching.selector_to_hex). Facets with no selectors are dropped unless keep_empty is True.
+    """
+    return {
+        facet_address: [selector_to_hex(selector_int) for selector_int in selectors]
+        for facet_address, selectors in raw_facets.items()
+        if selectors or keep_empty
+    }
 
 
 def facets_from_events(
-    diamond_cut_events: List[Dict[str, Any]]
+    diamond_cut_events: Iterable[Dict[str, Any]]
 ) -> Dict[str, List[str]]:
     """
     Accepts a JSON Lines file, containing a separate JSON object on each line as produced by `moonworm watch`.
@@ -43,40 +257,10 @@ def facets_from_events(
     Scans this file for `DiamondCut` events and reconstructs the facet attachments onto the crawled
     Diamond contract from those events.
     """
-    raw_facets: Dict[str, List[str]] = {}
-    selector_index: Dict[str, str] = {}
-    for event in diamond_cut_events:
-        cut_items = event["args"]["_diamondCut"]
-        for item in cut_items:
-            facet_address = item[0]
-            action = item[1]
-            selectors = item[2]
-
-            if raw_facets.get(facet_address) is None:
-                raw_facets[facet_address] = []
-
-            if action == CUT_ACTION_ADD:
-                raw_facets[facet_address].extend(selectors)
-                for selector in selectors:
-                    selector_index[selector] = facet_address
-            elif action == CUT_ACTION_REPLACE:
-                raw_facets[facet_address].extend(selectors)
-                for selector in selectors:
-                    old_facet = selector_index[selector]
-                    raw_facets[old_facet].remove(selector)
-                    selector_index[selector] = facet_address
-            elif action == CUT_ACTION_REMOVE:
-                for selector in selectors:
-                    # Users can remove methods using the 0 address as the facet addres. That necessitates
-                    # this correspondence.
-                    actual_facet_address = selector_index[selector]
-                    raw_facets[actual_facet_address].remove(selector)
-                    del selector_index[selector]
-
-    facets = {
-        facet_address: selectors
-        for facet_address, selectors in raw_facets.items()
-        if selectors
-    }
+    raw_facets: Dict[str, Dict[int, None]] = {}
+    selector_index: Dict[int, str] = {}
+    with stage("facet_reconstruction"):
+        for event in diamond_cut_events:
+            apply_diamond_cut(raw_facets, selector_index, event)
 
-    return facets
+    return facets_from_raw_facets(raw_facets)
@@ -0,0 +1,165 @@
+"""
+Follow a growing moonworm crawldata file (e.g. one being written by `moonworm watch`) and keep the state of
+the Diamond contract up to date as new DiamondCut events are appended to it.
+
+The state can be checkpointed to disk - the facet state together with the byte offset in the crawldata file
+up to which it has been applied - so that a restart resumes from that offset instead of replaying the whole
+file.
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .delta import delta_record, snapshot_record
+from .facets import DIAMOND_CUT_MARKER
+from .timeline import IncrementalInspector
+
+CHECKPOINT_VERSION = 1
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class CrawldataTail:
+    """
+    Reads the DiamondCut events appended to an uncompressed crawldata file since the last read.
+
+    Only complete lines are consumed - a line which is still being written is left for the next read.
+    """
+
+    def __init__(self, crawldata_jsonl: str, offset: int = 0) -> None:
+        if crawldata_jsonl.endswith((".gz", ".zst", ".zstd")):
+            raise ValueError(
+                f"Cannot follow compressed crawldata file: {crawldata_jsonl}"
+            )
+        self.path = crawldata_jsonl
+        self.offset = offset
+
+    def read_events(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the DiamondCut events in the complete lines written after the current offset, advancing the
+        offset past each line as it is consumed.
+        """
+        if os.path.getsize(self.path) < self.offset:
+            raise ValueError(
+                f"Crawldata file {self.path} is shorter than the offset it was read up to ({self.offset} bytes) - was it truncated or replaced?"
+            )
+
+        with open(self.path, "rb") as ifp:
+            ifp.seek(self.offset)
+            for line in ifp:
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+                if DIAMOND_CUT_MARKER not in line:
+                    continue
+                crawl_item = json.loads(line)
+                if crawl_item.get("event", "") == "DiamondCut":
+                    yield crawl_item
+
+
+def load_checkpoint(checkpoint_file: str, crawldata_jsonl: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads a follow checkpoint. Returns None if there is no checkpoint file. Raises a ValueError if the
+    checkpoint was written for a different crawldata file.
+    """
+    if not os.path.isfile(checkpoint_file):
+        return None
+
+    with open(checkpoint_file, "r") as ifp:
+        checkpoint = json.load(ifp)
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(
+            f"Unsupported checkpoint version in {checkpoint_file}: {checkpoint.get('version')}"
+        )
+    if checkpoint["crawldata"] != os.path.abspath(crawldata_jsonl):
+        raise ValueError(
+            f"Checkpoint {checkpoint_file} was written for a different crawldata file: {checkpoint['crawldata']}"
+        )
+    return checkpoint
+
+
+def save_checkpoint(
+    checkpoint_file: str,
+    crawldata_jsonl: str,
+    offset: int,
+    step: int,
+    inspector: IncrementalInspector,
+) -> None:
+    """
+    Atomically writes a follow checkpoint.
+    """
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "crawldata": os.path.abspath(crawldata_jsonl),
+        "offset": offset,
+        "step": step,
+        # List of pairs rather than an object, so that the order of the facets is explicit.
+        "facets": list(inspector.state().items()),
+    }
+    temp_file = f"{checkpoint_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as ofp:
+        json.dump(checkpoint, ofp)
+    os.replace(temp_file, checkpoint_file)
+
+
+def follow_crawldata(
+    crawldata_jsonl: str,
+    contract_selectors: Dict[str, Dict[str, str]],
+    checkpoint_file: Optional[str] = None,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Follows a crawldata file, yielding delta timeline records (see inspector_facet.delta).
+
+    The first record is a snapshot of the state after all the events already in the file (or, if resuming
+    from a checkpoint, in the checkpoint and the part of the file written since). Then, the file is polled
+    every poll_interval seconds and a delta record is yielded for each new DiamondCut event.
+
+    Polling continues until should_stop returns True (or forever, if should_stop is not provided). The
+    checkpoint, if any, is updated after every poll which found new events.
+    """
+    inspector = IncrementalInspector(contract_selectors=contract_selectors)
+    tail = CrawldataTail(crawldata_jsonl)
+    # Step of the last event applied to the state.
+    step = -1
+
+    if checkpoint_file is not None:
+        checkpoint = load_checkpoint(checkpoint_file, crawldata_jsonl)
+        if checkpoint is not None:
+            inspector.restore(dict(checkpoint["facets"]))
+            tail.offset = checkpoint["offset"]
+            step = checkpoint["step"]
+
+    last_event: Optional[Dict[str, Any]] = None
+    for event in tail.read_events():
+        inspector.update(event)
+        step += 1
+        last_event = event
+
+    if checkpoint_file is not None:
+        save_checkpoint(checkpoint_file, crawldata_jsonl, tail.offset, step, inspector)
+
+    yield snapshot_record(inspector, step, last_event)
+
+    while should_stop is None or not should_stop():
+        time.sleep(poll_interval)
+        records = []
+        for event in tail.read_events():
+            num_known_facets = len(inspector.raw_facets)
+            touched_facets = inspector.update(event)
+            step += 1
+            records.append(
+                delta_record(inspector, step, event, touched_facets, num_known_facets)
+            )
+
+        # The checkpoint is saved before the records are emitted. If the process is stopped while they
+        # are being emitted, the snapshot emitted on restart still describes the complete state.
+        if records and checkpoint_file is not None:
+            save_checkpoint(
+                checkpoint_file, crawldata_jsonl, tail.offset, step, inspector
+            )
+
+        for record in records:
+            yield record
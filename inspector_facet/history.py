@@ -0,0 +1,198 @@
+"""
+Reverse index from selectors to the history of the facets which served them.
+
+The index is built in one pass over the DiamondCut events of a Diamond contract. For each selector, it
+holds the ordered list of intervals during which the selector was served by a facet. Each interval has the
+keys:
+- facet: address of the facet serving the selector
+- action: "add" or "replace" - the cut action which mounted the selector on the facet
+- start_block, start_transaction: the event which started the interval
+- end_block, end_transaction: the event which ended the interval (None if the selector is still served by
+  the facet)
+- end_action: "replace" or "remove" - the cut action which ended the interval (None if it has not ended)
+- matches: the contracts the facet matched immediately after the event which started the interval
+"""
+import bisect
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from .checkpoints import crawldata_signature
+from .facets import (
+    CUT_ACTION_ADD,
+    CUT_ACTION_REMOVE,
+    CUT_ACTION_REPLACE,
+    iter_moonworm_crawldata,
+)
+from .matching import selector_to_hex, selector_to_int
+from .timeline import IncrementalInspector
+
+HISTORY_VERSION = 1
+
+CUT_ACTION_NAMES = {
+    CUT_ACTION_ADD: "add",
+    CUT_ACTION_REPLACE: "replace",
+    CUT_ACTION_REMOVE: "remove",
+}
+
+
+class SelectorHistory:
+    """
+    History of every selector ever mounted on a Diamond contract. Use build_selector_history to build one
+    from DiamondCut events, or SelectorHistory.load to read one saved earlier.
+    """
+
+    def __init__(
+        self,
+        intervals: Dict[str, List[Dict[str, Any]]],
+        source: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.intervals = intervals
+        self.source = source
+        # Start blocks of each selector's intervals, for point-in-time lookups.
+        self.start_blocks: Dict[str, List[int]] = {
+            selector: [interval["start_block"] for interval in selector_intervals]
+            for selector, selector_intervals in intervals.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    def lookup(self, selector: str) -> List[Dict[str, Any]]:
+        """
+        Every interval during which the given selector was served by a facet, in chronological order. Empty
+        if the selector was never mounted on the Diamond.
+        """
+        return self.intervals.get(selector_to_hex(selector_to_int(selector)), [])
+
+    def interval_at(self, selector: str, block_number: int) -> Optional[Dict[str, Any]]:
+        """
+        The interval during which the given selector was served at the end of the given block, or None if it
+        was not served by any facet then.
+        """
+        selector = selector_to_hex(selector_to_int(selector))
+        start_blocks = self.start_blocks.get(selector, [])
+        position = bisect.bisect_right(start_blocks, block_number) - 1
+        if position < 0:
+            return None
+        interval = self.intervals[selector][position]
+        if interval["end_block"] is not None and interval["end_block"] <= block_number:
+            return None
+        return interval
+
+    def save(self, history_file: str) -> None:
+        """
+        Atomically writes the index to a file.
+        """
+        temp_file = f"{history_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as ofp:
+            json.dump(
+                {
+                    "version": HISTORY_VERSION,
+                    "source": self.source,
+                    "intervals": self.intervals,
+                },
+                ofp,
+            )
+        os.replace(temp_file, history_file)
+
+    @classmethod
+    def load(cls, history_file: str) -> "SelectorHistory":
+        with open(history_file, "r") as ifp:
+            raw_history = json.load(ifp)
+        if raw_history.get("version") != HISTORY_VERSION:
+            raise ValueError(
+                f"Unsupported selector history version in {history_file}: {raw_history.get('version')}"
+            )
+        return cls(raw_history["intervals"], raw_history.get("source"))
+
+
+def build_selector_history(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    contract_selectors: Optional[Dict[str, Dict[str, str]]] = None,
+) -> SelectorHistory:
+    """
+    Builds the selector history index from the given DiamondCut events, in one pass. If contract_selectors
+    is provided, each interval records the contracts that its facet matched.
+    """
+    if contract_selectors is None:
+        contract_selectors = {}
+    inspector = IncrementalInspector(contract_selectors=contract_selectors)
+    intervals: Dict[str, List[Dict[str, Any]]] = {}
+
+    for event in diamond_cut_events:
+        # Raises InvalidDiamondCut before the history is modified if the event is not valid.
+        inspector.update(event)
+        block_number = event.get("blockNumber")
+        transaction_hash = event.get("transactionHash")
+
+        for facet_address, action, selectors in event["args"]["_diamondCut"]:
+            for selector in selectors:
+                selector_intervals = intervals.setdefault(
+                    selector_to_hex(selector_to_int(selector)), []
+                )
+                if action in [CUT_ACTION_REPLACE, CUT_ACTION_REMOVE]:
+                    current_interval = selector_intervals[-1]
+                    current_interval["end_block"] = block_number
+                    current_interval["end_transaction"] = transaction_hash
+                    current_interval["end_action"] = CUT_ACTION_NAMES[action]
+                if action in [CUT_ACTION_ADD, CUT_ACTION_REPLACE]:
+                    facet_result = inspector.facet_results.get(facet_address, {})
+                    selector_intervals.append(
+                        {
+                            "facet": facet_address,
+                            "action": CUT_ACTION_NAMES[action],
+                            "start_block": block_number,
+                            "start_transaction": transaction_hash,
+                            "end_block": None,
+                            "end_transaction": None,
+                            "end_action": None,
+                            "matches": facet_result.get("matches", []),
+                        }
+                    )
+
+    return SelectorHistory(intervals)
+
+
+def history_source(
+    crawldata_jsonl: str, contract_selectors: Dict[str, Dict[str, str]]
+) -> Dict[str, Any]:
+    """
+    Identifies the inputs a selector history was built from: the crawldata file and (since intervals record
+    the contracts their facets matched) the contract -> selector -> function index.
+    """
+    source = crawldata_signature(crawldata_jsonl)
+    source["contracts"] = hashlib.sha256(
+        json.dumps(contract_selectors, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return source
+
+
+def selector_history_from_crawldata(
+    crawldata_jsonl: str,
+    contract_selectors: Dict[str, Dict[str, str]],
+    history_file: Optional[str] = None,
+) -> SelectorHistory:
+    """
+    Builds the selector history index for a crawldata file. If history_file is provided, the index is read
+    from that file when it was built from the same crawldata file and contracts, and is otherwise rebuilt
+    and saved there.
+    """
+    source = history_source(crawldata_jsonl, contract_selectors)
+    if history_file is not None and os.path.isfile(history_file):
+        try:
+            history = SelectorHistory.load(history_file)
+        except ValueError:
+            pass
+        else:
+            if history.source == source:
+                return history
+
+    history = build_selector_history(
+        iter_moonworm_crawldata(crawldata_jsonl), contract_selectors
+    )
+    history.source = source
+    if history_file is not None:
+        history.save(history_file)
+    return history
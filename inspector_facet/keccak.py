@@ -0,0 +1,11 @@
+"""
+Keccak-256 hashing for selector computation, without importing web3.
+
+Importing web3 (or brownie) just to hash function signatures costs seconds of startup time, so selectors are
+hashed with pycryptodome directly.
+"""
+from Crypto.Hash import keccak as _pycryptodome_keccak
+
+
+def keccak256(data: bytes) -> bytes:
+    return _pycryptodome_keccak.new(data=data, digest_bits=256).digest()
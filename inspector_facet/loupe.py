@@ -0,0 +1,290 @@
+"""
+Lightweight client for the DiamondLoupe functions of Diamond contracts, which talks JSON-RPC directly to a
+node instead of going through brownie.
+
+All calls are made over a single persistent (keep-alive) HTTP connection, and calls for many diamonds are
+sent together as JSON-RPC batch requests.
+
+For each diamond, the client calls facets(). If that call fails, it falls back to calling facetAddresses()
+and then facetFunctionSelectors(<facet>) for each of the facets.
+"""
+import http.client
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from .keccak import keccak256
+
+FACETS_SELECTOR = "0x7a0ed627"
+FACET_ADDRESSES_SELECTOR = "0x52ef6b2c"
+FACET_FUNCTION_SELECTORS_SELECTOR = "0xadfca15e"
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_TIMEOUT = 30.0
+
+
+class JSONRPCError(Exception):
+    """
+    Raised (or returned, for individual calls in a batch) when a JSON-RPC call fails.
+    """
+
+
+def to_checksum_address(address: str) -> str:
+    """
+    EIP-55 mixed-case checksum encoding of an address.
+    """
+    lowercase_hex = address.lower().replace("0x", "", 1)
+    address_hash = keccak256(lowercase_hex.encode("utf-8")).hex()
+    return "0x" + "".join(
+        character.upper() if int(address_hash[i], 16) >= 8 else character
+        for i, character in enumerate(lowercase_hex)
+    )
+
+
+def _word(data: bytes, offset: int) -> int:
+    if offset + 32 > len(data):
+        raise ValueError("ABI-encoded data is too short")
+    return int.from_bytes(data[offset : offset + 32], "big")
+
+
+def _decode_address(data: bytes, offset: int) -> str:
+    return to_checksum_address(data[offset + 12 : offset + 32].hex())
+
+
+def _decode_bytes4_array(data: bytes, offset: int) -> List[str]:
+    length = _word(data, offset)
+    if offset + 32 * (length + 1) > len(data):
+        raise ValueError("ABI-encoded data is too short")
+    return [
+        "0x" + data[offset + 32 * (i + 1) : offset + 32 * (i + 1) + 4].hex()
+        for i in range(length)
+    ]
+
+
+def decode_facets(data: bytes) -> Dict[str, List[str]]:
+    """
+    Decodes the return value of facets(), which has type (address,bytes4[])[].
+    """
+    array_offset = _word(data, 0)
+    num_facets = _word(data, array_offset)
+    items_offset = array_offset + 32
+    facets: Dict[str, List[str]] = {}
+    for i in range(num_facets):
+        tuple_offset = items_offset + _word(data, items_offset + 32 * i)
+        facet_address = _decode_address(data, tuple_offset)
+        selectors_offset = tuple_offset + _word(data, tuple_offset + 32)
+        facets[facet_address] = _decode_bytes4_array(data, selectors_offset)
+    return facets
+
+
+def decode_address_array(data: bytes) -> List[str]:
+    """
+    Decodes the return value of facetAddresses(), which has type address[].
+    """
+    array_offset = _word(data, 0)
+    length = _word(data, array_offset)
+    return [_decode_address(data, array_offset + 32 * (i + 1)) for i in range(length)]
+
+
+def decode_bytes4_array(data: bytes) -> List[str]:
+    """
+    Decodes the return value of facetFunctionSelectors(address), which has type bytes4[].
+    """
+    return _decode_bytes4_array(data, _word(data, 0))
+
+
+def encode_address_argument(address: str) -> str:
+    return address.lower().replace("0x", "", 1).rjust(64, "0")
+
+
+class LoupeClient:
+    """
+    JSON-RPC client for the DiamondLoupe functions of Diamond contracts, using a single keep-alive HTTP
+    connection to the node at rpc_url.
+    """
+
+    def __init__(
+        self,
+        rpc_url: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        block: str = "latest",
+    ) -> None:
+        parsed_url = urlparse(rpc_url)
+        if parsed_url.scheme not in ["http", "https"]:
+            raise ValueError(f"Unsupported JSON-RPC URL (must be http or https): {rpc_url}")
+        self.rpc_url = rpc_url
+        self.scheme = parsed_url.scheme
+        self.netloc = parsed_url.netloc
+        self.path = parsed_url.path or "/"
+        if parsed_url.query:
+            self.path = f"{self.path}?{parsed_url.query}"
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.block = block
+        self.connection: Optional[http.client.HTTPConnection] = None
+        self.request_id = 0
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self) -> "LoupeClient":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.connection is None:
+            if self.scheme == "https":
+                self.connection = http.client.HTTPSConnection(
+                    self.netloc, timeout=self.timeout
+                )
+            else:
+                self.connection = http.client.HTTPConnection(
+                    self.netloc, timeout=self.timeout
+                )
+        return self.connection
+
+    def _post(self, payload: Any) -> Any:
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        # A keep-alive connection may have been closed by the server since it was last used, in which case
+        # we reconnect and retry once.
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request("POST", self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                response_body = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt > 0:
+                    raise
+                continue
+
+            if response.status != 200:
+                raise JSONRPCError(
+                    f"JSON-RPC request to {self.rpc_url} failed with HTTP status {response.status}: {response_body[:200]!r}"
+                )
+            return json.loads(response_body)
+
+    def call_batch(
+        self, calls: List[Tuple[str, str]]
+    ) -> List[Union[bytes, JSONRPCError]]:
+        """
+        Makes an eth_call for each (to, data) pair in calls, using JSON-RPC batch requests of up to
+        batch_size calls each. Returns the return data for each call, or the JSONRPCError for calls which
+        failed, in the same order as calls.
+        """
+        results: List[Union[bytes, JSONRPCError]] = []
+        for batch_start in range(0, len(calls), self.batch_size):
+            batch_calls = calls[batch_start : batch_start + self.batch_size]
+            requests: List[Dict[str, Any]] = []
+            for to, data in batch_calls:
+                self.request_id += 1
+                requests.append(
+                    {
+                        "jsonrpc": "2.0",
+                        "id": self.request_id,
+                        "method": "eth_call",
+                        "params": [{"to": to, "data": data}, self.block],
+                    }
+                )
+
+            responses = self._post(requests)
+            if not isinstance(responses, list):
+                # Some nodes reply to a batch which they reject with a single error object.
+                raise JSONRPCError(f"JSON-RPC batch request failed: {responses}")
+            responses_by_id = {response.get("id"): response for response in responses}
+
+            for request in requests:
+                response = responses_by_id.get(request["id"])
+                if response is None:
+                    results.append(JSONRPCError("No response to eth_call"))
+                elif response.get("error") is not None:
+                    results.append(JSONRPCError(str(response["error"])))
+                else:
+                    raw_result = response.get("result") or "0x"
+                    results.append(bytes.fromhex(raw_result.replace("0x", "", 1)))
+
+        return results
+
+    def facets(
+        self, addresses: List[str]
+    ) -> Dict[str, Union[Dict[str, List[str]], Exception]]:
+        """
+        Retrieves the facets, and the selectors mounted from each facet, for each of the given Diamond
+        contracts. Returns a dictionary mapping each address either to its facets, or to the exception
+        describing why its facets could not be retrieved.
+        """
+        results: Dict[str, Union[Dict[str, List[str]], Exception]] = {}
+        fallback_addresses: List[str] = []
+        facets_results = self.call_batch(
+            [(address, FACETS_SELECTOR) for address in addresses]
+        )
+        for address, return_data in zip(addresses, facets_results):
+            try:
+                if isinstance(return_data, Exception):
+                    raise return_data
+                results[address] = decode_facets(return_data)
+            except (JSONRPCError, ValueError):
+                fallback_addresses.append(address)
+
+        if not fallback_addresses:
+            return results
+
+        # Fallback: facetAddresses() followed by facetFunctionSelectors(<facet>) for each facet.
+        facet_calls: List[Tuple[str, str]] = []
+        facet_owners: List[Tuple[str, str]] = []
+        facet_addresses_results = self.call_batch(
+            [(address, FACET_ADDRESSES_SELECTOR) for address in fallback_addresses]
+        )
+        for address, return_data in zip(fallback_addresses, facet_addresses_results):
+            try:
+                if isinstance(return_data, Exception):
+                    raise return_data
+                facet_addresses = decode_address_array(return_data)
+            except (JSONRPCError, ValueError) as e:
+                results[address] = e
+                continue
+            results[address] = {}
+            for facet_address in facet_addresses:
+                facet_calls.append(
+                    (
+                        address,
+                        FACET_FUNCTION_SELECTORS_SELECTOR
+                        + encode_address_argument(facet_address),
+                    )
+                )
+                facet_owners.append((address, facet_address))
+
+        selectors_results = self.call_batch(facet_calls)
+        for (address, facet_address), return_data in zip(
+            facet_owners, selectors_results
+        ):
+            address_facets = results[address]
+            if isinstance(address_facets, Exception):
+                continue
+            try:
+                if isinstance(return_data, Exception):
+                    raise return_data
+                address_facets[facet_address] = decode_bytes4_array(return_data)
+            except (JSONRPCError, ValueError) as e:
+                results[address] = e
+
+        return results
+
+
+def facets_from_rpc(rpc_url: str, address: str) -> Dict[str, List[str]]:
+    """
+    Retrieves the facets of a single Diamond contract from the node at rpc_url. Produces the same output as
+    facets.facets_from_loupe, without requiring brownie.
+    """
+    with LoupeClient(rpc_url) as client:
+        result = client.facets([address])[address]
+    if isinstance(result, Exception):
+        raise result
+    return result
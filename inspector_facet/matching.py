@@ -0,0 +1,170 @@
+"""
+Scoring engine which matches the selectors served by facets against the selectors defined by contracts.
+
+For each facet and contract, the facet's recall for that contract is the fraction of the facet's selectors
+that the contract defines, and its precision is the fraction of the contract's selectors that the facet
+serves. The contracts with maximum recall are the candidates for a facet, and of those the ones with
+maximum precision are its matches.
+
+Selectors are encoded as integers and contracts are numbered, and the number of selectors each facet
+shares with each contract is computed through an inverted index from selectors to contracts - a sparse
+product of the facet-selector and selector-contract incidence matrices. Only contracts which share at
+least one selector with a facet are ever visited when scoring that facet.
+"""
+import sys
+from typing import Any, Dict, List, Tuple
+
+
+def selector_to_int(selector: str) -> int:
+    return int(selector, 16)
+
+
+def selector_to_hex(selector_int: int) -> str:
+    return f"0x{selector_int:08x}"
+
+
+class SelectorMatcher:
+    """
+    Matches facets against a fixed contract -> selector -> function index (as produced by
+    inspector.contract_selectors_from_abis).
+    """
+
+    def __init__(self, contract_selectors: Dict[str, Dict[str, str]]) -> None:
+        self.contract_selectors = contract_selectors
+        # Contract names are interned, since they are repeated in the result for every selector and in
+        # every step of a timeline.
+        self.contract_names: List[str] = [sys.intern(name) for name in contract_selectors]
+        self.contract_sizes: List[int] = []
+        # Selector -> function name for each contract, in index order - the selectors a matching facet
+        # misses are reported in this order.
+        self.contract_functions: List[Dict[int, str]] = []
+        selector_contracts: Dict[int, List[int]] = {}
+        for contract_id, contract_name in enumerate(self.contract_names):
+            functions = {
+                selector_to_int(selector): function_name
+                for selector, function_name in contract_selectors[contract_name].items()
+            }
+            self.contract_functions.append(functions)
+            self.contract_sizes.append(len(contract_selectors[contract_name]))
+            for selector_int in functions:
+                if selector_contracts.get(selector_int) is None:
+                    selector_contracts[selector_int] = []
+                selector_contracts[selector_int].append(contract_id)
+        # Most selectors are defined by a single contract. Tuples take about half the memory of the lists
+        # they were built in.
+        self.selector_contracts: Dict[int, Tuple[int, ...]] = {
+            selector_int: tuple(contract_ids)
+            for selector_int, contract_ids in selector_contracts.items()
+        }
+
+    def _overlaps(self, selector_ints: List[int]) -> Dict[int, int]:
+        """
+        Counts, for each contract which defines at least one of the given selectors, how many of the
+        selectors it defines.
+        """
+        overlaps: Dict[int, int] = {}
+        for selector_int in selector_ints:
+            for contract_id in self.selector_contracts.get(selector_int, ()):
+                overlaps[contract_id] = overlaps.get(contract_id, 0) + 1
+        return overlaps
+
+    def match_ids(self, selector_ints: List[int]) -> List[int]:
+        """
+        Returns the ids (positions in contract_names) of the contracts which match a facet serving the
+        given selectors, in index order.
+        """
+        # Recall is computed over the facet's selector list and precision over its distinct selectors -
+        # these only differ if the facet lists a selector more than once.
+        recall_overlaps = self._overlaps(selector_ints)
+        distinct_selector_ints = set(selector_ints)
+        if len(distinct_selector_ints) == len(selector_ints):
+            precision_overlaps = recall_overlaps
+        else:
+            precision_overlaps = self._overlaps(list(distinct_selector_ints))
+
+        if not recall_overlaps:
+            # Every contract has recall 0 and precision 0, so every contract is a match.
+            return list(range(len(self.contract_names)))
+
+        num_selectors = len(selector_ints)
+        max_recall = max(recall_overlaps.values()) / num_selectors
+        max_recall_ids = sorted(
+            contract_id
+            for contract_id, overlap in recall_overlaps.items()
+            if overlap / num_selectors == max_recall
+        )
+
+        precisions = {
+            contract_id: precision_overlaps.get(contract_id, 0)
+            / self.contract_sizes[contract_id]
+            for contract_id in max_recall_ids
+        }
+        max_precision = max(precisions.values())
+        return [
+            contract_id
+            for contract_id in max_recall_ids
+            if precisions[contract_id] == max_precision
+        ]
+
+    def match_facet(self, selectors: List[str]) -> Dict[str, Any]:
+        """
+        Matches the selectors served by a single facet against the contracts in the index. Returns the
+        matching contracts, the selectors of those contracts which the facet does not serve, and the
+        selectors which the facet serves for each of those contracts.
+        """
+        return self.match_selector_ints([selector_to_int(selector) for selector in selectors])
+
+    def match_selector_ints(self, selector_ints: List[int]) -> Dict[str, Any]:
+        """
+        Same as match_facet, for callers which hold the facet's selectors as integers (such as the facet
+        state kept by facets.apply_diamond_cut).
+        """
+        return self.describe_matches(self.match_ids(selector_ints), selector_ints)
+
+    def describe_matches(
+        self, match_ids: List[int], selector_ints: List[int]
+    ) -> Dict[str, Any]:
+        """
+        Builds the result for a facet serving the given selectors from the ids of the contracts it matches.
+        Selectors are formatted as hex strings (see selector_to_hex) only here.
+        """
+        facet_selector_ints = set(selector_ints)
+
+        address_result: Dict[str, Any] = {}
+        address_result["matches"] = [
+            self.contract_names[contract_id] for contract_id in match_ids
+        ]
+
+        address_result["misses"] = [
+            {
+                "contract": self.contract_names[contract_id],
+                "selector": selector_to_hex(selector_int),
+                "function": function_name,
+            }
+            for contract_id in match_ids
+            for selector_int, function_name in self.contract_functions[contract_id].items()
+            if selector_int not in facet_selector_ints
+        ]
+
+        address_result["selectors"] = [
+            {
+                "contract": self.contract_names[contract_id],
+                "selector": selector_to_hex(selector_int),
+                "function": self.contract_functions[contract_id][selector_int],
+            }
+            for contract_id in match_ids
+            for selector_int in selector_ints
+            if selector_int in self.contract_functions[contract_id]
+        ]
+
+        return address_result
+
+    def match_facets(self, facets: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Matches every non-empty facet of a Diamond contract against the contracts in the index.
+        """
+        return {
+            address: self.match_facet(selectors)
+            for address, selectors in facets.items()
+            if len(selectors) > 0
+        }
@@ -0,0 +1,261 @@
+"""
+Ordering and deduplication of the DiamondCut events in a crawldata file.
+
+Reconstructing a Diamond's facets assumes that its DiamondCut events are unique and in chain order. Crawldata
+which was re-crawled, or which was crawled across a reorg, may contain the same event more than once and
+batches of events out of order. This module drops all but one copy of each (transactionHash, logIndex) and
+sorts the remaining events by (blockNumber, transactionIndex, logIndex).
+
+A transaction which was re-included in a different block after a reorg keeps its hash and log index, so its
+copies may be far apart in chain order. The copy which is kept is the one in the latest block: the earlier
+copies were recorded before the reorg, on blocks which are no longer part of the chain. Of copies in the same
+block, the last one in the crawldata file is kept.
+
+Both steps are external merge sorts, so memory use is bounded however large the crawldata file is: events are
+read in chunks of chunk_size, each chunk is sorted and written to a temporary run file, and the runs are
+merged (at most MAX_MERGE_FAN_IN at a time) into a sorted stream. The events are first sorted by
+event_identity_sort_key, which brings the copies of each event together with the latest one last, so that
+duplicates are dropped while holding a single event in memory. The unique events are then sorted again into
+chain order.
+
+To normalize a crawldata file:
+    python -m inspector_facet.ordering <input crawldata> <output crawldata>
+"""
+import argparse
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .facets import iter_moonworm_crawldata
+
+DEFAULT_CHUNK_SIZE = 100_000
+MAX_MERGE_FAN_IN = 64
+
+
+def event_sort_key(event: Dict[str, Any]) -> Tuple[int, int, int]:
+    """
+    Position of a DiamondCut event in chain order.
+    """
+    if event.get("blockNumber") is None:
+        raise ValueError(f"DiamondCut event has no blockNumber: {event}")
+    return (
+        event["blockNumber"],
+        event.get("transactionIndex") or 0,
+        event.get("logIndex") or 0,
+    )
+
+
+def event_identity(event: Dict[str, Any]) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Identifies a DiamondCut event independently of the crawl which recorded it.
+    """
+    transaction_hash = event.get("transactionHash")
+    if transaction_hash is not None:
+        transaction_hash = transaction_hash.lower()
+    return (transaction_hash, event.get("logIndex"))
+
+
+def event_identity_sort_key(event: Dict[str, Any]) -> Tuple[str, int, int, int, int]:
+    """
+    Orders DiamondCut events by event_identity, and the copies of each event by their position in chain
+    order.
+    """
+    transaction_hash, log_index = event_identity(event)
+    return (
+        transaction_hash or "",
+        -1 if log_index is None else log_index,
+        *event_sort_key(event),
+    )
+
+
+EventKey = Callable[[Dict[str, Any]], Tuple[Any, ...]]
+
+
+def write_run(events: List[Dict[str, Any]], run_file: str) -> None:
+    with open(run_file, "w") as ofp:
+        for event in events:
+            ofp.write(json.dumps(event) + "\n")
+
+
+def read_run(run_file: str) -> Iterator[Dict[str, Any]]:
+    with open(run_file, "r") as ifp:
+        for line in ifp:
+            yield json.loads(line)
+
+
+def sorted_runs(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    temp_dir: str,
+    chunk_size: int,
+    key: EventKey = event_sort_key,
+) -> List[str]:
+    """
+    Splits the events into chunks of at most chunk_size events, and writes each chunk, sorted by key, to a run
+    file in temp_dir. Returns the paths of the run files, in order.
+    """
+    run_files: List[str] = []
+    chunk: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        chunk.sort(key=key)
+        run_file = os.path.join(temp_dir, f"run-{len(run_files)}.jsonl")
+        write_run(chunk, run_file)
+        run_files.append(run_file)
+        chunk.clear()
+
+    for event in diamond_cut_events:
+        chunk.append(event)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return run_files
+
+
+def merge_runs(
+    run_files: List[str],
+    temp_dir: str,
+    fan_in: int = MAX_MERGE_FAN_IN,
+    key: EventKey = event_sort_key,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Merges run files sorted by key into a single sorted stream of events. If there are more than fan_in runs, they
+    are first merged in groups into larger runs, so that at most fan_in files are open at once. Events with
+    equal keys keep the order of their runs.
+    """
+    merge_pass = 0
+    while len(run_files) > fan_in:
+        merged_run_files: List[str] = []
+        for group_start in range(0, len(run_files), fan_in):
+            merged_run_file = os.path.join(
+                temp_dir, f"merge-{merge_pass}-{len(merged_run_files)}.jsonl"
+            )
+            group = run_files[group_start : group_start + fan_in]
+            with open(merged_run_file, "w") as ofp:
+                for event in heapq.merge(
+                    *(read_run(run_file) for run_file in group), key=key
+                ):
+                    ofp.write(json.dumps(event) + "\n")
+            for run_file in group:
+                os.remove(run_file)
+            merged_run_files.append(merged_run_file)
+        run_files = merged_run_files
+        merge_pass += 1
+
+    return heapq.merge(*(read_run(run_file) for run_file in run_files), key=key)
+
+
+def dedupe_sorted_events(
+    sorted_events: Iterable[Dict[str, Any]]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Drops all but the last copy of each event (by event_identity) from events sorted by
+    event_identity_sort_key - that is, keeps the copy in the latest block. Only the copy being compared is
+    held in memory.
+    """
+    previous_event: Optional[Dict[str, Any]] = None
+    for event in sorted_events:
+        if previous_event is not None and event_identity(event) != event_identity(
+            previous_event
+        ):
+            yield previous_event
+        previous_event = event
+    if previous_event is not None:
+        yield previous_event
+
+
+def normalized_events(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    temp_dir: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the given DiamondCut events deduplicated and sorted by event_sort_key. Run files are written to a
+    temporary directory (created under temp_dir, if given), which is removed once the events have been
+    consumed or the generator is closed.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive: {chunk_size}")
+    runs_dir = tempfile.mkdtemp(prefix="inspector-facet-sort-", dir=temp_dir)
+    try:
+        identity_dir = os.path.join(runs_dir, "identity")
+        order_dir = os.path.join(runs_dir, "order")
+        os.makedirs(identity_dir)
+        os.makedirs(order_dir)
+
+        identity_run_files = sorted_runs(
+            diamond_cut_events, identity_dir, chunk_size, key=event_identity_sort_key
+        )
+        unique_events = dedupe_sorted_events(
+            merge_runs(identity_run_files, identity_dir, key=event_identity_sort_key)
+        )
+        run_files = sorted_runs(unique_events, order_dir, chunk_size)
+        shutil.rmtree(identity_dir)
+        yield from merge_runs(run_files, order_dir)
+    finally:
+        shutil.rmtree(runs_dir, ignore_errors=True)
+
+
+def normalize_crawldata(
+    crawldata_jsonl: str,
+    output_jsonl: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    temp_dir: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Writes the DiamondCut events from a crawldata file to output_jsonl, sorted and deduplicated. Returns the
+    number of events read and written.
+    """
+    events_read = 0
+
+    def counted(events: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        nonlocal events_read
+        for event in events:
+            events_read += 1
+            yield event
+
+    events_written = 0
+    temp_file = f"{output_jsonl}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as ofp:
+        for event in normalized_events(
+            counted(iter_moonworm_crawldata(crawldata_jsonl)), chunk_size, temp_dir
+        ):
+            ofp.write(json.dumps(event) + "\n")
+            events_written += 1
+    os.replace(temp_file, output_jsonl)
+
+    return {"events_read": events_read, "events_written": events_written}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Sort and deduplicate the DiamondCut events in a crawldata file"
+    )
+    parser.add_argument("crawldata", help="Path to the crawldata file to normalize")
+    parser.add_argument("output", help="Path at which to write the normalized crawldata")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Number of events sorted in memory at a time. Default: {DEFAULT_CHUNK_SIZE}",
+    )
+    parser.add_argument(
+        "--temp-dir",
+        default=None,
+        help="Directory in which to write temporary sorted runs. Defaults to the system temporary directory.",
+    )
+    args = parser.parse_args(argv)
+
+    counts = normalize_crawldata(args.crawldata, args.output, args.chunk_size, args.temp_dir)
+    print(
+        f"{args.output}: {counts['events_written']} events ({counts['events_read'] - counts['events_written']} duplicates dropped)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
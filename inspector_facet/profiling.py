@@ -0,0 +1,183 @@
+"""
+Lightweight instrumentation of the stages of the inspector-facet pipeline.
+
+Stages are marked in the code with `with stage("<name>"):` blocks, and lazily evaluated stages (such as
+crawldata decoding) by wrapping their iterators with profiled_iterator. While profiling is disabled (the
+default), stage returns a shared no-op context manager and profiled_iterator returns its argument
+unchanged, so instrumentation costs one function call per stage.
+
+Once profiling is enabled with enable_profiling, every stage records:
+- calls: the number of times the stage was entered (for iterators: the number of items produced)
+- seconds: total wall time spent in the stage, including any stages nested in it
+- peak_memory_bytes: the peak memory allocated while the stage ran (only if memory tracing was enabled,
+  since tracing allocations slows everything down)
+
+Usage from Python:
+
+    from inspector_facet import profiling
+
+    profiler = profiling.enable_profiling()
+    ...
+    profiling.disable_profiling()
+    print(profiler.report())
+"""
+from contextlib import contextmanager
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore
+
+
+class Profiler:
+    """
+    Collects wall time, call counts and (optionally) peak memory for each stage.
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.started_at = time.perf_counter()
+        # Running peak memory of each stage that is currently executing, innermost last.
+        self.running_peaks: List[int] = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self) -> None:
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _stage_stats(self, name: str) -> Dict[str, Any]:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = {"calls": 0, "seconds": 0.0}
+            if self.trace_memory:
+                stats["peak_memory_bytes"] = 0
+            self.stages[name] = stats
+        return stats
+
+    def _enter_memory(self) -> None:
+        # The peak so far is credited to the enclosing stage before it is reset for the new one.
+        _, peak = tracemalloc.get_traced_memory()
+        if self.running_peaks:
+            self.running_peaks[-1] = max(self.running_peaks[-1], peak)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self.running_peaks.append(0)
+
+    def _exit_memory(self, stats: Dict[str, Any]) -> None:
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(self.running_peaks.pop(), peak)
+        stats["peak_memory_bytes"] = max(stats["peak_memory_bytes"], peak)
+        if self.running_peaks:
+            self.running_peaks[-1] = max(self.running_peaks[-1], peak)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        stats = self._stage_stats(name)
+        if self.trace_memory:
+            self._enter_memory()
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats["seconds"] += time.perf_counter() - started_at
+            stats["calls"] += 1
+            if self.trace_memory:
+                self._exit_memory(stats)
+
+    def iterate(self, name: str, iterable: Iterable[Any]) -> Iterator[Any]:
+        """
+        Yields the items of iterable, attributing the time spent producing each of them to the given stage.
+        """
+        stats = self._stage_stats(name)
+        iterator = iter(iterable)
+        while True:
+            if self.trace_memory:
+                self._enter_memory()
+            started_at = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                stats["seconds"] += time.perf_counter() - started_at
+                if self.trace_memory:
+                    self._exit_memory(stats)
+            stats["calls"] += 1
+            yield item
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Machine-readable report of the stages recorded so far.
+        """
+        report: Dict[str, Any] = {
+            "wall_seconds": time.perf_counter() - self.started_at,
+            "stages": self.stages,
+        }
+        if resource is not None:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is in bytes on macOS and in kilobytes everywhere else.
+            if sys.platform != "darwin":
+                max_rss *= 1024
+            report["max_rss_bytes"] = max_rss
+        return report
+
+
+class _NullStage:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+_profiler: Optional[Profiler] = None
+
+
+def enable_profiling(trace_memory: bool = False) -> Profiler:
+    """
+    Starts recording stages with a new Profiler, which is returned.
+    """
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+    _profiler = Profiler(trace_memory)
+    return _profiler
+
+
+def disable_profiling() -> Optional[Profiler]:
+    """
+    Stops recording stages. Returns the profiler which was recording them, if any.
+    """
+    global _profiler
+    profiler = _profiler
+    _profiler = None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def stage(name: str) -> Any:
+    """
+    Context manager marking a stage of the pipeline.
+    """
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name)
+
+
+def profiled_iterator(name: str, iterable: Iterable[Any]) -> Iterable[Any]:
+    """
+    Attributes the time spent producing the items of iterable to the given stage. Whether profiling is
+    enabled is checked when the iterator is wrapped, not as it is consumed.
+    """
+    if _profiler is None:
+        return iterable
+    return _profiler.iterate(name, iterable)
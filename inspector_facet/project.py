@@ -0,0 +1,85 @@
+"""
+Loading the contract -> selector -> function index of a brownie, foundry or hardhat project from its build
+artifacts. Used by both the command line interface and the inspection server.
+"""
+from typing import Dict, List, Optional
+
+from .abi import (
+    abis_from_build_files,
+    brownie_build_files,
+    filter_contract_names,
+    foundry_build_files,
+    hardhat_build_files,
+)
+from .cache import contract_selectors_from_build_files
+from .inspector import contract_selectors_from_abis
+from .profiling import stage
+
+FRAMEWORK_BROWNIE = "brownie"
+FRAMEWORK_FOUNDRY = "foundry"
+FRAMEWORK_HARDHAT = "hardhat"
+FRAMEWORKS = [FRAMEWORK_BROWNIE, FRAMEWORK_FOUNDRY, FRAMEWORK_HARDHAT]
+
+
+def project_framework(foundry: bool = False, hardhat: bool = False) -> str:
+    """
+    Framework of a project, from the --foundry and --hardhat command line flags.
+    """
+    if foundry and hardhat:
+        raise ValueError("--foundry and --hardhat cannot be used together")
+    if foundry:
+        return FRAMEWORK_FOUNDRY
+    if hardhat:
+        return FRAMEWORK_HARDHAT
+    return FRAMEWORK_BROWNIE
+
+
+def list_build_files(
+    project_dir: str,
+    framework: str = FRAMEWORK_BROWNIE,
+    build_dir: Optional[str] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Lists the build artifacts of a project. Hardhat projects are listed by their build-info files, whose
+    contracts are filtered by name in load_contract_selectors instead.
+    """
+    with stage("build_file_listing"):
+        if framework == FRAMEWORK_HARDHAT:
+            return hardhat_build_files(project_dir, build_dir)
+        elif framework == FRAMEWORK_FOUNDRY:
+            return foundry_build_files(project_dir, build_dir, include, exclude)
+        elif framework == FRAMEWORK_BROWNIE:
+            return brownie_build_files(project_dir, build_dir, include, exclude)
+        raise ValueError(f"Unknown framework: {framework} (expected one of {', '.join(FRAMEWORKS)})")
+
+
+def load_contract_selectors(
+    build_files: List[str],
+    framework: str = FRAMEWORK_BROWNIE,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    selector_cache: Optional[str] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Builds the contract -> selector -> function index from build artifacts listed by list_build_files, using
+    the selector cache file if one is given.
+    """
+    build_info = framework == FRAMEWORK_HARDHAT
+    if selector_cache is not None:
+        with stage("selector_cache"):
+            contract_selectors = contract_selectors_from_build_files(
+                build_files, selector_cache, build_info=build_info
+            )
+    else:
+        contract_selectors = contract_selectors_from_abis(
+            abis_from_build_files(build_files, build_info=build_info)
+        )
+
+    if build_info:
+        # A build-info file describes many contracts, so hardhat contracts are selected by name rather
+        # than by build file.
+        contract_selectors = filter_contract_names(contract_selectors, include, exclude)
+
+    return contract_selectors
@@ -0,0 +1,400 @@
+"""
+Long-running inspection server, which loads a project's contract -> selector -> function index once and keeps
+it warm between requests.
+
+The server speaks JSON over HTTP, on a TCP port or on a Unix socket:
+- GET /health: {"status": "ok", "contracts": <number of contracts in the index>, "loaded_at": <timestamp>}
+- POST /inspect: inspects a Diamond contract and returns the same result as `inspector-facet --format json`.
+  The request specifies the facets in one of these ways:
+    {"facets": {"<facet address>": ["<selector>", ...], ...}}
+    {"crawldata": "<path to moonworm crawldata>", "at_block": <optional block number>}
+    {"rpc": "<JSON-RPC URL>", "address": "<diamond address>"}
+- POST /timeline: {"crawldata": "<path>"} or {"events": [<DiamondCut event>, ...]}. Returns the same list
+  of [result, event] pairs as `inspector-facet --timeline --format json`.
+- POST /selectors: {"selectors": ["<selector>", ...]}. Returns, for each selector, the functions which
+  define it in the project's contracts and (if the server has a signature database) its known signatures.
+- POST /reload: reloads the index immediately.
+
+Requests are served concurrently, on one thread each. The server watches the project's build artifacts and
+reloads the index when they change - requests which are in flight at the time finish against the index
+they started with.
+
+Usage:
+    python -m inspector_facet.server --project <path to project> [--port 8535 | --socket <path>]
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .checkpoints import events_up_to
+from .facets import facets_from_events, iter_moonworm_crawldata
+from .loupe import facets_from_rpc
+from .matching import SelectorMatcher, selector_to_int
+from .project import (
+    FRAMEWORK_BROWNIE,
+    list_build_files,
+    load_contract_selectors,
+    project_framework,
+)
+from .signatures import SignatureDatabase, resolve_unknown_selectors
+from .timeline import IncrementalInspector
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8535
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+
+class UnknownEndpoint(Exception):
+    pass
+
+
+def build_files_signature(build_files: List[str]) -> List[Tuple[str, int, int]]:
+    """
+    Identifies the current version of the given build artifacts by their paths, modification times and
+    sizes.
+    """
+    signature: List[Tuple[str, int, int]] = []
+    for filepath in build_files:
+        stat = os.stat(filepath)
+        signature.append((os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+class InspectorIndex:
+    """
+    One loaded version of a project's index, together with the matcher built from it. Never modified once
+    built - reloading the project builds a new InspectorIndex.
+    """
+
+    def __init__(
+        self,
+        contract_selectors: Dict[str, Dict[str, str]],
+        build_files: Optional[List[Tuple[str, int, int]]] = None,
+    ) -> None:
+        self.matcher = SelectorMatcher(contract_selectors)
+        self.build_files = build_files
+        self.loaded_at = time.time()
+
+
+class InspectorService:
+    """
+    Handles the requests of the inspection server against the current InspectorIndex. Independent of the
+    transport, so it can also be used in-process.
+    """
+
+    def __init__(
+        self,
+        project_dir: str,
+        framework: str = FRAMEWORK_BROWNIE,
+        build_dir: Optional[str] = None,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        selector_cache: Optional[str] = None,
+        signature_db: Optional[SignatureDatabase] = None,
+    ) -> None:
+        self.project_dir = project_dir
+        self.framework = framework
+        self.build_dir = build_dir
+        self.include = include
+        self.exclude = exclude
+        self.selector_cache = selector_cache
+        self.signature_db = signature_db
+        self.reload_lock = threading.Lock()
+        self.index = self.load_index()
+
+    def list_build_files(self) -> List[str]:
+        return list_build_files(
+            self.project_dir, self.framework, self.build_dir, self.include, self.exclude
+        )
+
+    def load_index(self) -> InspectorIndex:
+        build_files = self.list_build_files()
+        signature = build_files_signature(build_files)
+        contract_selectors = load_contract_selectors(
+            build_files, self.framework, self.include, self.exclude, self.selector_cache
+        )
+        return InspectorIndex(contract_selectors, signature)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reloads the index if the project's build artifacts changed since it was loaded (or unconditionally,
+        if force is True). Returns True if the index was reloaded.
+        """
+        with self.reload_lock:
+            if not force:
+                signature = build_files_signature(self.list_build_files())
+                if signature == self.index.build_files:
+                    return False
+            # Requests read self.index once, so swapping it does not affect requests in flight.
+            self.index = self.load_index()
+            return True
+
+    def facets_for_request(self, request: Dict[str, Any]) -> Dict[str, List[str]]:
+        if request.get("facets") is not None:
+            return request["facets"]
+        if request.get("crawldata") is not None:
+            events: Iterable[Dict[str, Any]] = iter_moonworm_crawldata(
+                request["crawldata"]
+            )
+            if request.get("at_block") is not None:
+                events = events_up_to(events, request["at_block"])
+            return facets_from_events(events)
+        if request.get("rpc") is not None and request.get("address") is not None:
+            return facets_from_rpc(request["rpc"], request["address"])
+        raise ValueError(
+            "Request must specify facets, crawldata, or an rpc URL together with an address"
+        )
+
+    def inspect(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        index = self.index
+        facets = self.facets_for_request(request)
+        result = index.matcher.match_facets(facets)
+        if self.signature_db is not None:
+            resolve_unknown_selectors(facets, result, self.signature_db)
+        return result
+
+    def timeline(self, request: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        index = self.index
+        if request.get("events") is not None:
+            events = request["events"]
+        elif request.get("crawldata") is not None:
+            events = iter_moonworm_crawldata(request["crawldata"])
+        else:
+            raise ValueError("Request must specify either events or crawldata")
+        inspector = IncrementalInspector(matcher=index.matcher)
+        return [(inspector.apply(event), event) for event in events]
+
+    def selectors(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        index = self.index
+        selectors = request.get("selectors")
+        if not isinstance(selectors, list):
+            raise ValueError("Request must specify a list of selectors")
+        matcher = index.matcher
+        response: Dict[str, Any] = {}
+        for selector in selectors:
+            selector_int = selector_to_int(selector)
+            selector_response: Dict[str, Any] = {
+                "functions": [
+                    {
+                        "contract": matcher.contract_names[contract_id],
+                        "function": matcher.contract_functions[contract_id][selector_int],
+                    }
+                    for contract_id in matcher.selector_contracts.get(selector_int, ())
+                ]
+            }
+            if self.signature_db is not None:
+                selector_response["signatures"] = self.signature_db.lookup(selector_int)
+            response[selector] = selector_response
+        return response
+
+    def health(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "status": "ok",
+            "contracts": len(index.matcher.contract_names),
+            "loaded_at": index.loaded_at,
+        }
+
+    def handle(self, method: str, path: str, request: Dict[str, Any]) -> Any:
+        """
+        Dispatches a request. Raises UnknownEndpoint for unknown endpoints and ValueError for invalid
+        requests.
+        """
+        if method == "GET" and path == "/health":
+            return self.health()
+        if method == "POST":
+            if path == "/inspect":
+                return self.inspect(request)
+            if path == "/timeline":
+                return self.timeline(request)
+            if path == "/selectors":
+                return self.selectors(request)
+            if path == "/reload":
+                self.reload(force=True)
+                return self.health()
+        raise UnknownEndpoint(f"{method} {path}")
+
+
+class InspectorRequestHandler(BaseHTTPRequestHandler):
+    # Set on the handler class created for each server by make_server.
+    service: InspectorService
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address.
+        if isinstance(self.client_address, tuple):
+            return str(self.client_address[0])
+        return "unix"
+
+    def send_json(self, status: int, body: Any) -> None:
+        encoded = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def dispatch(self, method: str) -> None:
+        try:
+            request: Dict[str, Any] = {}
+            content_length = int(self.headers.get("Content-Length") or 0)
+            if content_length > 0:
+                request = json.loads(self.rfile.read(content_length))
+                if not isinstance(request, dict):
+                    raise ValueError("Request body must be a JSON object")
+            self.send_json(200, self.service.handle(method, self.path, request))
+        except UnknownEndpoint as e:
+            self.send_json(404, {"error": f"Unknown endpoint: {e}"})
+        except (ValueError, KeyError, FileNotFoundError) as e:
+            self.send_json(400, {"error": f"{e.__class__.__name__}: {e}"})
+        except Exception as e:
+            self.send_json(500, {"error": f"{e.__class__.__name__}: {e}"})
+
+    def do_GET(self) -> None:
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:
+        self.dispatch("POST")
+
+
+class ThreadingTCPHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    service: InspectorService,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+) -> socketserver.BaseServer:
+    """
+    Creates a server for the given service, listening on a Unix socket if socket_path is given and on
+    host:port otherwise.
+    """
+    handler = type(
+        "BoundInspectorRequestHandler", (InspectorRequestHandler,), {"service": service}
+    )
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingTCPHTTPServer((host, port), handler)
+
+
+def watch_artifacts(
+    service: InspectorService, interval: float, stop: threading.Event
+) -> None:
+    """
+    Reloads the service's index whenever the project's build artifacts change, until stop is set. An index
+    which fails to load (e.g. because an artifact was caught half-written) is retried on the next check.
+    """
+    while not stop.wait(interval):
+        try:
+            if service.reload():
+                print(
+                    f"Reloaded index: {len(service.index.matcher.contract_names)} contracts",
+                    file=sys.stderr,
+                )
+        except Exception as e:
+            print(f"Could not reload index: {e.__class__.__name__}: {e}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspector Facet server")
+    parser.add_argument("-p", "--project", required=True, help="Path to project")
+    parser.add_argument(
+        "--foundry",
+        action="store_true",
+        help="Use the foundry project structure instead of the brownie project structure",
+    )
+    parser.add_argument(
+        "--hardhat",
+        action="store_true",
+        help="Use the hardhat project structure instead of the brownie project structure",
+    )
+    parser.add_argument("--build-dir", default=None, help="Name of build directory (if it isn't the default name)")
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        help="Glob pattern for build artifacts to load (can be repeated)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help="Glob pattern for build artifacts to skip (can be repeated)",
+    )
+    parser.add_argument(
+        "--selector-cache",
+        default=None,
+        help="Path to a file in which to cache the function selectors computed from the project's build artifacts, so that reloads only re-hash the artifacts which changed",
+    )
+    parser.add_argument(
+        "--signature-db",
+        default=None,
+        help="Path to a signature database used to identify selectors which are not defined by any of the project's contracts",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Host to listen on. Default: {DEFAULT_HOST}")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on. Default: {DEFAULT_PORT}")
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Path of a Unix socket to listen on, instead of a TCP port",
+    )
+    parser.add_argument(
+        "--reload-interval",
+        type=float,
+        default=DEFAULT_RELOAD_INTERVAL,
+        help=f"Number of seconds between checks for changes to the project's build artifacts (0 disables reloading). Default: {DEFAULT_RELOAD_INTERVAL}",
+    )
+    args = parser.parse_args(argv)
+
+    signature_db = None
+    if args.signature_db is not None:
+        signature_db = SignatureDatabase(args.signature_db)
+    service = InspectorService(
+        args.project,
+        project_framework(args.foundry, args.hardhat),
+        args.build_dir,
+        args.include,
+        args.exclude,
+        args.selector_cache,
+        signature_db,
+    )
+    server = make_server(service, args.host, args.port, args.socket)
+
+    stop = threading.Event()
+    if args.reload_interval > 0:
+        watcher = threading.Thread(
+            target=watch_artifacts, args=(service, args.reload_interval, stop), daemon=True
+        )
+        watcher.start()
+
+    listening_on = args.socket if args.socket is not None else f"{args.host}:{args.port}"
+    print(
+        f"Serving {len(service.index.matcher.contract_names)} contracts on {listening_on}",
+        file=sys.stderr,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Offline database of function signatures, used to identify selectors which none of the project's ABIs
+define (for example, the selectors of facets deployed by third parties).
+
+The database is imported from signature dumps, such as those published by 4byte.directory and openchain.xyz,
+and stored as a single sorted binary file:
+- header: the magic bytes SIGNATURE_DB_MAGIC followed by the number of entries, as a little-endian uint32
+- selectors: one little-endian uint32 per entry, sorted (a selector with several known signatures has one
+  entry per signature)
+- offsets: number of entries + 1 little-endian uint32s - the signature of entry i is
+  strings[offsets[i]:offsets[i + 1]]
+- strings: the UTF-8 encoded signatures, concatenated
+
+The file is memory-mapped and searched by binary search, so opening it is instant and lookups only touch a
+few pages, however many millions of signatures it holds.
+
+To import dumps:
+    python -m inspector_facet.signatures import <database file> <dump file> [<dump file> ...]
+"""
+import argparse
+from array import array
+import bisect
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .keccak import keccak256
+from .matching import selector_to_int
+
+SIGNATURE_DB_MAGIC = b"IFSIGDB1"
+HEADER_FORMAT = "<8sI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAX_STRINGS_SIZE = (1 << 32) - 1
+
+# "<selector> <signature>", with the two separated by whitespace, a comma, a colon or a semicolon.
+SELECTOR_SIGNATURE_PATTERN = re.compile(r"^(0x[0-9a-fA-F]{8})[\s,;:]+(\S.*)$")
+
+
+def signature_selector(signature: str) -> int:
+    return int.from_bytes(keccak256(signature.encode("utf-8"))[:4], "big")
+
+
+def iter_signature_dump(dump_file: str) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (selector, signature) pairs from a signature dump. Supported formats:
+    - 4byte.directory CSV exports (with a text_signature column, and optionally a hex_signature column)
+    - openchain.xyz JSON exports ({"function": {"<selector>": [{"name": "<signature>"}, ...]}}), responses
+      of the openchain.xyz API ({"ok": true, "result": {"function": {...}}}), or JSON objects mapping
+      selectors directly to lists of signatures
+    - text files with one signature per line, optionally preceded by its selector
+      ("0xa9059cbb,transfer(address,uint256)")
+
+    Selectors are computed from the signatures when the dump does not include them.
+    """
+    with open(dump_file, "r", encoding="utf-8") as ifp:
+        head = ifp.read(4096)
+        ifp.seek(0)
+
+        if head.lstrip().startswith("{"):
+            dump = json.load(ifp)
+            if isinstance(dump.get("result"), dict):
+                dump = dump["result"]
+            functions = dump.get("function", dump)
+            if not isinstance(functions, dict):
+                raise ValueError(f"Unrecognized signature dump: {dump_file}")
+            for selector, items in functions.items():
+                if not isinstance(items, (list, type(None))):
+                    raise ValueError(
+                        f"Expected a list of signatures for selector {selector} in {dump_file}"
+                    )
+                for item in items or []:
+                    signature = item["name"] if isinstance(item, dict) else item
+                    yield selector_to_int(selector), signature
+            return
+
+        first_line = head.split("\n", 1)[0]
+        if "text_signature" in first_line:
+            for row in csv.DictReader(ifp):
+                signature = row["text_signature"]
+                hex_signature = row.get("hex_signature")
+                if hex_signature:
+                    yield selector_to_int(hex_signature), signature
+                else:
+                    yield signature_selector(signature), signature
+            return
+
+        for line in ifp:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            selector_signature_match = SELECTOR_SIGNATURE_PATTERN.match(line)
+            if selector_signature_match is not None:
+                yield selector_to_int(
+                    selector_signature_match.group(1)
+                ), selector_signature_match.group(2)
+            else:
+                yield signature_selector(line), line
+
+
+def build_signature_db(
+    signatures: Iterable[Tuple[int, str]], db_file: str
+) -> int:
+    """
+    Writes the given (selector, signature) pairs to a signature database, dropping duplicates. Returns the
+    number of entries in the database.
+    """
+    entries = sorted(set(signatures))
+
+    # The columns are built as uint32 arrays and written with tofile, and the signatures are encoded again
+    # as they are written rather than kept in memory.
+    selectors = array("I", (selector for selector, _ in entries))
+    offsets = array("I", [0])
+    strings_size = 0
+    for _, signature in entries:
+        strings_size += len(signature.encode("utf-8"))
+        if strings_size > MAX_STRINGS_SIZE:
+            raise ValueError("Too many signatures for a single signature database")
+        offsets.append(strings_size)
+    if sys.byteorder != "little":
+        selectors.byteswap()
+        offsets.byteswap()
+
+    temp_file = f"{db_file}.{os.getpid()}.tmp"
+    with open(temp_file, "wb") as ofp:
+        ofp.write(struct.pack(HEADER_FORMAT, SIGNATURE_DB_MAGIC, len(entries)))
+        selectors.tofile(ofp)
+        offsets.tofile(ofp)
+        for _, signature in entries:
+            ofp.write(signature.encode("utf-8"))
+    os.replace(temp_file, db_file)
+
+    return len(entries)
+
+
+def import_signature_dumps(dump_files: List[str], db_file: str) -> int:
+    """
+    Builds a signature database from the given dumps (and the database already at db_file, if there is
+    one). Returns the number of entries in the database.
+    """
+    signatures: List[Tuple[int, str]] = []
+    if os.path.isfile(db_file):
+        with SignatureDatabase(db_file) as existing_db:
+            signatures.extend(existing_db.entries())
+    for dump_file in dump_files:
+        signatures.extend(iter_signature_dump(dump_file))
+    return build_signature_db(signatures, db_file)
+
+
+class _SelectorColumn:
+    """
+    Read-only sequence view of the sorted selectors in a memory-mapped signature database, for bisect.
+    """
+
+    def __init__(self, mapped: mmap.mmap, size: int) -> None:
+        self.mapped = mapped
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, i: int) -> int:
+        return struct.unpack_from("<I", self.mapped, HEADER_SIZE + 4 * i)[0]
+
+
+class SignatureDatabase:
+    """
+    Memory-mapped signature database, as written by build_signature_db.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        with open(db_file, "rb") as ifp:
+            self.mapped = mmap.mmap(ifp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = struct.unpack_from(HEADER_FORMAT, self.mapped, 0)
+        if magic != SIGNATURE_DB_MAGIC:
+            self.mapped.close()
+            raise ValueError(f"Not a signature database: {db_file}")
+        self.selectors = _SelectorColumn(self.mapped, self.size)
+        self.offsets_start = HEADER_SIZE + 4 * self.size
+        self.strings_start = self.offsets_start + 4 * (self.size + 1)
+
+    def close(self) -> None:
+        self.mapped.close()
+
+    def __enter__(self) -> "SignatureDatabase":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _signature(self, i: int) -> str:
+        start, end = struct.unpack_from("<2I", self.mapped, self.offsets_start + 4 * i)
+        return self.mapped[self.strings_start + start : self.strings_start + end].decode(
+            "utf-8"
+        )
+
+    def lookup(self, selector: Union[str, int]) -> List[str]:
+        """
+        Known signatures for the given selector (as a hex string or an integer), in sorted order.
+        """
+        if isinstance(selector, str):
+            selector = selector_to_int(selector)
+        start = bisect.bisect_left(self.selectors, selector)  # type: ignore
+        end = bisect.bisect_right(self.selectors, selector, start)  # type: ignore
+        return [self._signature(i) for i in range(start, end)]
+
+    def entries(self) -> Iterator[Tuple[int, str]]:
+        for i in range(self.size):
+            yield self.selectors[i], self._signature(i)
+
+
+def resolve_unknown_selectors(
+    facets: Dict[str, List[str]],
+    result: Dict[str, Any],
+    signature_db: SignatureDatabase,
+) -> None:
+    """
+    Adds an "unknown" key to the result for each facet, listing the selectors which the facet serves but
+    none of its matching contracts define, each with its signatures from the signature database.
+    """
+    for address, address_result in result.items():
+        known_selectors = {
+            selector_to_int(item["selector"]) for item in address_result["selectors"]
+        }
+        address_result["unknown"] = [
+            {"selector": selector, "signatures": signature_db.lookup(selector)}
+            for selector in facets[address]
+            if selector_to_int(selector) not in known_selectors
+        ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspector Facet signature database")
+    subparsers = parser.add_subparsers(dest="command")
+
+    import_parser = subparsers.add_parser(
+        "import", help="Import signature dumps into a signature database"
+    )
+    import_parser.add_argument("db_file", help="Path to the signature database (created if it does not exist)")
+    import_parser.add_argument("dump_files", nargs="+", help="Signature dumps to import")
+
+    lookup_parser = subparsers.add_parser(
+        "lookup", help="Look selectors up in a signature database"
+    )
+    lookup_parser.add_argument("db_file", help="Path to the signature database")
+    lookup_parser.add_argument("selectors", nargs="+", help="Selectors to look up")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        num_entries = import_signature_dumps(args.dump_files, args.db_file)
+        print(f"{args.db_file}: {num_entries} signatures", file=sys.stderr)
+    elif args.command == "lookup":
+        with SignatureDatabase(args.db_file) as signature_db:
+            json.dump(
+                {selector: signature_db.lookup(selector) for selector in args.selectors},
+                sys.stdout,
+            )
+            sys.stdout.write("\n")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
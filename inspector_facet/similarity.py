@@ -0,0 +1,396 @@
+"""
+Candidate retrieval index for matching facets against very large corpora of contracts (e.g. tens of
+thousands of verified contracts), built on MinHash signatures of the contracts' selector sets with LSH
+banding.
+
+Each contract's selector set is summarized by a MinHash signature of num_permutations values. Signatures
+are cut into bands of num_permutations / bands values, and contracts are bucketed by each of their bands.
+A facet's candidates are the contracts which share at least one bucket with it - with high probability,
+every contract whose selector set is similar to the facet's (the Jaccard similarity above which contracts
+are found with probability 1/2 is roughly (1 / bands) ** (bands / num_permutations)).
+
+Candidates are then scored exactly, with the recall and precision rules of inspector_facet.matching:
+the matches of a facet are the candidates with maximum recall, and of those the ones with maximum
+precision.
+
+Jaccard similarity is low for a facet which serves only a few functions of a large contract, even though
+its recall for that contract is 1, so LSH alone would miss such contracts. If none of a facet's LSH
+candidates defines every selector the facet serves, further candidates are retrieved through the inverted
+index of SelectorMatcher: the contracts which define the facet's rarest selectors, taking selectors from
+the rarest up while there are at most max_candidates of them. Every contract which defines all the
+selectors of the facet defines its rarest selector, so these candidates include every contract with a
+recall of 1 - unless even the rarest selector is defined by more than max_candidates contracts, in which
+case only the first max_candidates of those are scored. Unlike SelectorMatcher, a facet which shares no
+selector with any contract has no matches.
+
+To build an index from a corpus of ABIs (plain ABI JSON files or build artifacts, in any directory
+structure) and query it:
+    python -m inspector_facet.similarity build <index file> <corpus directory> [<corpus directory> ...]
+    python -m inspector_facet.similarity query <index file> --crawldata <path to crawldata>
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .facets import facets_from_events, iter_moonworm_crawldata
+from .inspector import contract_selectors_from_abis
+from .matching import SelectorMatcher, selector_to_int
+
+SIMILARITY_INDEX_VERSION = 1
+
+DEFAULT_NUM_PERMUTATIONS = 64
+# With 64 permutations, 32 bands of 2 rows find contracts with a Jaccard similarity of about 0.18 to a
+# facet half of the time, and contracts with a similarity of 0.5 almost always - so that facets which
+# serve only part of a contract's functions are still matched to it.
+DEFAULT_BANDS = 32
+DEFAULT_SEED = 2535
+DEFAULT_TOP_K = 10
+# Maximum number of candidates retrieved through the inverted index for a facet which LSH does not match.
+DEFAULT_MAX_CANDIDATES = 256
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# Number of selectors whose hash values are cached. Common selectors (owner(), supportsInterface(bytes4),
+# ...) appear in a large fraction of contracts.
+HASH_CACHE_SIZE = 1 << 14
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of selector sets, with num_permutations universal hash functions
+    ((a * x + b) mod MERSENNE_PRIME, truncated to 32 bits) drawn deterministically from seed.
+    """
+
+    def __init__(self, num_permutations: int, seed: int = DEFAULT_SEED) -> None:
+        rng = random.Random(seed)
+        self.num_permutations = num_permutations
+        self.parameters: List[Tuple[int, int]] = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_permutations)
+        ]
+        self.selector_hashes = functools.lru_cache(maxsize=HASH_CACHE_SIZE)(
+            self._selector_hashes
+        )
+
+    def _selector_hashes(self, selector_int: int) -> List[int]:
+        return [
+            ((a * selector_int + b) % MERSENNE_PRIME) & MAX_HASH
+            for a, b in self.parameters
+        ]
+
+    def signature(self, selector_ints: Iterable[int]) -> List[int]:
+        hashes = [self.selector_hashes(selector_int) for selector_int in set(selector_ints)]
+        if not hashes:
+            return [MAX_HASH] * self.num_permutations
+        return list(map(min, zip(*hashes)))
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index over the contracts in a contract -> selector -> function index. Use
+    build_similarity_index to build one, or SimilarityIndex.load to read one saved earlier.
+    """
+
+    def __init__(
+        self,
+        contract_selectors: Dict[str, Dict[str, str]],
+        signatures: List[List[int]],
+        num_permutations: int = DEFAULT_NUM_PERMUTATIONS,
+        bands: int = DEFAULT_BANDS,
+        seed: int = DEFAULT_SEED,
+    ) -> None:
+        if bands < 1 or num_permutations % bands != 0:
+            raise ValueError(
+                f"Number of permutations ({num_permutations}) must be a multiple of the number of bands ({bands})"
+            )
+        self.matcher = SelectorMatcher(contract_selectors)
+        if len(signatures) != len(self.matcher.contract_names):
+            raise ValueError(
+                f"Expected {len(self.matcher.contract_names)} signatures, got {len(signatures)}"
+            )
+        self.signatures = signatures
+        self.num_permutations = num_permutations
+        self.bands = bands
+        self.rows = num_permutations // bands
+        self.seed = seed
+        self.hasher = MinHasher(num_permutations, seed)
+
+        self.buckets: Dict[Tuple[int, ...], List[int]] = {}
+        for contract_id, signature in enumerate(signatures):
+            if not self.matcher.contract_functions[contract_id]:
+                continue
+            for key in self.band_keys(signature):
+                self.buckets.setdefault(key, []).append(contract_id)
+
+    def band_keys(self, signature: List[int]) -> List[Tuple[int, ...]]:
+        # The band number is part of the key, so that equal values in different bands do not collide.
+        return [
+            (band, *signature[band * self.rows : (band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def candidate_ids(self, selector_ints: List[int]) -> List[int]:
+        """
+        Ids of the contracts which share at least one LSH bucket with a facet serving the given selectors,
+        in index order.
+        """
+        candidates = set()
+        for key in self.band_keys(self.hasher.signature(selector_ints)):
+            candidates.update(self.buckets.get(key, ()))
+        return sorted(candidates)
+
+    def rare_selector_candidate_ids(
+        self, selector_ints: List[int], max_candidates: int = DEFAULT_MAX_CANDIDATES
+    ) -> List[int]:
+        """
+        Ids of the contracts which define the rarest of the given selectors, in index order. Selectors are
+        taken from the rarest up for as long as they are defined by at most max_candidates contracts in
+        total, and at most max_candidates contracts are returned.
+        """
+        posting_lists = sorted(
+            (
+                self.matcher.selector_contracts[selector_int]
+                for selector_int in set(selector_ints)
+                if selector_int in self.matcher.selector_contracts
+            ),
+            key=len,
+        )
+        if not posting_lists:
+            return []
+        candidates = set(posting_lists[0][:max_candidates])
+        for contract_ids in posting_lists[1:]:
+            if len(candidates.union(contract_ids)) > max_candidates:
+                break
+            candidates.update(contract_ids)
+        return sorted(candidates)
+
+    def score(
+        self, selector_ints: List[int], contract_ids: List[int]
+    ) -> List[Tuple[int, float, float]]:
+        """
+        Exact (contract id, recall, precision) scores of the given contracts for a facet serving the given
+        selectors, ranked from best to worst.
+        """
+        distinct_selector_ints = set(selector_ints)
+        has_duplicates = len(distinct_selector_ints) != len(selector_ints)
+        scores: List[Tuple[int, float, float]] = []
+        for contract_id in contract_ids:
+            functions = self.matcher.contract_functions[contract_id]
+            precision_overlap = len(distinct_selector_ints.intersection(functions))
+            if precision_overlap == 0:
+                continue
+            # As in SelectorMatcher.match_ids, recall counts a selector the facet lists twice twice.
+            recall_overlap = precision_overlap
+            if has_duplicates:
+                recall_overlap = sum(
+                    1 for selector_int in selector_ints if selector_int in functions
+                )
+            scores.append(
+                (
+                    contract_id,
+                    recall_overlap / len(selector_ints),
+                    precision_overlap / self.matcher.contract_sizes[contract_id],
+                )
+            )
+        scores.sort(key=lambda item: (-item[1], -item[2], item[0]))
+        return scores
+
+    def match_facet(
+        self,
+        selectors: List[str],
+        top_k: int = DEFAULT_TOP_K,
+        max_candidates: int = DEFAULT_MAX_CANDIDATES,
+    ) -> Dict[str, Any]:
+        """
+        Matches the selectors served by a single facet against the candidates retrieved from the index.
+        Returns the same result as SelectorMatcher.match_facet (restricted to the candidates), together
+        with the top_k best scoring candidates under "candidates".
+        """
+        selector_ints = [selector_to_int(selector) for selector in selectors]
+        candidate_ids = self.candidate_ids(selector_ints)
+        scores = self.score(selector_ints, candidate_ids)
+        if not scores or scores[0][1] < 1.0:
+            # No candidate defines every selector of the facet - add the contracts which define its rarest
+            # selectors, among which are the contracts that a facet serving a small part of their functions
+            # belongs to.
+            rare_ids = set(
+                self.rare_selector_candidate_ids(selector_ints, max_candidates)
+            ).difference(candidate_ids)
+            scores.extend(self.score(selector_ints, sorted(rare_ids)))
+            scores.sort(key=lambda item: (-item[1], -item[2], item[0]))
+        match_ids = [
+            contract_id
+            for contract_id, recall, precision in scores
+            if (recall, precision) == scores[0][1:]
+        ]
+        address_result = self.matcher.describe_matches(sorted(match_ids), selector_ints)
+        address_result["candidates"] = [
+            {
+                "contract": self.matcher.contract_names[contract_id],
+                "recall": recall,
+                "precision": precision,
+            }
+            for contract_id, recall, precision in scores[:top_k]
+        ]
+        return address_result
+
+    def match_facets(
+        self,
+        facets: Dict[str, List[str]],
+        top_k: int = DEFAULT_TOP_K,
+        max_candidates: int = DEFAULT_MAX_CANDIDATES,
+    ) -> Dict[str, Dict[str, Any]]:
+        return {
+            address: self.match_facet(selectors, top_k, max_candidates)
+            for address, selectors in facets.items()
+            if len(selectors) > 0
+        }
+
+    def save(self, index_file: str) -> None:
+        temp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as ofp:
+            json.dump(
+                {
+                    "version": SIMILARITY_INDEX_VERSION,
+                    "num_permutations": self.num_permutations,
+                    "bands": self.bands,
+                    "seed": self.seed,
+                    "contracts": self.matcher.contract_selectors,
+                    "signatures": self.signatures,
+                },
+                ofp,
+            )
+        os.replace(temp_file, index_file)
+
+    @classmethod
+    def load(cls, index_file: str) -> "SimilarityIndex":
+        with open(index_file, "r") as ifp:
+            raw_index = json.load(ifp)
+        if raw_index.get("version") != SIMILARITY_INDEX_VERSION:
+            raise ValueError(
+                f"Unsupported similarity index version in {index_file}: {raw_index.get('version')}"
+            )
+        return cls(
+            raw_index["contracts"],
+            raw_index["signatures"],
+            raw_index["num_permutations"],
+            raw_index["bands"],
+            raw_index["seed"],
+        )
+
+
+def build_similarity_index(
+    contract_selectors: Dict[str, Dict[str, str]],
+    num_permutations: int = DEFAULT_NUM_PERMUTATIONS,
+    bands: int = DEFAULT_BANDS,
+    seed: int = DEFAULT_SEED,
+) -> SimilarityIndex:
+    """
+    Builds a similarity index over the contracts in the given contract -> selector -> function index (as
+    produced by inspector.contract_selectors_from_abis).
+    """
+    hasher = MinHasher(num_permutations, seed)
+    signatures = [
+        hasher.signature(selector_to_int(selector) for selector in selectors)
+        for selectors in contract_selectors.values()
+    ]
+    return SimilarityIndex(contract_selectors, signatures, num_permutations, bands, seed)
+
+
+def corpus_abis(corpus_dir: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Loads every ABI in a corpus directory. Each JSON file under the directory may contain either a plain ABI
+    (as published for verified contracts) or a build artifact with an "abi" key. Contracts are named by the
+    path of their file relative to the corpus directory, without the .json extension.
+    """
+    abis: Dict[str, List[Dict[str, Any]]] = {}
+    for dirpath, _, filenames in os.walk(corpus_dir):
+        for filename in sorted(filenames):
+            if not filename.endswith(".json"):
+                continue
+            filepath = os.path.join(dirpath, filename)
+            with open(filepath, "r") as ifp:
+                contents = json.load(ifp)
+            if isinstance(contents, dict):
+                contents = contents.get("abi")
+            if not isinstance(contents, list):
+                continue
+            contract_name, _ = os.path.splitext(os.path.relpath(filepath, corpus_dir))
+            abis[contract_name] = contents
+    return abis
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspector Facet similarity index")
+    subparsers = parser.add_subparsers(dest="command")
+
+    build_parser = subparsers.add_parser(
+        "build", help="Build a similarity index from corpora of ABIs"
+    )
+    build_parser.add_argument("index_file", help="Path at which to write the similarity index")
+    build_parser.add_argument("corpus_dirs", nargs="+", help="Directories containing ABI JSON files")
+    build_parser.add_argument(
+        "--num-permutations",
+        type=int,
+        default=DEFAULT_NUM_PERMUTATIONS,
+        help=f"Number of MinHash permutations. Default: {DEFAULT_NUM_PERMUTATIONS}",
+    )
+    build_parser.add_argument(
+        "--bands",
+        type=int,
+        default=DEFAULT_BANDS,
+        help=f"Number of LSH bands (fewer bands retrieve fewer, more similar, candidates). Default: {DEFAULT_BANDS}",
+    )
+    build_parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+
+    query_parser = subparsers.add_parser(
+        "query", help="Match the facets of a Diamond contract against a similarity index"
+    )
+    query_parser.add_argument("index_file", help="Path to the similarity index")
+    query_parser.add_argument(
+        "-c",
+        "--crawldata",
+        required=True,
+        help="Path to JSONL (JSON Lines) file containing moonworm crawl data for the Diamond contract",
+    )
+    query_parser.add_argument(
+        "--top-k",
+        type=int,
+        default=DEFAULT_TOP_K,
+        help=f"Number of ranked candidates to report for each facet. Default: {DEFAULT_TOP_K}",
+    )
+    query_parser.add_argument(
+        "--max-candidates",
+        type=int,
+        default=DEFAULT_MAX_CANDIDATES,
+        help=f"Maximum number of candidates to score for a facet which no similar contract defines entirely. Default: {DEFAULT_MAX_CANDIDATES}",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        abis: Dict[str, List[Dict[str, Any]]] = {}
+        for corpus_dir in args.corpus_dirs:
+            abis.update(corpus_abis(corpus_dir))
+        index = build_similarity_index(
+            contract_selectors_from_abis(abis), args.num_permutations, args.bands, args.seed
+        )
+        index.save(args.index_file)
+        print(f"{args.index_file}: {len(abis)} contracts", file=sys.stderr)
+    elif args.command == "query":
+        index = SimilarityIndex.load(args.index_file)
+        facets = facets_from_events(iter_moonworm_crawldata(args.crawldata))
+        json.dump(
+            index.match_facets(facets, args.top_k, args.max_candidates), sys.stdout
+        )
+        sys.stdout.write("\n")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
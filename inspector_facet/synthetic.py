@@ -0,0 +1,243 @@
+"""
+Deterministic generator of synthetic projects and Diamond histories, for benchmarks and tests.
+
+Everything is generated from a seeded random.Random, so the same parameters always produce byte-identical
+artifacts and crawldata.
+"""
+import json
+import os
+import random
+from typing import Any, Dict, Iterator, List
+
+from .facets import CUT_ACTION_ADD, CUT_ACTION_REMOVE, CUT_ACTION_REPLACE, ZERO_ADDRESS
+
+DEFAULT_SEED = 2535
+
+ARGUMENT_TYPES = [
+    "address",
+    "uint256",
+    "uint8",
+    "bool",
+    "bytes32",
+    "bytes",
+    "string",
+    "uint256[]",
+    "address[]",
+]
+
+VERBS = ["get", "set", "mint", "burn", "transfer", "claim", "stake", "withdraw", "update"]
+NOUNS = ["Token", "Land", "Owner", "Balance", "Reward", "Config", "Role", "Item", "Price"]
+
+# Functions which many contracts define (as if they came from a shared library or base contract), so that
+# facets are matched against several candidate contracts.
+SHARED_FUNCTIONS = [
+    {"name": "owner", "inputs": []},
+    {"name": "transferOwnership", "inputs": [{"type": "address"}]},
+    {"name": "supportsInterface", "inputs": [{"type": "bytes4"}]},
+    {"name": "paused", "inputs": []},
+]
+
+
+def function_abi(name: str, input_types: List[str]) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "name": name,
+        "inputs": [
+            {"name": f"arg{i}", "type": input_type}
+            for i, input_type in enumerate(input_types)
+        ],
+        "outputs": [],
+        "stateMutability": "nonpayable",
+    }
+
+
+def synthetic_abis(
+    num_contracts: int, functions_per_contract: int = 20, seed: int = DEFAULT_SEED
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Generates ABIs for num_contracts contracts, named Contract0, Contract1, ..., each with around
+    functions_per_contract functions.
+    """
+    rng = random.Random(seed)
+    abis: Dict[str, List[Dict[str, Any]]] = {}
+    for contract_index in range(num_contracts):
+        contract_abi: List[Dict[str, Any]] = []
+        for shared_function in SHARED_FUNCTIONS:
+            if rng.random() < 0.25:
+                contract_abi.append(
+                    function_abi(
+                        shared_function["name"],
+                        [item["type"] for item in shared_function["inputs"]],
+                    )
+                )
+        for function_index in range(functions_per_contract - len(contract_abi)):
+            name = f"{rng.choice(VERBS)}{rng.choice(NOUNS)}{contract_index}x{function_index}"
+            input_types = [rng.choice(ARGUMENT_TYPES) for _ in range(rng.randrange(4))]
+            contract_abi.append(function_abi(name, input_types))
+        contract_abi.append(
+            {
+                "type": "event",
+                "name": f"Updated{contract_index}",
+                "inputs": [{"name": "value", "type": "uint256", "indexed": False}],
+                "anonymous": False,
+            }
+        )
+        abis[f"Contract{contract_index}"] = contract_abi
+    return abis
+
+
+def write_artifact_tree(
+    project_dir: str,
+    abis: Dict[str, List[Dict[str, Any]]],
+    layout: str = "brownie",
+    bytecode_size: int = 2048,
+) -> None:
+    """
+    Writes a build artifact for each of the given contracts into project_dir, laid out as a brownie
+    (build/contracts/<name>.json) or foundry (out/<name>.sol/<name>.json) project. Each artifact carries
+    bytecode_size bytes of dummy bytecode, so that artifacts have realistic sizes.
+    """
+    if layout not in ["brownie", "foundry"]:
+        raise ValueError(f"Unknown artifact layout: {layout}")
+
+    bytecode = "0x" + "60" * bytecode_size
+    for contract_name, contract_abi in abis.items():
+        if layout == "brownie":
+            artifact_dir = os.path.join(project_dir, "build", "contracts")
+            artifact: Dict[str, Any] = {
+                "abi": contract_abi,
+                "contractName": contract_name,
+                "bytecode": bytecode,
+            }
+        else:
+            artifact_dir = os.path.join(project_dir, "out", f"{contract_name}.sol")
+            artifact = {
+                "abi": contract_abi,
+                "bytecode": {"object": bytecode},
+                "deployedBytecode": {"object": bytecode},
+            }
+        os.makedirs(artifact_dir, exist_ok=True)
+        with open(os.path.join(artifact_dir, f"{contract_name}.json"), "w") as ofp:
+            json.dump(artifact, ofp)
+
+
+def synthetic_diamond_cuts(
+    contract_selectors: Dict[str, Dict[str, str]],
+    num_events: int,
+    num_facets: int = 300,
+    seed: int = DEFAULT_SEED,
+    diamond_address: str = "0x" + "d1" * 20,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generates the DiamondCut events for a Diamond contract which mounts up to num_facets facets, each of
+    which is a deployment of one of the given contracts. Every event is valid against the state produced by
+    the events before it, and roughly half of the events add selectors, a third replace selectors (moving
+    them to another deployment of the same contract) and the rest remove selectors.
+    """
+    rng = random.Random(seed)
+    contract_names = [name for name in contract_selectors if contract_selectors[name]]
+    if not contract_names:
+        raise ValueError("At least one contract must define selectors")
+
+    # Several facets are deployments of the same contract, so that replacements have somewhere to go.
+    num_deployed_contracts = max(1, min(len(contract_names), num_facets // 2))
+    deployed_contracts = rng.sample(contract_names, num_deployed_contracts)
+    facet_contracts: Dict[str, str] = {}
+    contract_facets: Dict[str, List[str]] = {}
+    for facet_index in range(num_facets):
+        facet_address = f"0x{rng.getrandbits(160):040x}"
+        contract_name = deployed_contracts[facet_index % num_deployed_contracts]
+        facet_contracts[facet_address] = contract_name
+        contract_facets.setdefault(contract_name, []).append(facet_address)
+    facet_addresses = list(facet_contracts)
+
+    # Mounted selectors, kept in a list with an index into it so that random selectors can be picked and
+    # removed in constant time.
+    selector_facets: Dict[str, str] = {}
+    mounted_selectors: List[str] = []
+    mounted_positions: Dict[str, int] = {}
+
+    def mount(selector: str, facet_address: str) -> None:
+        if selector not in selector_facets:
+            mounted_positions[selector] = len(mounted_selectors)
+            mounted_selectors.append(selector)
+        selector_facets[selector] = facet_address
+
+    def unmount(selector: str) -> None:
+        del selector_facets[selector]
+        position = mounted_positions.pop(selector)
+        last_selector = mounted_selectors.pop()
+        if last_selector != selector:
+            mounted_selectors[position] = last_selector
+            mounted_positions[last_selector] = position
+
+    block_number = 15_000_000
+    log_index = 0
+    for _ in range(num_events):
+        roll = rng.random()
+        cut: List[Any] = []
+        if roll < 0.5 or len(mounted_selectors) < 2:
+            facet_address = rng.choice(facet_addresses)
+            available = [
+                selector
+                for selector in contract_selectors[facet_contracts[facet_address]]
+                if selector not in selector_facets
+            ]
+            if available:
+                selectors = rng.sample(available, min(len(available), rng.randint(1, 8)))
+                for selector in selectors:
+                    mount(selector, facet_address)
+                cut = [facet_address, CUT_ACTION_ADD, selectors]
+        elif roll < 0.83:
+            selector = rng.choice(mounted_selectors)
+            old_facet = selector_facets[selector]
+            targets = [
+                facet_address
+                for facet_address in contract_facets[facet_contracts[old_facet]]
+                if facet_address != old_facet
+            ]
+            if targets:
+                new_facet = rng.choice(targets)
+                selectors = [
+                    candidate
+                    for candidate in contract_selectors[facet_contracts[old_facet]]
+                    if selector_facets.get(candidate) == old_facet
+                ]
+                selectors = selectors[: rng.randint(1, 8)]
+                for moved_selector in selectors:
+                    mount(moved_selector, new_facet)
+                cut = [new_facet, CUT_ACTION_REPLACE, selectors]
+
+        if not cut:
+            selectors = rng.sample(mounted_selectors, min(len(mounted_selectors), rng.randint(1, 4)))
+            for selector in selectors:
+                unmount(selector)
+            cut = [ZERO_ADDRESS, CUT_ACTION_REMOVE, selectors]
+
+        if rng.random() < 0.7:
+            block_number += rng.randint(1, 50)
+            log_index = 0
+        else:
+            log_index += rng.randint(1, 5)
+
+        yield {
+            "event": "DiamondCut",
+            "args": {"_diamondCut": [cut], "_init": ZERO_ADDRESS, "_calldata": "0x"},
+            "address": diamond_address,
+            "blockNumber": block_number,
+            "transactionHash": f"0x{rng.getrandbits(256):064x}",
+            "logIndex": log_index,
+        }
+
+
+def write_crawldata(crawldata_jsonl: str, events: Iterator[Dict[str, Any]]) -> int:
+    """
+    Writes the given events to a crawldata file in the format produced by `moonworm watch`. Returns the
+    number of events written.
+    """
+    num_events = 0
+    with open(crawldata_jsonl, "w") as ofp:
+        for event in events:
+            ofp.write(json.dumps(event) + "\n")
+            num_events += 1
+    return num_events
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import unittest
+
+from . import abi, cache, inspector
+
+OWNER_ABI = [{"type": "function", "name": "owner", "inputs": [], "outputs": []}]
+
+
+class TestFoundryArtifactLoading(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.project_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_artifact(self, source_name, contract_name, artifact):
+        artifact_dir = os.path.join(self.project_dir, "out", source_name)
+        os.makedirs(artifact_dir, exist_ok=True)
+        with open(os.path.join(artifact_dir, f"{contract_name}.json"), "w") as ofp:
+            json.dump(artifact, ofp)
+
+    def test_abi_only_loading_and_glob_filters(self):
+        # ABI first, followed by more data than is read in one chunk.
+        self.write_artifact(
+            "Ownable.sol",
+            "Ownable",
+            {"abi": OWNER_ABI, "bytecode": {"object": "0x" + "00" * abi.ABI_READ_CHUNK_SIZE}},
+        )
+        # ABI after other keys, as in hardhat artifacts.
+        self.write_artifact(
+            "Diamond.sol",
+            "Diamond",
+            {"_format": "hh-sol-artifact-1", "abi": OWNER_ABI + OWNER_ABI},
+        )
+        self.write_artifact("Ownable.t.sol", "OwnableTest", {"abi": OWNER_ABI})
+        self.write_artifact("Deploy.s.sol", "Deploy", {"abi": OWNER_ABI})
+
+        build_files = abi.foundry_build_files(
+            self.project_dir, exclude=["*.t.sol", "*.s.sol"]
+        )
+        abis = abi.abis_from_build_files(build_files, workers=2)
+
+        self.assertDictEqual(
+            abis, {"Ownable": OWNER_ABI, "Diamond": OWNER_ABI + OWNER_ABI}
+        )
+
+        included_files = abi.foundry_build_files(
+            self.project_dir, include=["Ownable*"], exclude=["*.t.sol"]
+        )
+        self.assertEqual(
+            [abi.contract_name_from_artifact(path) for path in included_files],
+            ["Ownable"],
+        )
+
+    def test_build_info_files_are_not_artifacts(self):
+        self.write_artifact("Ownable.sol", "Ownable", {"abi": OWNER_ABI})
+        # Forge writes the compiler input and output for each run to out/build-info.
+        self.write_artifact(
+            "build-info",
+            "abc",
+            {
+                "id": "abc",
+                "output": {
+                    "contracts": {"src/Ownable.sol": {"Ownable": {"abi": OWNER_ABI}}}
+                },
+            },
+        )
+
+        self.assertDictEqual(
+            abi.foundry_project_abis(self.project_dir), {"Ownable": OWNER_ABI}
+        )
+
+
+class TestHardhatArtifactLoading(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.project_dir = self.temp_dir.name
+        self.build_info_dir = os.path.join(self.project_dir, "artifacts", "build-info")
+        os.makedirs(self.build_info_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_build_info(self, build_id, contracts, mtime):
+        build_info = {
+            "_format": "hh-sol-build-info-1",
+            "input": {"sources": {source: {"content": "..."} for source in contracts}},
+            "output": {
+                "contracts": {
+                    source: {
+                        name: {"abi": contract_abi, "evm": {"bytecode": {"object": "00"}}}
+                        for name, contract_abi in source_contracts.items()
+                    }
+                    for source, source_contracts in contracts.items()
+                }
+            },
+        }
+        build_info_file = os.path.join(self.build_info_dir, f"{build_id}.json")
+        with open(build_info_file, "w") as ofp:
+            json.dump(build_info, ofp)
+        os.utime(build_info_file, (mtime, mtime))
+
+    def test_build_info_loading(self):
+        stale_abi = [{"type": "function", "name": "stale", "inputs": [], "outputs": []}]
+        # The newer build-info file was compiled later, so its ABI for Ownable.sol wins.
+        self.write_build_info(
+            "a" * 32, {"contracts/Ownable.sol": {"Ownable": OWNER_ABI}}, 2000
+        )
+        self.write_build_info(
+            "b" * 32,
+            {
+                "contracts/Ownable.sol": {"Ownable": stale_abi},
+                "contracts/test/Ownable.t.sol": {"Ownable": OWNER_ABI + OWNER_ABI},
+            },
+            1000,
+        )
+
+        abis = abi.hardhat_project_abis(self.project_dir)
+        self.assertDictEqual(
+            abis,
+            {
+                "contracts/Ownable.sol:Ownable": OWNER_ABI,
+                "contracts/test/Ownable.t.sol:Ownable": OWNER_ABI + OWNER_ABI,
+            },
+        )
+
+        # Build-info files are only read as such when they are loaded as hardhat build files.
+        build_files = abi.hardhat_build_files(self.project_dir)
+        self.assertDictEqual(abi.abis_from_build_files(build_files, build_info=True), abis)
+        self.assertDictEqual(
+            cache.contract_selectors_from_build_files(build_files, build_info=True),
+            inspector.contract_selectors_from_abis(abis),
+        )
+
+        self.assertEqual(
+            list(abi.hardhat_project_abis(self.project_dir, exclude=["*.t.sol"])),
+            ["contracts/Ownable.sol:Ownable"],
+        )
+        self.assertEqual(
+            list(abi.hardhat_project_abis(self.project_dir, include=["test"])),
+            ["contracts/test/Ownable.t.sol:Ownable"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
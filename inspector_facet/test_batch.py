@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from . import batch, facets, inspector
+from .test_timeline import load_test_abis
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class TestInspectBatch(unittest.TestCase):
+    maxDiff = None
+
+    def test_batch_matches_individual_inspections(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        contract_selectors = inspector.contract_selectors_from_abis(load_test_abis())
+        expected_result = inspector.inspect_diamond(
+            facets.facets_from_events(
+                facets.events_from_moonworm_crawldata(crawldata_jsonl)
+            ),
+            contract_selectors=contract_selectors,
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shutil.copy(crawldata_jsonl, os.path.join(temp_dir, "first.jsonl"))
+            shutil.copy(crawldata_jsonl, os.path.join(temp_dir, "second.jsonl"))
+            manifest_file = os.path.join(temp_dir, "manifest.json")
+            with open(manifest_file, "w") as ofp:
+                json.dump(
+                    [
+                        {"name": "first", "crawldata": "first.jsonl"},
+                        {"crawldata": "second.jsonl"},
+                        {"name": "missing", "crawldata": "missing.jsonl"},
+                    ],
+                    ofp,
+                )
+
+            entries = batch.load_manifest(manifest_file)
+            batch_results = {
+                batch_result["name"]: batch_result
+                for batch_result in batch.inspect_batch(
+                    entries, contract_selectors, workers=2
+                )
+            }
+
+        self.assertEqual(set(batch_results), {"first", "second.jsonl", "missing"})
+        self.assertDictEqual(batch_results["first"]["result"], expected_result)
+        self.assertDictEqual(batch_results["second.jsonl"]["result"], expected_result)
+        self.assertIn("FileNotFoundError", batch_results["missing"]["error"])
+
+    def test_crawldata_is_partitioned_by_address(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        contract_selectors = inspector.contract_selectors_from_abis(load_test_abis())
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        expected_result = inspector.inspect_diamond(
+            facets.facets_from_events(events), contract_selectors=contract_selectors
+        )
+
+        first_address = events[0]["address"]
+        second_address = "0x000000000000000000000000000000000000dEaD"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            mixed_jsonl = os.path.join(temp_dir, "mixed.jsonl")
+            with open(mixed_jsonl, "w") as ofp:
+                # Events of the two diamonds are interleaved, and the first diamond's address is not
+                # always spelled the same way.
+                for i, event in enumerate(events):
+                    if i % 2 == 1:
+                        event = dict(event, address=first_address.lower())
+                    ofp.write(json.dumps(event) + "\n")
+                    ofp.write(json.dumps(dict(event, address=second_address)) + "\n")
+
+            batch_results = {
+                batch_result["name"]: batch_result
+                for batch_result in batch.inspect_crawldata_by_address(
+                    mixed_jsonl, contract_selectors, workers=2
+                )
+            }
+
+        self.assertEqual(set(batch_results), {first_address, second_address})
+        self.assertDictEqual(batch_results[first_address]["result"], expected_result)
+        self.assertDictEqual(batch_results[second_address]["result"], expected_result)
+
+
+if __name__ == "__main__":
+    unittest.main()
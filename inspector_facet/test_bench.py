@@ -0,0 +1,27 @@
+import contextlib
+import io
+import unittest
+
+from . import bench
+
+
+class TestBenchBaseline(unittest.TestCase):
+    def test_compare_with_baseline(self):
+        baseline = {
+            "timeline": {"seconds": 1.0, "peak_bytes": 100},
+            "rendering": {"seconds": 1.0, "peak_bytes": 100},
+        }
+        report = {
+            "timeline": {"seconds": 1.2, "peak_bytes": 100},
+            "rendering": {"seconds": 1.3, "peak_bytes": None},
+        }
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(bench.compare_with_baseline(report, baseline), ["rendering"])
+            self.assertEqual(
+                bench.compare_with_baseline(report, baseline, tolerance=1.1),
+                ["timeline", "rendering"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from . import abi, cache, inspector
+
+ABIS_DIR = os.path.join(os.path.dirname(__file__), "abis")
+
+
+class TestContractSelectorsFromBuildFiles(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.project_dir = self.temp_dir.name
+        self.contracts_dir = os.path.join(self.project_dir, "build", "contracts")
+        os.makedirs(self.contracts_dir)
+        self.cache_file = os.path.join(self.project_dir, "selectors-cache.json")
+
+        with open(os.path.join(ABIS_DIR, "DiamondLoupeFacet.json"), "r") as ifp:
+            loupe_artifact = json.load(ifp)
+        with open(os.path.join(ABIS_DIR, "DiamondCutFacetABI.json"), "r") as ifp:
+            cut_artifact = {"abi": json.load(ifp)}
+        self.write_artifact("DiamondLoupeFacet", loupe_artifact)
+        self.write_artifact("DiamondCutFacet", cut_artifact)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_artifact(self, contract_name, artifact):
+        with open(os.path.join(self.contracts_dir, f"{contract_name}.json"), "w") as ofp:
+            json.dump(artifact, ofp)
+
+    def expected_contract_selectors(self):
+        return inspector.contract_selectors_from_abis(
+            abi.brownie_project_abis(self.project_dir)
+        )
+
+    def test_only_changed_artifacts_are_rehashed(self):
+        build_files = abi.brownie_build_files(self.project_dir)
+        contract_selectors = cache.contract_selectors_from_build_files(
+            build_files, self.cache_file
+        )
+        self.assertDictEqual(contract_selectors, self.expected_contract_selectors())
+        self.assertTrue(os.path.isfile(self.cache_file))
+
+        self.write_artifact(
+            "DiamondCutFacet",
+            {
+                "abi": [
+                    {
+                        "type": "function",
+                        "name": "owner",
+                        "inputs": [],
+                        "outputs": [],
+                    }
+                ]
+            },
+        )
+
+        with mock.patch.object(
+            cache,
+            "contract_selectors_from_abis",
+            wraps=inspector.contract_selectors_from_abis,
+        ) as hasher:
+            contract_selectors = cache.contract_selectors_from_build_files(
+                build_files, self.cache_file
+            )
+            self.assertEqual(hasher.call_count, 1)
+            self.assertEqual(list(hasher.call_args[0][0]), ["DiamondCutFacet"])
+
+        self.assertDictEqual(contract_selectors, self.expected_contract_selectors())
+        self.assertDictEqual(
+            contract_selectors["DiamondCutFacet"], {"0x8da5cb5b": "owner"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
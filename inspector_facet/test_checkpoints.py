@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+
+from . import checkpoints, facets, ordering
+from .test_timeline import FIXTURES_DIR
+
+
+class TestCheckpointStore(unittest.TestCase):
+    maxDiff = None
+
+    def test_facets_at_matches_replay(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        block_numbers = sorted({event["blockNumber"] for event in events})
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store_dir = os.path.join(temp_dir, "store")
+            checkpoints.build_checkpoint_store(crawldata_jsonl, store_dir, interval=4)
+            store = checkpoints.CheckpointStore(store_dir)
+            self.assertEqual(len(store), len(events))
+            self.assertFalse(store.is_stale(crawldata_jsonl))
+
+            query_blocks = (
+                [block_numbers[0] - 1]
+                + block_numbers
+                + [block_numbers[-1] + 1]
+                + [block_number + 1 for block_number in block_numbers]
+            )
+            for block_number in query_blocks:
+                expected_facets = facets.facets_from_events(
+                    event for event in events if event["blockNumber"] <= block_number
+                )
+                self.assertEqual(
+                    store.facets_at(block_number), expected_facets, block_number
+                )
+
+            event = events[len(events) // 2]
+            self.assertEqual(
+                store.facets_at(event["blockNumber"], event["logIndex"]),
+                facets.facets_from_events(
+                    checkpoints.events_up_to(
+                        events, event["blockNumber"], event["logIndex"]
+                    )
+                ),
+            )
+
+    def test_replays_events_in_chain_order(self):
+        events = facets.events_from_moonworm_crawldata(
+            os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        )
+        # Events listed out of chain order are replayed sorted by ordering.event_sort_key.
+        crawled_events = events[::-1]
+        expected_events = sorted(crawled_events, key=ordering.event_sort_key)
+        last_block = expected_events[-1]["blockNumber"]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            crawldata_jsonl = os.path.join(temp_dir, "crawldata.jsonl")
+            with open(crawldata_jsonl, "w") as ofp:
+                for event in crawled_events:
+                    ofp.write(json.dumps(event) + "\n")
+            store = checkpoints.open_checkpoint_store(
+                crawldata_jsonl, os.path.join(temp_dir, "store"), interval=3
+            )
+            self.assertEqual(
+                store.facets_at(last_block), facets.facets_from_events(expected_events)
+            )
+
+        self.assertEqual(
+            checkpoints.events_up_to(crawled_events, last_block), expected_events
+        )
+        self.assertEqual(expected_events, events)
+
+    def test_open_rebuilds_stale_store(self):
+        with open(os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl"), "r") as ifp:
+            lines = ifp.readlines()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            crawldata_jsonl = os.path.join(temp_dir, "crawldata.jsonl")
+            store_dir = os.path.join(temp_dir, "store")
+            with open(crawldata_jsonl, "w") as ofp:
+                ofp.writelines(lines[:5])
+            store = checkpoints.open_checkpoint_store(crawldata_jsonl, store_dir)
+            self.assertEqual(len(store), 5)
+
+            with open(crawldata_jsonl, "a") as ofp:
+                ofp.writelines(lines[5:])
+            store = checkpoints.open_checkpoint_store(crawldata_jsonl, store_dir)
+            self.assertEqual(len(store), len(lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from . import cli, facets, timeline
+from .test_timeline import ABIS_DIR, FIXTURES_DIR, load_test_abis
+
+RESULT = {
+    "0xA": {
+        "matches": ["Ownable", "OwnershipFacet"],
+        "misses": [{"contract": "Ownable", "selector": "0x715018a6", "function": "renounceOwnership"}],
+        "selectors": [
+            {"contract": "Ownable", "selector": "0x8da5cb5b", "function": "owner"},
+            {"contract": "OwnershipFacet", "selector": "0x8da5cb5b", "function": "owner"},
+        ],
+    }
+}
+
+
+class TestHumanRendering(unittest.TestCase):
+    maxDiff = None
+
+    def test_timeline_event_uses_distinct_selector_matches(self):
+        event = {
+            "blockNumber": 1,
+            "transactionHash": "0x01",
+            "args": {
+                "_diamondCut": [["0xA", 0, ["0x8da5cb5b", "0x01ffc9a7"]]],
+                "_init": "0x0000000000000000000000000000000000000000",
+                "_calldata": "0x",
+            },
+        }
+        out = io.StringIO()
+        cli.print_timeline_event_for_human(RESULT, RESULT, event, out)
+        lines = out.getvalue().splitlines()
+
+        self.assertIn(
+            "\t0x8da5cb5b - owner from Ownable or owner from OwnershipFacet", lines
+        )
+        self.assertIn("\t0x01ffc9a7", lines)
+        self.assertEqual(lines.count("Ownable:"), 1)
+        self.assertIn("\t\tMissing selector: 0x715018a6, Function: renounceOwnership", lines)
+
+
+class TestTimelineNDJSON(unittest.TestCase):
+    maxDiff = None
+
+    def test_each_step_is_one_line(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        expected_steps = json.loads(
+            json.dumps(list(timeline.timeline_from_events(events, load_test_abis())))
+        )
+
+        with tempfile.TemporaryDirectory() as project_dir:
+            contracts_dir = os.path.join(project_dir, "build", "contracts")
+            os.makedirs(contracts_dir)
+            shutil.copy(os.path.join(ABIS_DIR, "DiamondLoupeFacet.json"), contracts_dir)
+            with open(os.path.join(ABIS_DIR, "DiamondCutFacetABI.json"), "r") as ifp:
+                cut_abi = json.load(ifp)
+            with open(os.path.join(contracts_dir, "DiamondCutFacet.json"), "w") as ofp:
+                json.dump({"abi": cut_abi}, ofp)
+
+            argv = [
+                "inspector-facet",
+                "--crawldata",
+                crawldata_jsonl,
+                "--project",
+                project_dir,
+                "--timeline",
+                "--format",
+                "ndjson",
+            ]
+            out = io.StringIO()
+            with mock.patch("sys.argv", argv), contextlib.redirect_stdout(out):
+                cli.main()
+
+        actual_steps = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(actual_steps, expected_steps)
+
+
+class TestParallelTimeline(unittest.TestCase):
+    maxDiff = None
+
+    def run_cli(self, project_dir, crawldata_jsonl, *extra_args):
+        argv = [
+            "inspector-facet",
+            "--crawldata",
+            crawldata_jsonl,
+            "--project",
+            project_dir,
+            "--timeline",
+            *extra_args,
+        ]
+        out = io.StringIO()
+        with mock.patch("sys.argv", argv), contextlib.redirect_stdout(out):
+            cli.main()
+        return out.getvalue()
+
+    def test_output_is_identical_to_sequential_timeline(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        with tempfile.TemporaryDirectory() as project_dir:
+            contracts_dir = os.path.join(project_dir, "build", "contracts")
+            os.makedirs(contracts_dir)
+            shutil.copy(os.path.join(ABIS_DIR, "DiamondLoupeFacet.json"), contracts_dir)
+
+            for output_format in ["json", "ndjson", "human"]:
+                sequential_output = self.run_cli(
+                    project_dir, crawldata_jsonl, "--format", output_format
+                )
+                parallel_output = self.run_cli(
+                    project_dir,
+                    crawldata_jsonl,
+                    "--format",
+                    output_format,
+                    "--workers",
+                    "2",
+                    "--segment-size",
+                    "3",
+                )
+                self.assertEqual(parallel_output, sequential_output)
+
+    def test_rejects_invalid_workers_and_segment_size(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        for extra_args in [
+            ["--workers", "0"],
+            ["--workers", "-2"],
+            ["--workers", "2", "--segment-size", "0"],
+        ]:
+            with self.assertRaises(SystemExit) as context, contextlib.redirect_stderr(
+                io.StringIO()
+            ):
+                self.run_cli(ABIS_DIR, crawldata_jsonl, *extra_args)
+            self.assertEqual(context.exception.code, 2)
+
+
+class TestArguments(unittest.TestCase):
+    def test_rejects_malformed_selector(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        for selector in ["0xnothex", "0x123456789"]:
+            argv = ["inspector-facet", "--crawldata", crawldata_jsonl, "--selector", selector]
+            with mock.patch("sys.argv", argv), self.assertRaises(
+                SystemExit
+            ) as context, contextlib.redirect_stderr(io.StringIO()) as err:
+                cli.main()
+            self.assertEqual(context.exception.code, 2)
+            self.assertIn(f"invalid selector: {selector}", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+from . import delta, facets, timeline
+from .test_timeline import FIXTURES_DIR, load_test_abis
+
+
+class TestDeltaTimeline(unittest.TestCase):
+    maxDiff = None
+
+    def test_reader_rebuilds_every_step(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        abis = load_test_abis()
+        expected_results = [
+            result for result, _ in timeline.timeline_from_events(events, abis)
+        ]
+
+        records = list(
+            delta.delta_timeline_from_events(events, abis, snapshot_interval=5)
+        )
+        self.assertEqual(
+            [record["step"] for record in records if record["type"] == "snapshot"],
+            [0, 5, 10, 15],
+        )
+        actual_results = list(delta.results_from_delta_records(records))
+        self.assertEqual(actual_results, expected_results)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            delta_timeline_jsonl = os.path.join(temp_dir, "timeline.jsonl")
+            with open(delta_timeline_jsonl, "w") as ofp:
+                for record in records:
+                    ofp.write(json.dumps(record) + "\n")
+
+            reader = delta.DeltaTimelineReader(delta_timeline_jsonl)
+            self.assertEqual(len(reader), len(events))
+            for step in [0, 3, 5, 9, len(events) - 1]:
+                result = reader.result_at(step)
+                self.assertEqual(list(result), list(expected_results[step]))
+                self.assertDictEqual(result, expected_results[step])
+
+    def test_reader_decodes_other_layouts(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        records = list(
+            delta.delta_timeline_from_events(events, load_test_abis(), snapshot_interval=5)
+        )
+        expected_results = list(delta.results_from_delta_records(records))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            delta_timeline_jsonl = os.path.join(temp_dir, "timeline.jsonl")
+            with open(delta_timeline_jsonl, "w") as ofp:
+                for record in records:
+                    ofp.write(json.dumps(record, sort_keys=True, separators=(",", ":")) + "\n")
+
+            reader = delta.DeltaTimelineReader(delta_timeline_jsonl)
+            self.assertEqual(reader.snapshot_steps, [0, 5, 10, 15])
+            for step in [0, 3, 9, len(events) - 1]:
+                self.assertDictEqual(reader.result_at(step), expected_results[step])
+
+            with open(delta_timeline_jsonl, "a") as ofp:
+                ofp.write(json.dumps({"type": "snapshots"}) + "\n")
+            with self.assertRaises(ValueError):
+                delta.DeltaTimelineReader(delta_timeline_jsonl)
+
+        self.assertEqual(delta.record_line_type(json.dumps(records[0]).encode()), "snapshot")
+        self.assertEqual(delta.record_line_type(json.dumps(records[1]).encode()), "delta")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
+import gzip
 import json
 import os
+import tempfile
 import unittest
 
 from . import facets
@@ -21,6 +23,70 @@ class TestFacetsFromMoonwormCrawldata(unittest.TestCase):
 
         self.assertDictEqual(actual_output, expected_output)
 
+    def test_gzipped_crawldata_with_other_events(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        expected_events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            crawldata_gz = os.path.join(temp_dir, "cu-land-cuts.jsonl.gz")
+            with open(crawldata_jsonl, "rb") as ifp, gzip.open(crawldata_gz, "wb") as ofp:
+                for line in ifp:
+                    ofp.write(b'{"event": "Transfer", "args": {}}\n')
+                    ofp.write(line)
+            actual_events = list(facets.iter_moonworm_crawldata(crawldata_gz))
+
+        self.assertEqual(actual_events, expected_events)
+
+
+class TestFacetsFromEvents(unittest.TestCase):
+    maxDiff = None
+
+    def cut_event(self, *cuts):
+        return {
+            "event": "DiamondCut",
+            "args": {"_diamondCut": [list(cut) for cut in cuts]},
+            "blockNumber": 1,
+            "transactionHash": "0x01",
+        }
+
+    def test_replace_and_remove_through_zero_address(self):
+        events = [
+            self.cut_event(("0xA", 0, ["0x01", "0x02", "0x03"])),
+            self.cut_event(("0xB", 1, ["0x02"]), ("0xB", 0, ["0x04"])),
+            self.cut_event((facets.ZERO_ADDRESS, 2, ["0x01", "0x04"])),
+            self.cut_event(("0xA", 0, ["0x01"])),
+        ]
+        # Selectors are held as integers, and formatted as 8 digit hex strings in the output.
+        self.assertDictEqual(
+            facets.facets_from_events(events),
+            {"0xA": ["0x00000003", "0x00000001"], "0xB": ["0x00000002"]},
+        )
+
+    def test_state_holds_selectors_as_integers(self):
+        raw_facets, selector_index = {}, {}
+        facets.apply_diamond_cut(
+            raw_facets, selector_index, self.cut_event(("0xA", 0, ["0x01", "0xABCDEF12"]))
+        )
+        self.assertEqual(raw_facets, {"0xA": {0x01: None, 0xABCDEF12: None}})
+        self.assertEqual(selector_index, {0x01: "0xA", 0xABCDEF12: "0xA"})
+        self.assertEqual(
+            facets.facets_from_raw_facets(raw_facets), {"0xA": ["0x00000001", "0xabcdef12"]}
+        )
+        self.assertEqual(
+            facets.raw_facets_from_facets({"0xA": ["0x00000001", "0xabcdef12"]}),
+            (raw_facets, selector_index),
+        )
+
+    def test_invalid_cut_is_reported(self):
+        events = [
+            self.cut_event(("0xA", 0, ["0x01"])),
+            self.cut_event(("0xB", 1, ["0x02"])),
+        ]
+        with self.assertRaisesRegex(
+            facets.InvalidDiamondCut, "cannot replace selector 0x02"
+        ):
+            facets.facets_from_events(events)
+
 
 if __name__ == "__main__":
     unittest.main()
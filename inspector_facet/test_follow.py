@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from . import delta, facets, follow, inspector
+from .test_timeline import FIXTURES_DIR, load_test_abis
+
+
+class TestFollowCrawldata(unittest.TestCase):
+    maxDiff = None
+
+    def test_follow_appended_events_and_resume_from_checkpoint(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        with open(crawldata_jsonl, "rb") as ifp:
+            lines = ifp.readlines()
+        contract_selectors = inspector.contract_selectors_from_abis(load_test_abis())
+        expected_result = inspector.inspect_diamond(
+            facets.facets_from_events(
+                facets.events_from_moonworm_crawldata(crawldata_jsonl)
+            ),
+            contract_selectors=contract_selectors,
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            followed_jsonl = os.path.join(temp_dir, "cuts.jsonl")
+            checkpoint_file = os.path.join(temp_dir, "checkpoint.json")
+            with open(followed_jsonl, "wb") as ofp:
+                ofp.writelines(lines[:10])
+                # Partially written line, which must not be consumed yet.
+                ofp.write(lines[10][:20])
+
+            records = follow.follow_crawldata(
+                followed_jsonl,
+                contract_selectors,
+                checkpoint_file=checkpoint_file,
+                poll_interval=0.01,
+            )
+            state = delta.DeltaTimelineState()
+            state.apply(next(records))
+            self.assertEqual(state.step, 9)
+
+            with open(followed_jsonl, "ab") as ofp:
+                ofp.write(lines[10][20:])
+                ofp.writelines(lines[11:])
+            for _ in lines[10:]:
+                state.apply(next(records))
+            records.close()
+
+            self.assertEqual(state.step, len(lines) - 1)
+            self.assertDictEqual(state.result(), expected_result)
+
+            checkpoint = follow.load_checkpoint(checkpoint_file, followed_jsonl)
+            self.assertEqual(checkpoint["offset"], os.path.getsize(followed_jsonl))
+
+            resumed_records = follow.follow_crawldata(
+                followed_jsonl,
+                contract_selectors,
+                checkpoint_file=checkpoint_file,
+                should_stop=lambda: True,
+            )
+            snapshot = next(resumed_records)
+            self.assertEqual(snapshot["step"], len(lines) - 1)
+            self.assertEqual(list(snapshot["result"]), list(expected_result))
+            self.assertDictEqual(snapshot["result"], expected_result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from . import facets, history
+from .inspector import contract_selectors_from_abis
+from .test_timeline import FIXTURES_DIR, load_test_abis
+
+
+class TestSelectorHistory(unittest.TestCase):
+    maxDiff = None
+
+    def test_history_agrees_with_replay(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        contract_selectors = contract_selectors_from_abis(load_test_abis())
+        selector_history = history.build_selector_history(events, contract_selectors)
+
+        block_numbers = sorted({event["blockNumber"] for event in events})
+        for block_number in block_numbers:
+            expected_facets = facets.facets_from_events(
+                event for event in events if event["blockNumber"] <= block_number
+            )
+            expected_selector_facets = {
+                selector: facet_address
+                for facet_address, selectors in expected_facets.items()
+                for selector in selectors
+            }
+            actual_selector_facets = {}
+            for selector in selector_history.intervals:
+                interval = selector_history.interval_at(selector, block_number)
+                if interval is not None:
+                    actual_selector_facets[selector] = interval["facet"]
+            self.assertDictEqual(actual_selector_facets, expected_selector_facets)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            history_file = os.path.join(temp_dir, "history.json")
+            built_history = history.selector_history_from_crawldata(
+                crawldata_jsonl, contract_selectors, history_file
+            )
+            loaded_history = history.selector_history_from_crawldata(
+                crawldata_jsonl, contract_selectors, history_file
+            )
+            self.assertEqual(loaded_history.intervals, selector_history.intervals)
+            self.assertEqual(loaded_history.source, built_history.source)
+
+        selector = next(iter(selector_history.intervals))
+        self.assertEqual(
+            selector_history.lookup(selector.upper().replace("0X", "0x")),
+            selector_history.intervals[selector],
+        )
+        self.assertEqual(selector_history.lookup("0xffffffff"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
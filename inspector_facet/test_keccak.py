@@ -0,0 +1,17 @@
+import unittest
+
+from . import keccak
+
+
+class TestKeccak(unittest.TestCase):
+    def test_known_digests(self):
+        cases = {
+            b"": "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470",
+            b"transfer(address,uint256)": "a9059cbb2ab09eb219583f4a59a5d0623ade346d962bcd4e46b11da047c9049b",
+        }
+        for data, expected_digest in cases.items():
+            self.assertEqual(keccak.keccak256(data).hex(), expected_digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
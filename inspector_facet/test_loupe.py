@@ -0,0 +1,133 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from . import loupe
+
+DIAMOND_WITH_FACETS = "0x00000000000000000000000000000000000000d1"
+DIAMOND_WITHOUT_FACETS = "0x00000000000000000000000000000000000000d2"
+
+MOUNTED_FACETS = {
+    "0x69881D5FE6eB6F2D3A1b98Db8b3afAe3450db249": ["0x1f931c1c"],
+    "0x815BbC3D150090EFEB5c91d0b096a6c284c21331": [
+        "0xcdffacc6",
+        "0x52ef6b2c",
+        "0xadfca15e",
+        "0x7a0ed627",
+    ],
+}
+
+
+def encode_uint(value):
+    return value.to_bytes(32, "big")
+
+
+def encode_address(address):
+    return bytes.fromhex(address[2:]).rjust(32, b"\x00")
+
+
+def encode_bytes4_array(selectors):
+    return encode_uint(len(selectors)) + b"".join(
+        bytes.fromhex(selector[2:]).ljust(32, b"\x00") for selector in selectors
+    )
+
+
+def encode_facets(facets):
+    tuples = [
+        encode_address(address) + encode_uint(64) + encode_bytes4_array(selectors)
+        for address, selectors in facets.items()
+    ]
+    offsets = []
+    offset = 32 * len(tuples)
+    for encoded_tuple in tuples:
+        offsets.append(encode_uint(offset))
+        offset += len(encoded_tuple)
+    return encode_uint(32) + encode_uint(len(tuples)) + b"".join(offsets + tuples)
+
+
+def eth_call(to, data):
+    """
+    Mock diamonds: DIAMOND_WITH_FACETS implements facets(), DIAMOND_WITHOUT_FACETS only implements
+    facetAddresses() and facetFunctionSelectors(address).
+    """
+    if to == DIAMOND_WITH_FACETS and data == loupe.FACETS_SELECTOR:
+        return encode_facets(MOUNTED_FACETS)
+    if to == DIAMOND_WITHOUT_FACETS and data == loupe.FACET_ADDRESSES_SELECTOR:
+        return (
+            encode_uint(32)
+            + encode_uint(len(MOUNTED_FACETS))
+            + b"".join(encode_address(address) for address in MOUNTED_FACETS)
+        )
+    if to == DIAMOND_WITHOUT_FACETS and data.startswith(
+        loupe.FACET_FUNCTION_SELECTORS_SELECTOR
+    ):
+        for address, selectors in MOUNTED_FACETS.items():
+            if data.endswith(address[2:].lower()):
+                return encode_uint(32) + encode_bytes4_array(selectors)
+    return None
+
+
+class MockJSONRPCHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.num_requests += 1
+        requests = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        responses = []
+        for request in reversed(requests):
+            call = request["params"][0]
+            return_data = eth_call(call["to"], call["data"])
+            response = {"jsonrpc": "2.0", "id": request["id"]}
+            if return_data is None:
+                response["error"] = {"code": -32000, "message": "execution reverted"}
+            else:
+                response["result"] = "0x" + return_data.hex()
+            responses.append(response)
+        body = json.dumps(responses).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestLoupeClient(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), MockJSONRPCHandler)
+        self.server.num_requests = 0
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.start()
+        self.rpc_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+
+    def test_facets_with_fallback_in_batched_requests(self):
+        missing_diamond = "0x00000000000000000000000000000000000000d3"
+        with loupe.LoupeClient(self.rpc_url) as client:
+            results = client.facets(
+                [DIAMOND_WITH_FACETS, DIAMOND_WITHOUT_FACETS, missing_diamond]
+            )
+
+        self.assertDictEqual(results[DIAMOND_WITH_FACETS], MOUNTED_FACETS)
+        self.assertDictEqual(results[DIAMOND_WITHOUT_FACETS], MOUNTED_FACETS)
+        self.assertIsInstance(results[missing_diamond], loupe.JSONRPCError)
+        # facets(), then facetAddresses(), then facetFunctionSelectors(address)
+        self.assertEqual(self.server.num_requests, 3)
+
+    def test_facets_from_rpc(self):
+        self.assertDictEqual(
+            loupe.facets_from_rpc(self.rpc_url, DIAMOND_WITH_FACETS), MOUNTED_FACETS
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
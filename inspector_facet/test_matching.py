@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from . import matching
+
+
+def reference_match_facet(selectors, contract_selectors):
+    """
+    Straightforward facet x contract x selector implementation of the matching rules.
+    """
+    recalls = {
+        contract_name: sum(1.0 for selector in selectors if selector in functions)
+        / len(selectors)
+        for contract_name, functions in contract_selectors.items()
+    }
+    precisions = {
+        contract_name: (
+            sum(1.0 for selector in functions if selector in selectors) / len(functions)
+            if functions
+            else 0.0
+        )
+        for contract_name, functions in contract_selectors.items()
+    }
+    max_recall = max(recalls.values())
+    candidates = [name for name in contract_selectors if recalls[name] == max_recall]
+    max_precision = max(precisions[name] for name in candidates)
+    matches = [name for name in candidates if precisions[name] == max_precision]
+    return {
+        "matches": matches,
+        "misses": [
+            {"contract": name, "selector": selector, "function": function_name}
+            for name in matches
+            for selector, function_name in contract_selectors[name].items()
+            if selector not in selectors
+        ],
+        "selectors": [
+            {
+                "contract": name,
+                "selector": selector,
+                "function": contract_selectors[name][selector],
+            }
+            for name in matches
+            for selector in selectors
+            if selector in contract_selectors[name]
+        ],
+    }
+
+
+class TestSelectorMatcher(unittest.TestCase):
+    maxDiff = None
+
+    def test_matches_reference_implementation_on_random_corpus(self):
+        rng = random.Random(2535)
+        universe = [f"0x{rng.getrandbits(32):08x}" for _ in range(60)]
+        contract_selectors = {
+            f"Contract{i}": {
+                selector: f"function{universe.index(selector)}"
+                for selector in rng.sample(universe, rng.randint(0, 12))
+            }
+            for i in range(40)
+        }
+        matcher = matching.SelectorMatcher(contract_selectors)
+
+        for _ in range(200):
+            selectors = rng.sample(universe, rng.randint(1, 15))
+            self.assertDictEqual(
+                matcher.match_facet(selectors),
+                reference_match_facet(selectors, contract_selectors),
+            )
+
+    def test_unmatched_facet_matches_every_contract(self):
+        contract_selectors = {
+            "Ownable": {"0x8da5cb5b": "owner"},
+            "Empty": {},
+        }
+        matcher = matching.SelectorMatcher(contract_selectors)
+        result = matcher.match_facet(["0x1f931c1c"])
+        self.assertEqual(result["matches"], ["Ownable", "Empty"])
+        self.assertEqual(result["selectors"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from . import facets, ordering
+from .test_timeline import FIXTURES_DIR
+
+
+class TestEventOrdering(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.events = facets.events_from_moonworm_crawldata(
+            os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        )
+        # Re-crawled data: the events are shuffled, and some of them appear twice (with the transaction hash
+        # spelled differently in one copy).
+        rng = random.Random(2535)
+        self.messy_events = list(self.events)
+        for event in rng.sample(self.events, len(self.events) // 2):
+            self.messy_events.append(
+                dict(event, transactionHash=event["transactionHash"].upper())
+            )
+        rng.shuffle(self.messy_events)
+
+    def test_normalized_events_are_sorted_and_unique(self):
+        expected_events = sorted(self.events, key=ordering.event_sort_key)
+        normalized_events = list(
+            ordering.normalized_events(self.messy_events, chunk_size=3)
+        )
+        self.assertEqual(
+            [ordering.event_identity(event) for event in normalized_events],
+            [ordering.event_identity(event) for event in expected_events],
+        )
+        self.assertDictEqual(
+            facets.facets_from_events(normalized_events),
+            facets.facets_from_events(self.events),
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            run_files = ordering.sorted_runs(self.messy_events, temp_dir, 2)
+            merged_events = list(ordering.merge_runs(run_files, temp_dir, fan_in=3))
+            self.assertEqual(
+                [ordering.event_sort_key(event) for event in merged_events],
+                sorted(ordering.event_sort_key(event) for event in self.messy_events),
+            )
+
+    def test_duplicates_across_blocks(self):
+        # A transaction re-included in a later block after a reorg keeps its hash and log index. The copy
+        # crawled before the reorg, in the block which was dropped, comes after the re-included copy in the
+        # crawldata, as can happen when the range is crawled again.
+        first_event = min(self.events, key=ordering.event_sort_key)
+        last_block = max(event["blockNumber"] for event in self.events)
+        reorged_event = dict(first_event, blockNumber=last_block + 1, transactionIndex=0)
+        orphaned_event = dict(first_event, transactionHash=first_event["transactionHash"].upper())
+        crawled_events = [reorged_event] + self.events + [orphaned_event]
+        normalized_events = list(ordering.normalized_events(crawled_events, chunk_size=2))
+
+        self.assertEqual(len(normalized_events), len(self.events))
+        self.assertEqual(normalized_events[-1], reorged_event)
+        self.assertNotIn(first_event, normalized_events)
+        self.assertNotIn(orphaned_event, normalized_events)
+        self.assertEqual(
+            [ordering.event_sort_key(event) for event in normalized_events],
+            sorted(ordering.event_sort_key(event) for event in normalized_events),
+        )
+
+        # Of the copies in a single block, the last one crawled is kept.
+        recrawled_events = list(
+            ordering.normalized_events(self.events + [orphaned_event], chunk_size=2)
+        )
+        self.assertIn(orphaned_event, recrawled_events)
+        self.assertNotIn(first_event, recrawled_events)
+
+    def test_normalize_crawldata(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            messy_jsonl = os.path.join(temp_dir, "messy.jsonl")
+            with open(messy_jsonl, "w") as ofp:
+                for event in self.messy_events:
+                    ofp.write(json.dumps(event) + "\n")
+            normalized_jsonl = os.path.join(temp_dir, "normalized.jsonl")
+
+            counts = ordering.normalize_crawldata(
+                messy_jsonl, normalized_jsonl, chunk_size=4, temp_dir=temp_dir
+            )
+            self.assertEqual(
+                counts,
+                {"events_read": len(self.messy_events), "events_written": len(self.events)},
+            )
+            self.assertDictEqual(
+                facets.facets_from_events(facets.iter_moonworm_crawldata(normalized_jsonl)),
+                facets.facets_from_events(self.events),
+            )
+            # Only the input and output remain - the sorted runs are cleaned up.
+            self.assertEqual(sorted(os.listdir(temp_dir)), ["messy.jsonl", "normalized.jsonl"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import unittest
+
+from . import facets, profiling
+from .inspector import inspect_diamond
+from .test_timeline import FIXTURES_DIR, load_test_abis
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable_profiling()
+
+    def test_stages_are_recorded_only_while_enabled(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        abis = load_test_abis()
+
+        iterator = iter(events)
+        self.assertIs(profiling.profiled_iterator("unused", iterator), iterator)
+
+        profiler = profiling.enable_profiling(trace_memory=True)
+        inspect_diamond(
+            facets.facets_from_events(facets.iter_moonworm_crawldata(crawldata_jsonl)),
+            abis,
+        )
+        self.assertIs(profiling.disable_profiling(), profiler)
+
+        report = profiler.report()
+        self.assertEqual(report["stages"]["crawldata_decoding"]["calls"], len(events))
+        for name in [
+            "crawldata_decoding",
+            "facet_reconstruction",
+            "selector_hashing",
+            "matching",
+        ]:
+            self.assertGreaterEqual(report["stages"][name]["calls"], 1)
+            self.assertGreater(report["stages"][name]["seconds"], 0)
+            self.assertGreater(report["stages"][name]["peak_memory_bytes"], 0)
+
+        # Nothing more is recorded once profiling has been disabled.
+        facets.facets_from_events(events)
+        self.assertEqual(profiler.report()["stages"]["facet_reconstruction"]["calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
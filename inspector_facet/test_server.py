@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from . import facets, inspector, server, timeline
+from .test_timeline import ABIS_DIR, FIXTURES_DIR, load_test_abis
+
+
+class TestInspectorServer(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.project_dir = self.temp_dir.name
+        self.contracts_dir = os.path.join(self.project_dir, "build", "contracts")
+        os.makedirs(self.contracts_dir)
+        for contract_name, contract_abi in load_test_abis().items():
+            self.write_artifact(contract_name, contract_abi)
+        self.crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+
+        self.service = server.InspectorService(self.project_dir)
+        self.server = server.make_server(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address
+        self.url = f"http://{host}:{port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def write_artifact(self, contract_name, contract_abi):
+        with open(os.path.join(self.contracts_dir, f"{contract_name}.json"), "w") as ofp:
+            json.dump({"abi": contract_abi}, ofp)
+
+    def request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        with urllib.request.urlopen(self.url + path, data=data) as response:
+            return json.loads(response.read())
+
+    def test_inspect_and_timeline_match_cli_results(self):
+        contract_selectors = inspector.contract_selectors_from_abis(load_test_abis())
+        events = list(facets.iter_moonworm_crawldata(self.crawldata_jsonl))
+        expected_result = inspector.inspect_diamond(
+            facets.facets_from_events(events), contract_selectors=contract_selectors
+        )
+        expected_timeline = json.loads(
+            json.dumps(
+                list(
+                    timeline.timeline_from_events(
+                        events, contract_selectors=contract_selectors
+                    )
+                )
+            )
+        )
+
+        self.assertDictEqual(
+            self.request("/inspect", {"crawldata": self.crawldata_jsonl}), expected_result
+        )
+        self.assertDictEqual(
+            self.request(
+                "/inspect", {"facets": facets.facets_from_events(events)}
+            ),
+            expected_result,
+        )
+        self.assertListEqual(
+            self.request("/timeline", {"crawldata": self.crawldata_jsonl}),
+            expected_timeline,
+        )
+
+        loupe_selectors = contract_selectors["DiamondLoupeFacet"]
+        selector, function_name = next(iter(loupe_selectors.items()))
+        self.assertDictEqual(
+            self.request("/selectors", {"selectors": [selector]}),
+            {
+                selector: {
+                    "functions": [
+                        {"contract": "DiamondLoupeFacet", "function": function_name}
+                    ]
+                }
+            },
+        )
+
+    def test_errors(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request("/unknown", {})
+        self.assertEqual(context.exception.code, 404)
+
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request("/inspect", {})
+        self.assertEqual(context.exception.code, 400)
+        self.assertIn("ValueError", json.loads(context.exception.read())["error"])
+
+    def test_reloads_when_artifacts_change(self):
+        self.assertEqual(self.request("/health")["contracts"], 2)
+        self.assertFalse(self.service.reload())
+
+        with open(os.path.join(ABIS_DIR, "DiamondCutFacetABI.json"), "r") as ifp:
+            self.write_artifact("AnotherCutFacet", json.load(ifp))
+        self.assertTrue(self.service.reload())
+        self.assertEqual(self.request("/health")["contracts"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+from . import signatures
+from .inspector import inspect_diamond
+
+OWNER_ABI = [{"type": "function", "name": "owner", "inputs": [], "outputs": []}]
+
+
+class TestSignatureDatabase(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_dump(self, filename, contents):
+        dump_file = os.path.join(self.temp_dir.name, filename)
+        with open(dump_file, "w") as ofp:
+            ofp.write(contents)
+        return dump_file
+
+    def test_import_lookup_and_fallback(self):
+        dump_files = [
+            self.write_dump(
+                "4byte.csv",
+                'id,created_at,text_signature,hex_signature,bytes_signature\n1,2020-01-01,"transfer(address,uint256)",0xa9059cbb,x\n',
+            ),
+            self.write_dump(
+                "signatures.txt", "owner()\n0xdeadbeef,foo(uint256)\n"
+            ),
+            self.write_dump(
+                "openchain.json",
+                json.dumps({"function": {"0xdeadbeef": [{"name": "bar(bytes)"}]}}),
+            ),
+            self.write_dump(
+                "openchain-api.json",
+                json.dumps(
+                    {
+                        "ok": True,
+                        "result": {
+                            "event": {},
+                            "function": {
+                                "0x8da5cb5b": [{"name": "owner()", "filtered": False}],
+                                "0xcafebabe": [{"name": "qux()", "filtered": False}],
+                                "0x00000001": None,
+                            },
+                        },
+                    }
+                ),
+            ),
+        ]
+        db_file = os.path.join(self.temp_dir.name, "signatures.db")
+        self.assertEqual(signatures.import_signature_dumps(dump_files, db_file), 5)
+        # Re-importing a dump into an existing database does not duplicate its signatures.
+        self.assertEqual(signatures.import_signature_dumps(dump_files[:1], db_file), 5)
+
+        with signatures.SignatureDatabase(db_file) as signature_db:
+            self.assertEqual(
+                signature_db.lookup("0xa9059cbb"), ["transfer(address,uint256)"]
+            )
+            self.assertEqual(signature_db.lookup("0x8da5cb5b"), ["owner()"])
+            self.assertEqual(
+                signature_db.lookup(0xDEADBEEF), ["bar(bytes)", "foo(uint256)"]
+            )
+            self.assertEqual(signature_db.lookup("0xcafebabe"), ["qux()"])
+            self.assertEqual(signature_db.lookup("0x00000000"), [])
+            self.assertEqual(signature_db.lookup("0xffffffff"), [])
+
+            facets = {"0xFacet": ["0x8da5cb5b", "0xa9059cbb", "0x12345678"]}
+            result = inspect_diamond(
+                facets, abis={"Ownable": OWNER_ABI}, signature_db=signature_db
+            )
+            self.assertEqual(result["0xFacet"]["matches"], ["Ownable"])
+            self.assertEqual(
+                result["0xFacet"]["unknown"],
+                [
+                    {
+                        "selector": "0xa9059cbb",
+                        "signatures": ["transfer(address,uint256)"],
+                    },
+                    {"selector": "0x12345678", "signatures": []},
+                ],
+            )
+            self.assertNotIn(
+                "unknown", inspect_diamond(facets, abis={"Ownable": OWNER_ABI})["0xFacet"]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from . import similarity, synthetic
+from .inspector import contract_selectors_from_abis
+from .matching import SelectorMatcher
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    maxDiff = None
+
+    def test_matches_agree_with_exact_matcher(self):
+        contract_selectors = contract_selectors_from_abis(
+            synthetic.synthetic_abis(60, 12, seed=7)
+        )
+        index = similarity.build_similarity_index(contract_selectors)
+        matcher = SelectorMatcher(contract_selectors)
+
+        rng = random.Random(7)
+        for contract_name in list(contract_selectors)[:20]:
+            selectors = list(contract_selectors[contract_name])
+            # Facets serving every function of a contract, and facets serving most of them.
+            for facet_selectors in [selectors, rng.sample(selectors, len(selectors) * 3 // 4)]:
+                result = index.match_facet(facet_selectors, top_k=3)
+                candidates = result.pop("candidates")
+                self.assertDictEqual(result, matcher.match_facet(facet_selectors))
+
+                self.assertLessEqual(len(candidates), 3)
+                self.assertIn(candidates[0]["contract"], result["matches"])
+                self.assertEqual(candidates[0]["recall"], 1.0)
+                ranks = [(item["recall"], item["precision"]) for item in candidates]
+                self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_small_facet_of_large_contract(self):
+        contract_selectors = contract_selectors_from_abis(
+            synthetic.synthetic_abis(60, 12, seed=7)
+        )
+        large_selectors = contract_selectors_from_abis(
+            synthetic.synthetic_abis(1, 80, seed=11)
+        )["Contract0"]
+        contract_selectors["Large"] = large_selectors
+        index = similarity.build_similarity_index(contract_selectors)
+        matcher = SelectorMatcher(contract_selectors)
+
+        facet_selectors = list(large_selectors)[-3:]
+        large_id = index.matcher.contract_names.index("Large")
+        # The facet's Jaccard similarity to Large is too low for LSH to retrieve it.
+        self.assertNotIn(
+            large_id,
+            index.candidate_ids([int(selector, 16) for selector in facet_selectors]),
+        )
+
+        result = index.match_facet(facet_selectors)
+        candidates = result.pop("candidates")
+        self.assertEqual(result["matches"], ["Large"])
+        self.assertDictEqual(result, matcher.match_facet(facet_selectors))
+        self.assertEqual(candidates[0]["contract"], "Large")
+        self.assertEqual(candidates[0]["recall"], 1.0)
+
+    def test_fallback_scores_few_candidates(self):
+        contract_selectors = contract_selectors_from_abis(
+            synthetic.synthetic_abis(2000, 12, seed=7)
+        )
+        index = similarity.build_similarity_index(contract_selectors)
+        # A selector which hundreds of contracts define, as owner() is in practice.
+        common_selector_int = max(
+            index.matcher.selector_contracts,
+            key=lambda selector_int: len(index.matcher.selector_contracts[selector_int]),
+        )
+        common_selector = f"0x{common_selector_int:08x}"
+        self.assertGreater(len(index.matcher.selector_contracts[common_selector_int]), 200)
+
+        large_selectors = contract_selectors_from_abis(
+            synthetic.synthetic_abis(1, 80, seed=11)
+        )["Contract0"]
+        large_selectors[common_selector] = "owner"
+        contract_selectors["Large"] = large_selectors
+        index = similarity.build_similarity_index(contract_selectors)
+
+        facet_selectors = [common_selector] + [
+            selector for selector in large_selectors if selector != common_selector
+        ][-2:]
+        scored_ids = []
+        original_score = index.score
+
+        def score(selector_ints, contract_ids):
+            scored_ids.extend(contract_ids)
+            return original_score(selector_ints, contract_ids)
+
+        with mock.patch.object(index, "score", side_effect=score):
+            result = index.match_facet(facet_selectors)
+        self.assertEqual(result["matches"], ["Large"])
+        self.assertEqual(result["candidates"][0]["recall"], 1.0)
+        # Only the LSH candidates and the contract defining the facet's rarest selectors are scored, not
+        # the hundreds of contracts which share its common selector.
+        self.assertLess(len(scored_ids), len(contract_selectors) // 20)
+
+        rare_ids = index.rare_selector_candidate_ids(
+            [int(selector, 16) for selector in facet_selectors], max_candidates=5
+        )
+        self.assertEqual(rare_ids, [index.matcher.contract_names.index("Large")])
+        capped_ids = index.rare_selector_candidate_ids([common_selector_int], max_candidates=5)
+        self.assertEqual(len(capped_ids), 5)
+
+    def test_save_load_and_corpus(self):
+        abis = synthetic.synthetic_abis(10, 5, seed=3)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus_dir = os.path.join(temp_dir, "corpus")
+            os.makedirs(os.path.join(corpus_dir, "verified"))
+            for i, (contract_name, contract_abi) in enumerate(abis.items()):
+                # Plain ABIs and build artifacts can be mixed in a corpus.
+                contents = contract_abi if i % 2 == 0 else {"abi": contract_abi}
+                with open(
+                    os.path.join(corpus_dir, "verified", f"{contract_name}.json"), "w"
+                ) as ofp:
+                    json.dump(contents, ofp)
+
+            corpus_abis = similarity.corpus_abis(corpus_dir)
+            self.assertEqual(
+                corpus_abis,
+                {
+                    os.path.join("verified", contract_name): contract_abi
+                    for contract_name, contract_abi in abis.items()
+                },
+            )
+
+            index = similarity.build_similarity_index(
+                contract_selectors_from_abis(corpus_abis), num_permutations=32, bands=16
+            )
+            index_file = os.path.join(temp_dir, "index.json")
+            index.save(index_file)
+            loaded_index = similarity.SimilarityIndex.load(index_file)
+
+        facets = {
+            "0xA": list(index.matcher.contract_selectors[index.matcher.contract_names[0]])
+        }
+        self.assertDictEqual(loaded_index.match_facets(facets), index.match_facets(facets))
+        self.assertEqual(loaded_index.buckets, index.buckets)
+
+        with self.assertRaises(ValueError):
+            similarity.build_similarity_index({}, num_permutations=30, bands=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Startup time benchmark for offline (--crawldata) inspections.
+
+Offline inspections never touch a blockchain, so they should not pay for importing brownie or web3.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+ABIS_DIR = os.path.join(os.path.dirname(__file__), "abis")
+PACKAGE_PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Wall time budget for a complete `inspector-facet --crawldata ...` process, in seconds.
+STARTUP_TIME_BUDGET = 1.0
+
+NETWORK_MODULES = ["brownie", "web3", "eth_abi", "eth_account"]
+
+BENCHMARK_SCRIPT = """
+import json
+import sys
+import time
+
+started_at = time.perf_counter()
+from inspector_facet import cli
+
+sys.argv = ["inspector-facet"] + sys.argv[1:]
+cli.main()
+elapsed = time.perf_counter() - started_at
+
+network_modules = [name for name in {network_modules} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "network_modules": network_modules}}), file=sys.stderr)
+""".format(
+    network_modules=repr(NETWORK_MODULES)
+)
+
+
+class TestCrawldataStartup(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.project_dir = self.temp_dir.name
+        contracts_dir = os.path.join(self.project_dir, "build", "contracts")
+        os.makedirs(contracts_dir)
+        shutil.copy(os.path.join(ABIS_DIR, "DiamondLoupeFacet.json"), contracts_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_crawldata_inspection_does_not_load_network_stack(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [PACKAGE_PARENT_DIR] + [path for path in [env.get("PYTHONPATH")] if path]
+        )
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                BENCHMARK_SCRIPT,
+                "--crawldata",
+                os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl"),
+                "--project",
+                self.project_dir,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            check=True,
+        )
+        report = json.loads(process.stderr.decode().strip().splitlines()[-1])
+
+        self.assertEqual(report["network_modules"], [])
+        self.assertLess(report["elapsed"], STARTUP_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from . import abi, facets, synthetic
+from .inspector import contract_selectors_from_abis
+from .timeline import IncrementalInspector
+
+
+class TestSyntheticData(unittest.TestCase):
+    maxDiff = None
+
+    def test_generated_data_is_deterministic_and_valid(self):
+        abis = synthetic.synthetic_abis(20, 10, seed=7)
+        self.assertEqual(abis, synthetic.synthetic_abis(20, 10, seed=7))
+        contract_selectors = contract_selectors_from_abis(abis)
+
+        events = list(
+            synthetic.synthetic_diamond_cuts(contract_selectors, 500, 12, seed=7)
+        )
+        self.assertEqual(
+            events,
+            list(synthetic.synthetic_diamond_cuts(contract_selectors, 500, 12, seed=7)),
+        )
+        actions = {cut[1] for event in events for cut in event["args"]["_diamondCut"]}
+        self.assertEqual(
+            actions,
+            {
+                facets.CUT_ACTION_ADD,
+                facets.CUT_ACTION_REPLACE,
+                facets.CUT_ACTION_REMOVE,
+            },
+        )
+
+        # Every event must be valid against the state produced by the events before it.
+        inspector = IncrementalInspector(contract_selectors=contract_selectors)
+        for event in events:
+            inspector.update(event)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            crawldata_jsonl = os.path.join(temp_dir, "crawldata.jsonl")
+            self.assertEqual(synthetic.write_crawldata(crawldata_jsonl, iter(events)), 500)
+            self.assertEqual(facets.events_from_moonworm_crawldata(crawldata_jsonl), events)
+
+            synthetic.write_artifact_tree(temp_dir, abis, layout="foundry")
+            build_files = abi.foundry_build_files(temp_dir)
+            self.assertEqual(abi.abis_from_build_files(build_files), abis)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import unittest
+
+from . import facets, inspector, timeline
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+ABIS_DIR = os.path.join(os.path.dirname(__file__), "abis")
+
+
+def load_test_abis():
+    with open(os.path.join(ABIS_DIR, "DiamondLoupeFacet.json"), "r") as ifp:
+        loupe_abi = json.load(ifp)["abi"]
+    with open(os.path.join(ABIS_DIR, "DiamondCutFacetABI.json"), "r") as ifp:
+        cut_abi = json.load(ifp)
+    return {"DiamondCutFacet": cut_abi, "DiamondLoupeFacet": loupe_abi}
+
+
+class TestTimelineFromEvents(unittest.TestCase):
+    maxDiff = None
+
+    def test_matches_full_replay_on_cu_lands_crawldata(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        abis = load_test_abis()
+
+        actual_timeline = list(timeline.timeline_from_events(events, abis))
+
+        self.assertEqual(len(actual_timeline), len(events))
+        for i, (result, event) in enumerate(actual_timeline):
+            expected_result = inspector.inspect_diamond(
+                facets.facets_from_events(events[: i + 1]), abis
+            )
+            self.assertIs(event, events[i])
+            self.assertEqual(list(result), list(expected_result))
+            self.assertDictEqual(result, expected_result)
+
+    def test_segments_match_sequential_timeline(self):
+        crawldata_jsonl = os.path.join(FIXTURES_DIR, "cu-land-cuts.jsonl")
+        events = facets.events_from_moonworm_crawldata(crawldata_jsonl)
+        contract_selectors = inspector.contract_selectors_from_abis(load_test_abis())
+
+        segments = list(timeline.timeline_segments(events, segment_size=4))
+        self.assertEqual(len(segments[0][2]), 4)
+        self.assertEqual(sum(len(segment_events) for _, _, segment_events in segments), len(events))
+
+        expected_timeline = list(
+            timeline.timeline_from_events(events, contract_selectors=contract_selectors)
+        )
+        # Segments are computed in this process, as a worker process would compute them.
+        timeline.initialize_timeline_worker(contract_selectors)
+        actual_timeline = []
+        for segment in segments:
+            previous_result, results_with_events = timeline.segment_timeline(segment)
+            if actual_timeline:
+                self.assertEqual(previous_result, actual_timeline[-1][0])
+            else:
+                self.assertIsNone(previous_result)
+            actual_timeline.extend(results_with_events)
+        self.assertEqual(actual_timeline, expected_timeline)
+        for (result, _), (expected_result, _) in zip(actual_timeline, expected_timeline):
+            self.assertEqual(list(result), list(expected_result))
+
+if __name__ == "__main__":
+    unittest.main()
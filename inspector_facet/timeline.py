@@ -0,0 +1,172 @@
+"""
+Incremental reconstruction of the state of a Diamond contract from its DiamondCut events.
+
+Timelines can also be computed in parallel: a cheap sequential pass over the events (timeline_segments)
+reconstructs only the facet state, and snapshots it at the start of every segment of segment_size events.
+Worker processes (set up with initialize_timeline_worker) then restore each snapshot and run the matching for
+their segment (segment_timeline), and the segments are put back together in order - see run_parallel_timeline
+in inspector_facet.cli, which also renders each segment in its worker.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .facets import apply_diamond_cut, facets_from_raw_facets, raw_facets_from_facets
+from .inspector import contract_selectors_from_abis
+from .matching import SelectorMatcher
+
+DEFAULT_SEGMENT_SIZE = 1000
+
+# Matcher used by segment_timeline. Set once per worker process by initialize_timeline_worker, so that the
+# index is not sent to the workers with every segment.
+_worker_matcher: Optional[SelectorMatcher] = None
+
+
+class IncrementalInspector:
+    """
+    Keeps the facet state of a Diamond contract, and the inspection result for each of its facets,
+    between DiamondCut events. Applying an event only re-inspects the facets that the event modified.
+
+    After every call to apply, result() is identical to:
+    inspect_diamond(facets_from_events(<events applied so far>), abis, contract_selectors)
+    """
+
+    def __init__(
+        self,
+        abis: Optional[Dict[str, Any]] = None,
+        contract_selectors: Optional[Dict[str, Dict[str, str]]] = None,
+        matcher: Optional[SelectorMatcher] = None,
+    ) -> None:
+        if matcher is not None:
+            # A prebuilt matcher (e.g. one kept warm by inspector_facet.server) is shared rather than
+            # rebuilt from its index.
+            contract_selectors = matcher.contract_selectors
+        elif contract_selectors is None:
+            if abis is None:
+                raise ValueError("You must provide either abis or contract_selectors")
+            contract_selectors = contract_selectors_from_abis(abis)
+        self.contract_selectors = contract_selectors
+        self.matcher = (
+            matcher if matcher is not None else SelectorMatcher(contract_selectors)
+        )
+        # Selectors are held as integers (see facets.apply_diamond_cut), so that they are only parsed once,
+        # when the event that mounts them is applied, and only formatted when results are built.
+        self.raw_facets: Dict[str, Dict[int, None]] = {}
+        self.selector_index: Dict[int, str] = {}
+        self.facet_results: Dict[str, Dict[str, Any]] = {}
+
+    def restore(self, facets: Dict[str, List[str]]) -> None:
+        """
+        Replaces the current state with the given facets (e.g. a state saved from raw_facets earlier) and
+        re-inspects all of them. Facets with no selectors are kept, to preserve the order in which facets
+        first appeared.
+        """
+        self.raw_facets, self.selector_index = raw_facets_from_facets(facets)
+        self.facet_results = {
+            address: self.matcher.match_selector_ints(list(selectors))
+            for address, selectors in self.raw_facets.items()
+            if selectors
+        }
+
+    def state(self) -> Dict[str, List[str]]:
+        """
+        Current facet state, including facets with no selectors, in a form which can be serialized and
+        passed back to restore.
+        """
+        return facets_from_raw_facets(self.raw_facets, keep_empty=True)
+
+    def update(self, event: Dict[str, Any]) -> Set[str]:
+        """
+        Applies a DiamondCut event and re-inspects the facets it modified. Returns the addresses of those
+        facets.
+        """
+        touched_facets = apply_diamond_cut(self.raw_facets, self.selector_index, event)
+        for address in touched_facets:
+            selectors = self.raw_facets[address]
+            if selectors:
+                self.facet_results[address] = self.matcher.match_selector_ints(
+                    list(selectors)
+                )
+            else:
+                self.facet_results.pop(address, None)
+        return touched_facets
+
+    def apply(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Applies a DiamondCut event and returns the inspection result for the Diamond after that event.
+        """
+        self.update(event)
+        return self.result()
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Inspection result for the Diamond in its current state. Facet results are shared between
+        successive calls, so they should be treated as read-only.
+        """
+        return {
+            address: self.facet_results[address]
+            for address, selectors in self.raw_facets.items()
+            if selectors
+        }
+
+
+def timeline_from_events(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    abis: Optional[Dict[str, Any]] = None,
+    contract_selectors: Optional[Dict[str, Dict[str, str]]] = None,
+) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Yields (result, event) pairs for each of the given DiamondCut events, where result is the inspection
+    result for the Diamond immediately after that event.
+    """
+    inspector = IncrementalInspector(abis, contract_selectors)
+    for event in diamond_cut_events:
+        yield inspector.apply(event), event
+
+
+def timeline_segments(
+    diamond_cut_events: Iterable[Dict[str, Any]],
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+) -> Iterator[Tuple[int, Dict[str, List[str]], List[Dict[str, Any]]]]:
+    """
+    Splits the events into segments of segment_size events, yielding (segment index, facet state before the
+    segment, events in the segment) for each. The facet state (in the form accepted by
+    IncrementalInspector.restore) is reconstructed without matching facets against any contracts.
+    """
+    if segment_size < 1:
+        raise ValueError(f"Segment size must be positive: {segment_size}")
+    raw_facets: Dict[str, Dict[int, None]] = {}
+    selector_index: Dict[int, str] = {}
+    segment_index = 0
+    state = facets_from_raw_facets(raw_facets, keep_empty=True)
+    segment: List[Dict[str, Any]] = []
+    for event in diamond_cut_events:
+        segment.append(event)
+        apply_diamond_cut(raw_facets, selector_index, event)
+        if len(segment) == segment_size:
+            yield segment_index, state, segment
+            segment_index += 1
+            state = facets_from_raw_facets(raw_facets, keep_empty=True)
+            segment = []
+    if segment:
+        yield segment_index, state, segment
+
+
+def initialize_timeline_worker(contract_selectors: Dict[str, Dict[str, str]]) -> None:
+    global _worker_matcher
+    _worker_matcher = SelectorMatcher(contract_selectors)
+
+
+def segment_timeline(
+    segment: Tuple[int, Dict[str, List[str]], List[Dict[str, Any]]]
+) -> Tuple[Optional[Dict[str, Any]], List[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+    """
+    Computes the timeline for one segment produced by timeline_segments. Returns the inspection result for
+    the state before the segment (None for the first segment, which starts before any event) and the
+    (result, event) pairs for the events in the segment.
+    """
+    assert _worker_matcher is not None, "initialize_timeline_worker must be called first"
+    segment_index, state, events = segment
+    inspector = IncrementalInspector(matcher=_worker_matcher)
+    inspector.restore(state)
+    previous_result = inspector.result() if segment_index > 0 else None
+    return previous_result, [(inspector.apply(event), event) for event in events]
+
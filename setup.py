@@ -11,7 +11,7 @@ setup(
     name="inspector-facet",
     version=VERSION,
     packages=find_packages(),
-    install_requires=["eth-brownie", "tqdm"],
+    install_requires=["eth-brownie", "pycryptodome", "tqdm"],
     extras_require={
         "dev": ["black"],
         "distribute": ["setuptools", "twine", "wheel"],